@@ -0,0 +1,38 @@
+"""drop active status index
+
+Revision ID: 2e8f4b6a0d35
+Revises: 9c3d7a1f5e62
+Create Date: 2026-10-20 11:26:53.840127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2e8f4b6a0d35'
+down_revision: Union[str, None] = '9c3d7a1f5e62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# As created by 8e4b0c6f1d27
+ACTIVE_JOB_STATUSES = "status IN ('UPLOADED', 'QUEUED', 'PENDING_PAYMENT', 'PROCESSING')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # No query looks jobs up by status, so the index only costs writes
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_image_jobs_active_status', table_name='image_jobs', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_image_jobs_active_status', 'image_jobs', ['status'],
+            postgresql_where=sa.text(ACTIVE_JOB_STATUSES),
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,28 @@
+"""wallet version
+
+Revision ID: 4a7c1e9b3d58
+Revises: 2e8f4b6a0d35
+Create Date: 2026-10-20 14:02:18.516390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7c1e9b3d58'
+down_revision: Union[str, None] = '2e8f4b6a0d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('wallet', sa.Column('version', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('wallet', 'version')
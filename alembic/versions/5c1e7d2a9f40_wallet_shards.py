@@ -0,0 +1,45 @@
+"""wallet shards
+
+Revision ID: 5c1e7d2a9f40
+Revises: 2d7b30821d65
+Create Date: 2026-10-19 10:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7d2a9f40'
+down_revision: Union[str, None] = '2d7b30821d65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('wallet', sa.Column('shard_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('wallet_shards',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('wallet_id', sa.UUID(), nullable=False),
+    sa.Column('shard_index', sa.Integer(), nullable=False),
+    sa.Column('balance', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallet.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('wallet_id', 'shard_index', name='uq_wallet_shards_wallet_index')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Fold any sharded balance back into the parent row before dropping shards
+    op.execute(
+        "UPDATE wallet SET balance = wallet.balance + s.total "
+        "FROM (SELECT wallet_id, SUM(balance) AS total FROM wallet_shards GROUP BY wallet_id) s "
+        "WHERE wallet.id = s.wallet_id"
+    )
+    op.drop_table('wallet_shards')
+    op.drop_column('wallet', 'shard_count')
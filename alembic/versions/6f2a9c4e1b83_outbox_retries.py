@@ -0,0 +1,44 @@
+"""outbox retries
+
+Revision ID: 6f2a9c4e1b83
+Revises: b5d8e3f1a274
+Create Date: 2026-10-20 09:12:46.201734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f2a9c4e1b83'
+down_revision: Union[str, None] = 'b5d8e3f1a274'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('outbox', sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    op.create_index('ix_outbox_next_attempt_at', 'outbox', ['next_attempt_at', 'id'], unique=False)
+    op.create_table('outbox_dead_letters',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('task_name', sa.String(), nullable=False),
+    sa.Column('kwargs', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('queue', sa.String(), nullable=True),
+    sa.Column('tenant_id', sa.String(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('failed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('outbox_dead_letters')
+    op.drop_index('ix_outbox_next_attempt_at', table_name='outbox')
+    op.drop_column('outbox', 'next_attempt_at')
@@ -0,0 +1,53 @@
+"""hot path indexes
+
+Revision ID: 8e4b0c6f1d27
+Revises: 5c1e7d2a9f40
+Create Date: 2026-10-19 11:03:54.118430
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4b0c6f1d27'
+down_revision: Union[str, None] = '5c1e7d2a9f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Non-terminal job states; kept in sync with ImageJob's partial index
+ACTIVE_JOB_STATUSES = "status IN ('UPLOADED', 'QUEUED', 'PENDING_PAYMENT', 'PROCESSING')"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Indexes are built CONCURRENTLY so the hot tables stay writable; that
+    # (and ALTER TYPE ... ADD VALUE) cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        # 2d7b30821d65 was generated empty; make sure the enum carries the
+        # payment states that the partial index below refers to.
+        op.execute("ALTER TYPE imagestatus ADD VALUE IF NOT EXISTS 'PENDING_PAYMENT'")
+        op.execute("ALTER TYPE imagestatus ADD VALUE IF NOT EXISTS 'PAYMENT_FAILED'")
+
+        # Fails if a user already has more than one wallet; resolve duplicates first.
+        op.create_index('ix_wallet_user_id', 'wallet', ['user_id'], unique=True, postgresql_concurrently=True)
+        op.create_index('ix_transactions_user_id_created_at', 'transactions', ['user_id', 'created_at', 'id'], postgresql_concurrently=True)
+        op.create_index('ix_images_user_id_created_at', 'images', ['user_id', 'created_at', 'id'], postgresql_concurrently=True)
+        op.create_index('ix_image_jobs_image_id', 'image_jobs', ['image_id'], postgresql_concurrently=True)
+        op.create_index(
+            'ix_image_jobs_active_status', 'image_jobs', ['status'],
+            postgresql_where=sa.text(ACTIVE_JOB_STATUSES),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_image_jobs_active_status', table_name='image_jobs', postgresql_concurrently=True)
+        op.drop_index('ix_image_jobs_image_id', table_name='image_jobs', postgresql_concurrently=True)
+        op.drop_index('ix_images_user_id_created_at', table_name='images', postgresql_concurrently=True)
+        op.drop_index('ix_transactions_user_id_created_at', table_name='transactions', postgresql_concurrently=True)
+        op.drop_index('ix_wallet_user_id', table_name='wallet', postgresql_concurrently=True)
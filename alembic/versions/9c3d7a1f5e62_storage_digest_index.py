@@ -0,0 +1,33 @@
+"""storage digest index
+
+Revision ID: 9c3d7a1f5e62
+Revises: 6f2a9c4e1b83
+Create Date: 2026-10-20 10:04:19.557310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3d7a1f5e62'
+down_revision: Union[str, None] = '6f2a9c4e1b83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_image_jobs_storage_digest', 'image_jobs', [sa.text("split_part(storage_path, '/', 2)")],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_image_jobs_storage_digest', table_name='image_jobs', postgresql_concurrently=True)
@@ -0,0 +1,36 @@
+"""unique topup reference
+
+Revision ID: a7d3f9e25b81
+Revises: 8e4b0c6f1d27
+Create Date: 2026-10-19 12:26:08.573912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3f9e25b81'
+down_revision: Union[str, None] = '8e4b0c6f1d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fails if a payment was already credited twice; resolve duplicates first.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_transactions_topup_reference', 'transactions', ['reference_id'],
+            unique=True,
+            postgresql_where=sa.text("transaction_type = 'TOPUP'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('uq_transactions_topup_reference', table_name='transactions', postgresql_concurrently=True)
@@ -0,0 +1,38 @@
+"""image header metadata
+
+Revision ID: a9e4d2c7f618
+Revises: f3c8a1d6b294
+Create Date: 2026-10-19 20:04:51.372806
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e4d2c7f618'
+down_revision: Union[str, None] = 'f3c8a1d6b294'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('images', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('images', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('images', sa.Column('color_mode', sa.String(length=16), nullable=True))
+    op.add_column('images', sa.Column('file_format', sa.String(length=16), nullable=True))
+    op.add_column('images', sa.Column('frame_count', sa.Integer(), nullable=True))
+    op.add_column('images', sa.Column('exif_orientation', sa.SmallInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('images', 'exif_orientation')
+    op.drop_column('images', 'frame_count')
+    op.drop_column('images', 'file_format')
+    op.drop_column('images', 'color_mode')
+    op.drop_column('images', 'height')
+    op.drop_column('images', 'width')
@@ -0,0 +1,50 @@
+"""job stage timings
+
+Revision ID: b5d8e3f1a274
+Revises: a9e4d2c7f618
+Create Date: 2026-10-19 21:37:15.204913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d8e3f1a274'
+down_revision: Union[str, None] = 'a9e4d2c7f618'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('image_jobs', sa.Column('queued_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('image_jobs', sa.Column('started_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('image_jobs', sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('image_jobs', sa.Column('download_ms', sa.Integer(), nullable=True))
+    op.add_column('image_jobs', sa.Column('process_ms', sa.Integer(), nullable=True))
+    op.add_column('image_jobs', sa.Column('upload_ms', sa.Integer(), nullable=True))
+    op.add_column('image_jobs', sa.Column('input_bytes', sa.BigInteger(), nullable=True))
+    op.add_column('image_jobs', sa.Column('output_bytes', sa.BigInteger(), nullable=True))
+    op.add_column('image_jobs', sa.Column('worker_id', sa.String(length=255), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_image_jobs_finished_at', 'image_jobs', ['finished_at'], postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_image_jobs_finished_at', table_name='image_jobs', postgresql_concurrently=True)
+    op.drop_column('image_jobs', 'worker_id')
+    op.drop_column('image_jobs', 'output_bytes')
+    op.drop_column('image_jobs', 'input_bytes')
+    op.drop_column('image_jobs', 'upload_ms')
+    op.drop_column('image_jobs', 'process_ms')
+    op.drop_column('image_jobs', 'download_ms')
+    op.drop_column('image_jobs', 'finished_at')
+    op.drop_column('image_jobs', 'started_at')
+    op.drop_column('image_jobs', 'queued_at')
@@ -0,0 +1,28 @@
+"""outbox tenant
+
+Revision ID: d4a1c7e93b52
+Revises: c2f85b3e6a19
+Create Date: 2026-10-19 15:02:41.518207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a1c7e93b52'
+down_revision: Union[str, None] = 'c2f85b3e6a19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('outbox', sa.Column('tenant_id', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('outbox', 'tenant_id')
@@ -0,0 +1,36 @@
+"""storage path indexes
+
+Revision ID: f3c8a1d6b294
+Revises: e6b2f0a84c17
+Create Date: 2026-10-19 19:12:08.640215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1d6b294'
+down_revision: Union[str, None] = 'e6b2f0a84c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_images_storage_path', 'images', ['storage_path'], postgresql_concurrently=True)
+        op.create_index(
+            'ix_image_jobs_storage_path', 'image_jobs', ['storage_path'],
+            postgresql_where=sa.text('storage_path IS NOT NULL'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_image_jobs_storage_path', table_name='image_jobs', postgresql_concurrently=True)
+        op.drop_index('ix_images_storage_path', table_name='images', postgresql_concurrently=True)
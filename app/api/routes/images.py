@@ -0,0 +1,68 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.pagination import decode_cursor, encode_cursor
+from app.database import get_read_db
+from app.middleware.authentication import supabaseauth
+from app.repositories.image_repository import ImageRepository
+from app.schemas.imagejobs import ImageList, ImageListItem
+from app.services.storage_service import StorageService
+
+router = APIRouter(
+    tags=["images"],
+    dependencies=[Depends(supabaseauth.get_current_user)],
+)
+storage_service = StorageService()
+
+
+@router.get("/images", response_model=ImageList)
+async def list_images(
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    user: dict = Depends(supabaseauth.get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    List the user's images, newest first, with each image's latest job status
+    and a signed preview URL (the latest thumbnail output, else the original).
+    A page costs one DB query and one batched signing call.
+    """
+    position = decode_cursor(cursor)
+    try:
+        image_repo = ImageRepository(db)
+        rows = await image_repo.list_images_page(user["id"], limit=limit, cursor=position)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1][0]
+            next_cursor = encode_cursor(last.created_at, last.id)
+
+        preview_paths = [thumbnail_path or image.storage_path for image, _, _, thumbnail_path in rows]
+        signed_urls = await storage_service.get_signed_urls(preview_paths)
+
+        items = [
+            ImageListItem(
+                id=image.id,
+                user_id=image.user_id,
+                label=image.label,
+                image_type=image.image_type,
+                note=image.note,
+                storage_path=image.storage_path,
+                width=image.width,
+                height=image.height,
+                frame_count=image.frame_count,
+                created_at=image.created_at,
+                updated_at=image.updated_at,
+                latest_job_status=job_status.value if job_status else None,
+                latest_job_type=job_type.value if job_type else None,
+                thumbnail_url=signed_urls.get(preview_path),
+            )
+            for (image, job_status, job_type, _), preview_path in zip(rows, preview_paths)
+        ]
+        return ImageList(items=items, next_cursor=next_cursor)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list images: {str(e)}",
+        )
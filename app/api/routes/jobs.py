@@ -0,0 +1,126 @@
+from typing import Dict, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import RedirectResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+
+from app.config import settings
+from app.core.content_address import content_digest, content_type_for
+from app.database import get_read_db
+from app.middleware.authentication import supabaseauth
+from app.models.imageJob import ImageJob, ImageStatus
+from app.repositories.image_job_repository import ImageJobRepository
+from app.services.storage_service import SignedUrlCache, StorageError, StorageService
+
+router = APIRouter(
+    tags=["jobs"],
+    dependencies=[Depends(supabaseauth.get_current_user)],
+)
+storage_service = StorageService()
+signed_url_cache = SignedUrlCache(
+    storage_service,
+    expires_in=settings.job_output_url_ttl_seconds,
+    max_size=settings.job_output_url_cache_size,
+)
+
+# Upstream headers passed through when proxying
+PROXY_HEADERS = ("content-length", "content-range", "accept-ranges")
+
+
+def _etag(job: ImageJob) -> str:
+    digest = content_digest(job.storage_path)
+    if digest:
+        return f'"{digest}"'
+    # Legacy outputs are overwritten in place: tie the tag to the job's last update
+    return f'W/"{job.id}-{int(job.updated_at.timestamp())}"'
+
+
+def _cache_headers(job: ImageJob) -> Dict[str, str]:
+    headers = {"ETag": _etag(job)}
+    if content_digest(job.storage_path):
+        headers["Cache-Control"] = f"{settings.job_output_cache_scope}, max-age=31536000, immutable"
+    else:
+        headers["Cache-Control"] = "private, no-cache"
+    return headers
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+@router.get(
+    "/jobs/{job_id}/output",
+    response_class=Response,
+    responses={
+        200: {"description": "Output bytes (proxy mode)"},
+        206: {"description": "Partial output (proxy mode, Range request)"},
+        302: {"description": "Redirect to a signed URL (redirect mode)"},
+        304: {"description": "Not modified"},
+    },
+)
+async def get_job_output(
+    job_id: UUID,
+    request: Request,
+    user: dict = Depends(supabaseauth.get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Fetch a completed job's output: a 302 to a signed URL, or the bytes
+    streamed through the API when `job_output_delivery` is "proxy".
+    """
+    row = await ImageJobRepository(db).get_job_with_owner(job_id)
+    if row is None or str(row[1]) != str(user["id"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    job = row[0]
+    if job.status != ImageStatus.COMPLETED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Job output is not ready")
+    if not job.storage_path:
+        # Removed by the storage lifecycle worker after its retention period
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Job output has expired")
+
+    headers = _cache_headers(job)
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if settings.job_output_delivery == "proxy":
+        return await _proxy_output(job.storage_path, request.headers.get("range"), headers)
+
+    signed = await signed_url_cache.get(job.storage_path)
+    if signed is None:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Could not sign output URL")
+    url, expires_in = signed
+    # The redirect is only valid while the signed URL is
+    return RedirectResponse(
+        url,
+        status_code=status.HTTP_302_FOUND,
+        headers={"ETag": headers["ETag"], "Cache-Control": f"private, max-age={max(expires_in - 60, 0)}"},
+    )
+
+
+async def _proxy_output(storage_path: str, range_header: Optional[str], headers: Dict[str, str]) -> Response:
+    try:
+        upstream, close = await storage_service.open_download_stream(storage_path, range_header)
+    except StorageError:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Storage unavailable")
+
+    if upstream.status_code not in (200, 206, 416):
+        await close()
+        if upstream.status_code in (400, 404):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job output not found")
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Storage unavailable")
+
+    headers = {**headers, "Content-Type": content_type_for(storage_path)}
+    headers.update({name: upstream.headers[name] for name in PROXY_HEADERS if name in upstream.headers})
+    return StreamingResponse(
+        upstream.aiter_bytes(),
+        status_code=upstream.status_code,
+        headers=headers,
+        background=BackgroundTask(close),
+    )
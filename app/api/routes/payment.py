@@ -1,28 +1,32 @@
-from locale import currency
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
 
-import hmac
-import hashlib
-import razorpay
+import csv
+import io
+import json
+import logging
 import uuid
-from typing import Dict, Any
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, Literal, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.middleware.authentication import supabaseauth
 from app.schemas.TransactionSchemas import (
     PaymentCreateRequest,
     PaymentVerifyRequest,
     PaymentResponse,
+    TransactionPage,
+    TransactionResponse,
 )
-from app.database import get_db
+from app.core.pagination import decode_cursor, encode_cursor
+from app.database import get_db, get_read_db, get_session_router
 from app.repositories.wallet_repository import WalletRepository
 from app.repositories.transaction_repository import TransactionRepository
-from app.models.transactions import TransactionType
+from app.services.payment_gateway import get_payment_gateway
 from app.config import settings
 
 RAZORPAY_KEY_ID = settings.RAZORPAY_KEY_ID
-RAZORPAY_KEY_SECRET = settings.RAZORPAY_KEY_SECRET
 
-razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     tags=["payments"],
@@ -30,15 +34,21 @@ router = APIRouter(
     dependencies=[Depends(supabaseauth.get_current_user)],
 )
 
+# Provider callbacks carry no user token; they are authenticated by signature
+webhook_router = APIRouter(tags=["payments"], prefix="/api")
+
 
 @router.post("/create-order")
-async def create_payment_order(request: PaymentCreateRequest):
+async def create_payment_order(
+    request: PaymentCreateRequest,
+    current_user: Dict[str, Any] = Depends(supabaseauth.get_current_user),
+):
     try:
-        razorpay_order = razorpay_client.order.create(
-            data={
-                "amount": int(request.amount*100),
-                "currency": "INR",
-            }
+        # user_id in the order notes lets the webhook credit the right wallet
+        razorpay_order = await get_payment_gateway().create_order(
+            amount=int(request.amount*100),
+            currency="INR",
+            notes={"user_id": str(current_user["id"])},
         )
         return {
             "order_id": razorpay_order["id"],
@@ -51,7 +61,7 @@ async def create_payment_order(request: PaymentCreateRequest):
         }
 
     except Exception as e:
-        print("Razorpay order creation failed:", e)
+        logger.exception("Razorpay order creation failed", extra={"amount": request.amount})
 
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -59,6 +69,21 @@ async def create_payment_order(request: PaymentCreateRequest):
         )
 
 
+async def _credit_topup(db: AsyncSession, user_id, payment_id: str, amount_paise: int):
+    """
+    Credit a provider payment to the user's wallet exactly once.
+    Returns the TOPUP transaction ID, or None if it was already credited.
+    """
+    wallet_repo = WalletRepository(db)
+    wallet_id = await wallet_repo.get_or_create_wallet_id(user_id)
+    return await wallet_repo.apply_topup(
+        wallet_id=wallet_id,
+        user_id=user_id,
+        amount=Decimal(amount_paise) / 100,
+        payment_id=payment_id,
+    )
+
+
 @router.post("/verify-payment", status_code=status.HTTP_200_OK)
 async def verify_payment(
     request: PaymentVerifyRequest,
@@ -66,64 +91,62 @@ async def verify_payment(
     db: AsyncSession = Depends(get_db),
 ):
     """
-    Verify Razorpay payment and update user's wallet
+    Verify Razorpay payment and update user's wallet.
+    The wallet is normally credited by the order.paid webhook; this only
+    fetches the payment from Razorpay if the webhook has not arrived yet and
+    the fallback is enabled, otherwise it answers 202 so the client can poll.
     """
- 
-    generated_signature = hmac.new(
-        bytes(settings.RAZORPAY_KEY_SECRET, "utf-8"),
-        f"{request.order_id}|{request.payment_id}".encode("utf-8"),
-        hashlib.sha256,
-    ).hexdigest()
-
-    if generated_signature != request.signature:
+    gateway = get_payment_gateway()
+    if not gateway.verify_checkout_signature(request.order_id, request.payment_id, request.signature):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payment signature"
         )
 
     try:
-        # Fetch payment details from Razorpay
-        payment = razorpay_client.payment.fetch(request.payment_id)
-        print(f"Payment details: {payment}")
-        # Verify if payment is successful
-        if payment["status"] != "authorized":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Payment not captured"
+        wallet_repo = WalletRepository(db)
+        transaction_repo = TransactionRepository(db)
+        transaction = await transaction_repo.get_topup_by_reference(request.payment_id)
+
+        if transaction is None:
+            if not settings.razorpay_verify_fetch_fallback:
+                return JSONResponse(
+                    status_code=status.HTTP_202_ACCEPTED,
+                    content={"status": "pending", "message": "Payment is being confirmed"},
+                )
+
+            payment = await gateway.fetch_payment(request.payment_id)
+            logger.info(
+                "Razorpay payment fetched",
+                extra={"payment_id": request.payment_id, "payment_status": payment.get("status")},
             )
+            # Verify if payment is successful
+            if payment["status"] not in ("authorized", "captured") or payment.get("order_id") != request.order_id:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Payment not captured"
+                )
 
-        amount = float(payment["amount"]) / 100
+            # The wallet to credit is the one the order was created for, as
+            # in the webhook; never the caller's just because they hold the IDs
+            order = await gateway.fetch_order(request.order_id)
+            owner_id = (order.get("notes") or {}).get("user_id")
+            if owner_id != str(current_user["id"]):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Payment belongs to another user"
+                )
 
-        # Update user's wallet
-        wallet_repo = WalletRepository(db)
-        wallet =await wallet_repo.get_wallet_by_user_id(current_user["id"])
+            await _credit_topup(db, owner_id, request.payment_id, payment["amount"])
+            transaction = await transaction_repo.get_topup_by_reference(request.payment_id)
 
-        if not wallet:
-            # Create wallet if not exists
-            wallet =await wallet_repo.create_wallet(
-                {"user_id": current_user["id"], "balance": amount}
-            )
-        else:
-            # Update existing wallet
-           await wallet_repo.update_wallet(
-                wallet.id, {"balance": float(wallet.balance) + amount}
+        if str(transaction.user_id) != str(current_user["id"]):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Payment belongs to another user"
             )
 
-        # Log transaction
-        transaction_repo = TransactionRepository(db)
-        transaction =await transaction_repo.log_transaction(
-            {
-                "user_id": current_user["id"],
-                "wallet_id": wallet.id,
-                "transaction_type": TransactionType.TOPUP,
-                "reference_id": request.payment_id,
-                "amount": amount,
-            }
-        )
-
         return {
             "status": "success",
             "message": "Payment verified and wallet updated successfully",
             "transaction_id": str(transaction.id),
-            "wallet_balance": str(wallet.balance),
+            "wallet_balance": str(await wallet_repo.get_cached_balance_by_user_id(current_user["id"])),
         }
 
     except HTTPException:
@@ -135,20 +158,64 @@ async def verify_payment(
         )
 
 
-@router.get("/payment-history")
+@webhook_router.post("/razorpay-webhook", status_code=status.HTTP_200_OK)
+async def razorpay_webhook(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Razorpay webhook receiver. Authenticated by the X-Razorpay-Signature HMAC
+    rather than a user token. Credits the wallet on order.paid; redeliveries
+    are absorbed by the unique TOPUP reference.
+    """
+    body = await request.body()
+    signature = request.headers.get("X-Razorpay-Signature", "")
+    if not get_payment_gateway().verify_webhook_signature(body, signature):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid webhook signature"
+        )
+
+    event = json.loads(body)
+    if event.get("event") != "order.paid":
+        # refund.*, payment.failed, ...: acknowledged, or the gateway keeps redelivering
+        return {"status": "ignored"}
+
+    payload = event.get("payload") or {}
+    order = (payload.get("order") or {}).get("entity") or {}
+    payment = (payload.get("payment") or {}).get("entity") or {}
+    user_id = (order.get("notes") or {}).get("user_id")
+    if not user_id or "id" not in payment or "amount" not in payment:
+        logger.warning("order.paid without user_id note or payment", extra={"order_id": order.get("id")})
+        return {"status": "ignored"}
+
+    transaction_id = await _credit_topup(db, user_id, payment["id"], payment["amount"])
+    logger.info(
+        "Webhook top-up processed",
+        extra={"payment_id": payment["id"], "user_id": user_id, "duplicate": transaction_id is None},
+    )
+    return {"status": "ok"}
+
+
+@router.get("/payment-history", response_model=TransactionPage)
 async def get_payment_history(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user: Dict[str, Any] = Depends(supabaseauth.get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
-    Get payment history for the current user
+    Get payment history for the current user, newest first, one page at a time
     """
+    position = decode_cursor(cursor)
     try:
         transaction_repo = TransactionRepository(db)
-        transactions = await transaction_repo.get_transactions_by_user_id(
-            current_user["id"]
+        transactions = await transaction_repo.get_transactions_page(
+            current_user["id"], limit=limit, cursor=position
         )
-        return {"transactions": [transaction.to_dict() for transaction in transactions]}
+        next_cursor = None
+        if len(transactions) > limit:
+            transactions = transactions[:limit]
+            last = transactions[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+        # Rows are serialized from their attributes by the response model
+        return {"transactions": transactions, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -156,23 +223,65 @@ async def get_payment_history(
         )
 
 
+EXPORT_FIELDS = ["id", "user_id", "wallet_id", "transaction_type", "reference_id", "amount", "created_at", "updated_at"]
+
+
+async def _export_rows(user_id, export_format: str) -> AsyncIterator[str]:
+    # The export owns its session: request-scoped dependencies may be torn
+    # down before a StreamingResponse has finished sending.
+    session_factory = await get_session_router().reader()
+    async with session_factory() as session:
+        transaction_repo = TransactionRepository(session)
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+            async for transaction in transaction_repo.stream_transactions_by_user_id(user_id):
+                writer.writerow(transaction.to_dict())
+                if buffer.tell() >= 64 * 1024:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            async for transaction in transaction_repo.stream_transactions_by_user_id(user_id):
+                yield TransactionResponse.model_validate(transaction).model_dump_json() + "\n"
+
+
+@router.get("/payment-history/export")
+async def export_payment_history(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    current_user: Dict[str, Any] = Depends(supabaseauth.get_current_user),
+):
+    """
+    Stream the user's full payment history as CSV or NDJSON
+    """
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_rows(current_user["id"], format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="payment-history.{format}"'},
+    )
+
+
 @router.get("/wallet-balance")
 async def get_wallet_balance(
     current_user: Dict[str, Any] = Depends(supabaseauth.get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
-    Get wallet balance for the current user
+    Get wallet balance for the current user.
+    Served from the balance cache; misses are read from the primary (see
+    WalletRepository.get_cached_balance_by_user_id).
     """
     try:
         wallet_repo = WalletRepository(db)
-        wallet = await wallet_repo.get_wallet_by_user_id(current_user["id"])
-        print(wallet)
+        balance = await wallet_repo.get_cached_balance_by_user_id(current_user["id"])
 
-        if not wallet:
+        if balance is None:
             return {"balance": "0.00"}
 
-        return {"balance": str(wallet.balance)}
+        return {"balance": str(balance)}
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
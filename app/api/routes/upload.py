@@ -1,22 +1,58 @@
-from typing import  Optional
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+import hashlib
+import logging
+from typing import  Optional, Tuple
+from uuid import UUID
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.queues import IMAGE_QUEUE, LARGE_IMAGE_QUEUE, SMALL_IMAGE_QUEUE
+from app.config import settings
 from app.database import get_db
 from app.models.image import Image
-from app.models.imageJob import ImageJob, JobType, ImageStatus
+from app.models.imageJob import ImageJob, JobPriority, JobType, ImageStatus
 from app.repositories.image_repository import ImageRepository
 from app.repositories.image_job_repository import ImageJobRepository
 from app.repositories.wallet_repository import WalletRepository
 from app.schemas.imagejobs import ImageResponse
+from app.services.image_metadata import DecompressionBomb, ImageHeader, InvalidImage, estimate_footprint, read_image_header
+from app.services.idempotency import IdempotencyConflict, IdempotencyMismatch, IdempotencyStore, SingleFlight
+from app.services.rate_limiter import rate_limiter
 from app.services.storage_service import StorageService
 from app.middleware.authentication import supabaseauth
 from app.services.wallet_service import WalletService
-from app.tasks.processimage import process_image
 
 router = APIRouter(
      dependencies=[Depends(supabaseauth.get_current_user)]
 )
 storage_service = StorageService()
+idempotency_store = IdempotencyStore("process-image")
+single_flight = SingleFlight("process-image")
+logger = logging.getLogger(__name__)
+
+# Jobs a duplicate submission may attach to
+IN_FLIGHT_STATUSES = (ImageStatus.QUEUED, ImageStatus.PROCESSING)
+
+
+async def enforce_rate_limit(user_id: str, priority: str) -> None:
+    """
+    Per-user token bucket for the request's priority tier. Fails open when
+    Redis is unavailable so an outage there does not stop uploads.
+    """
+    if not settings.rate_limit_enabled:
+        return
+    try:
+        allowed, retry_after = await rate_limiter.acquire(user_id, priority)
+    except Exception:
+        logger.warning("Rate limiter unavailable", exc_info=True)
+        return
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests. Please retry later.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
 
 @router.post("/process/image/", response_model=ImageResponse, status_code=status.HTTP_201_CREATED)
 async def upload_image(
@@ -24,35 +60,178 @@ async def upload_image(
     label: str = Form(...),
     image_type: str = Form(...),
     note: Optional[str] = Form(""),
-    priority: str = Form(...),
+    priority: JobPriority = Form(...),
     job_type: JobType = Form(...),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     db: AsyncSession = Depends(get_db),
     user: dict = Depends(supabaseauth.get_current_user) 
 ):
     """
     Upload an image, verify payment, store metadata, create a processing job, and enqueue a task.
     Process flow:
-    1. Validate file type and user
-    2. Upload file to storage
-    3. Create image and job record with PENDING_PAYMENT status
-    4. Check wallet balance and process payment
-    5. If payment succeeds, queue the job for processing
-    6. If payment fails, mark job as PAYMENT_FAILED and return error
+    1. Validate file type and user, and read the image header (rejects
+       unreadable images and decompression bombs)
+    2. Replay the stored response if the Idempotency-Key was seen before
+    3. Attach to an in-flight job for the same content and job type, if any
+    4. Upload file to storage
+    5. Create image (with its header metadata) and job record with PENDING_PAYMENT status
+    6. Check wallet balance and process payment, priced by megapixels
+    7. If payment succeeds, queue the job on the small, normal or large queue
+    8. If payment fails, mark job as PAYMENT_FAILED and return error
     """
-    if file.content_type not in ["image/jpeg", "image/png", "image/webp"]:
+    if file.content_type not in ["image/jpeg", "image/png", "image/webp", "image/gif"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Unsupported file type. Only JPEG, PNG, and WebP are supported."
+            detail="Unsupported file type. Only JPEG, PNG, WebP, and GIF are supported."
         )
 
-    try:
-        user_id = user.get("id")
-        if not user_id: 
+    user_id = user.get("id")
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User ID not found in token"
+        )
+
+    # Pricing, rate limits and the job row work with the plain tier name
+    priority = priority.value
+    await enforce_rate_limit(user_id, priority)
+
+    content = await file.read()
+    await file.seek(0)
+    header = read_upload_header(content)
+    content_hash = hashlib.sha256(content).hexdigest()
+    fingerprint = hashlib.sha256(
+        "|".join([content_hash, label, image_type, note or "", priority, job_type.value]).encode("utf-8")
+    ).hexdigest()
+
+    if idempotency_key:
+        try:
+            stored = await idempotency_store.begin(user_id, idempotency_key, fingerprint)
+        except IdempotencyMismatch:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request."
+            )
+        except IdempotencyConflict:
             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User ID not found in token"
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress."
             )
-            
+        except RedisError:
+            logger.warning("Idempotency store unavailable", exc_info=True)
+            idempotency_key = None
+        else:
+            if stored is not None:
+                return JSONResponse(
+                    stored.body, status_code=stored.status_code, headers={"Idempotent-Replayed": "true"}
+                )
+
+    try:
+        status_code, body, headers = await _submit_deduplicated(
+            db, file, user_id, content_hash, header, len(content), label, image_type, note, priority, job_type
+        )
+    except Exception:
+        if idempotency_key:
+            try:
+                await idempotency_store.release(user_id, idempotency_key)
+            except RedisError:
+                logger.warning("Idempotency store unavailable", exc_info=True)
+        raise
+
+    # The job is charged and queued by now: a Redis failure must not turn it into an error
+    if idempotency_key:
+        try:
+            await idempotency_store.complete(user_id, idempotency_key, fingerprint, status_code, body)
+        except RedisError:
+            logger.warning("Idempotency store unavailable", exc_info=True)
+    return JSONResponse(body, status_code=status_code, headers=headers)
+
+
+def read_upload_header(content: bytes) -> ImageHeader:
+    """Parse the image header, rejecting unreadable images and decompression bombs."""
+    try:
+        header = read_image_header(content, max_pixels=int(settings.upload_max_megapixels * 1_000_000))
+    except InvalidImage:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The file is not a readable image."
+        )
+    except DecompressionBomb:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Images may be at most {settings.upload_max_megapixels:g} megapixels."
+        )
+    if header.frame_count > settings.upload_max_frames:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Animations may have at most {settings.upload_max_frames} frames."
+        )
+    return header
+
+
+def select_queue(header: ImageHeader, encoded_bytes: int, job_type: JobType) -> str:
+    """Route by size before any worker touches the bytes."""
+    footprint = estimate_footprint(header, encoded_bytes, job_type.value)
+    if footprint > settings.large_image_threshold_mb * 1024 * 1024:
+        return LARGE_IMAGE_QUEUE
+    if header.frame_count == 1 and header.megapixels <= settings.small_image_max_megapixels:
+        return SMALL_IMAGE_QUEUE
+    return IMAGE_QUEUE
+
+
+async def _submit_deduplicated(
+    db, file, user_id, content_hash, header, encoded_bytes, label, image_type, note, priority, job_type
+):
+    """
+    Single-flight wrapper around _create_job: while a job for the same
+    content and job type is in flight for this user, attach to it instead of
+    uploading and charging again. Returns (status_code, body, headers).
+    """
+    coalescing = True
+    try:
+        while True:
+            flight = await single_flight.acquire(user_id, content_hash, job_type.value)
+            if flight is None:
+                break
+            job = await ImageJobRepository(db).get_job_by_id(UUID(flight.job_id))
+            if job is not None and job.status in IN_FLIGHT_STATUSES:
+                return status.HTTP_200_OK, flight.body, {"X-Coalesced-Job-Id": flight.job_id}
+            if await single_flight.take_over(user_id, content_hash, job_type.value, flight):
+                break
+    except IdempotencyConflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="An identical request is still in progress."
+        )
+    except RedisError:
+        logger.warning("Single-flight store unavailable", exc_info=True)
+        coalescing = False
+
+    try:
+        response, job_id = await _create_job(
+            db, file, user_id, header, encoded_bytes, label, image_type, note, priority, job_type
+        )
+    except Exception:
+        if coalescing:
+            try:
+                await single_flight.release(user_id, content_hash, job_type.value)
+            except RedisError:
+                logger.warning("Single-flight store unavailable", exc_info=True)
+        raise
+
+    body = response.model_dump(mode="json")
+    if coalescing:
+        try:
+            await single_flight.publish(user_id, content_hash, job_type.value, str(job_id), body)
+        except RedisError:
+            logger.warning("Single-flight store unavailable", exc_info=True)
+    return status.HTTP_201_CREATED, body, None
+
+
+async def _create_job(
+    db, file, user_id, header, encoded_bytes, label, image_type, note, priority, job_type
+) -> Tuple[ImageResponse, UUID]:
+    try:
         # First upload the image to storage   
         storage_path, _ = await storage_service.upload_file(file, user_id=user_id)
         
@@ -64,6 +243,12 @@ async def upload_image(
             note=note,
             storage_path=storage_path,
             user_id=user_id,  
+            width=header.width,
+            height=header.height,
+            color_mode=header.mode,
+            file_format=header.format,
+            frame_count=header.frame_count,
+            exif_orientation=header.orientation,
         )
         image = await image_repo.create_image(image)
         
@@ -84,7 +269,8 @@ async def upload_image(
             user_id=user_id, 
             job_type=job_type, 
             priority=priority,
-            job_id=str(job.id)  
+            job_id=str(job.id),
+            megapixels=header.total_megapixels,
         )
         
         if not has_sufficient_funds:
@@ -95,18 +281,20 @@ async def upload_image(
                 detail=f"Insufficient funds. This operation requires {price} credits."
             )
         
-        # If payment successful, update status and queue the job
-        await job_repo.update_job_status(job.id, ImageStatus.QUEUED)
-        
-        # Queue task for processing
-        process_image.delay(
-            image_id=str(image.id),
-            job_id=str(job.id),
-            storage_path=storage_path,
-            job_type=job_type
+        # If payment successful, mark the job QUEUED and write the task to
+        # the outbox in one transaction; the outbox dispatcher publishes it
+        await job_repo.queue_job(
+            job.id,
+            task_name="process_image",
+            task_kwargs={
+                "image_id": str(image.id),
+                "job_id": str(job.id),
+                "storage_path": storage_path,
+                "job_type": job_type.value,
+            },
+            queue=select_queue(header, encoded_bytes, job_type),
+            tenant_id=user_id,
         )
-
-        await job_repo.update_job_status(job.id, ImageStatus.QUEUED)
     
         return ImageResponse(
             id=image.id,
@@ -115,12 +303,17 @@ async def upload_image(
             image_type=image.image_type,
             note=image.note,
             storage_path=image.storage_path,
+            width=image.width,
+            height=image.height,
+            frame_count=image.frame_count,
             created_at=image.created_at,
             updated_at=image.updated_at
-        )
+        ), job.id
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.exception("Image upload failed", extra={"job_type": job_type, "priority": priority})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An error occurred: {str(e)}"
@@ -0,0 +1,70 @@
+import secrets
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.middleware.authentication import supabaseauth
+from app.models.webhook import WebhookSubscription
+from app.repositories.webhook_repository import WebhookRepository
+from app.schemas.webhooks import (
+    WebhookSubscriptionCreate,
+    WebhookSubscriptionCreated,
+    WebhookSubscriptionList,
+    WebhookSubscriptionResponse,
+)
+from app.services.webhooks import UnsafeWebhookTarget, resolve_webhook_address
+
+router = APIRouter(
+    prefix="/webhooks",
+    tags=["webhooks"],
+    dependencies=[Depends(supabaseauth.get_current_user)],
+)
+
+
+@router.post("", response_model=WebhookSubscriptionCreated, status_code=status.HTTP_201_CREATED)
+async def create_subscription(
+    body: WebhookSubscriptionCreate,
+    user: dict = Depends(supabaseauth.get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Subscribe a URL to the user's job.completed / job.failed events.
+    The signing secret is returned in this response only. The URL must be
+    https and resolve to public addresses only.
+    """
+    try:
+        await resolve_webhook_address(str(body.url))
+    except UnsafeWebhookTarget as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+    subscription = WebhookSubscription(
+        user_id=user["id"],
+        url=str(body.url),
+        secret=secrets.token_hex(32),
+    )
+    subscription = await WebhookRepository(db).create_subscription(subscription)
+    return WebhookSubscriptionCreated.model_validate(subscription)
+
+
+@router.get("", response_model=WebhookSubscriptionList)
+async def list_subscriptions(
+    user: dict = Depends(supabaseauth.get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    subscriptions = await WebhookRepository(db).list_subscriptions(user["id"])
+    return WebhookSubscriptionList(
+        items=[WebhookSubscriptionResponse.model_validate(s) for s in subscriptions]
+    )
+
+
+@router.delete("/{subscription_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_subscription(
+    subscription_id: UUID,
+    user: dict = Depends(supabaseauth.get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    deleted = await WebhookRepository(db).delete_subscription(subscription_id, user["id"])
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
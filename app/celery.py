@@ -1,18 +1,33 @@
 from celery import Celery
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Any, Dict, List
+from celery.signals import worker_process_init
+
+from app.core.queues import IMAGE_QUEUE, IMAGE_QUEUES, LARGE_IMAGE_QUEUE, SMALL_IMAGE_QUEUE
 
 class CeleryConfig(BaseSettings):
     broker_url: str = "redis://localhost:6379/0"
     result_backend: str = "redis://localhost:6379/0"
-    accept_content: List[str] = ["json"]
-    task_serializer: str = "json"
+    # msgpack keeps task messages compact; json is still accepted for
+    # messages published before the switch
+    accept_content: List[str] = ["msgpack", "json"]
+    task_serializer: str = "msgpack"
     result_serializer: str = "json"
     timezone: str = "UTC"
     enable_utc: bool = True
     task_track_started: bool = True
     task_time_limit: int = 600  # 10 minutes max task execution time
     worker_prefetch_multiplier: int = 1  # Process tasks one at a time
+    # Task modules are imported by the worker only; publishers (the API) send
+    # by task name and never load PIL or the processing code
+    include: List[str] = ["app.tasks.processimage", "app.tasks.rebalancewallets"]
+    task_routes: Dict[str, Dict[str, str]] = {"process_image": {"queue": IMAGE_QUEUE}}
+    beat_schedule: Dict[str, Dict[str, Any]] = {
+        "rebalance-wallet-shards": {
+            "task": "rebalance_wallet_shards",
+            "schedule": 10.0,  # seconds
+        },
+    }
 
 
 def create_celery_app() -> Celery:
@@ -22,5 +37,15 @@ def create_celery_app() -> Celery:
 
 celeryapp = create_celery_app()
 
-# Import tasks so Celery can register them
-import app.tasks.processimage
\ No newline at end of file
+
+@worker_process_init.connect
+def warm_up_worker_process(**kwargs):
+    """
+    Runs in every prefork child after fork: initialise Pillow's plugins and
+    open the child's own DB pool connection before the first task arrives.
+    """
+    from app.database import warm_up_sync_pool
+    from app.services.image_processor.processors import warm_up
+
+    warm_up()
+    warm_up_sync_pool()
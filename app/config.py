@@ -1,3 +1,5 @@
+from functools import lru_cache
+from typing import Dict, Optional
 
 from pydantic_settings import BaseSettings
 
@@ -11,18 +13,195 @@ class Settings(BaseSettings):
     SUPABASE_BUCKET: str
     SUPABASE_AUTH_JWKS_URL: str
     SUPABASE_PROJECT_ID: str
+    SUPABASE_JWT_AUDIENCE: str = "authenticated"
     
     RAZORPAY_KEY_SECRET:str
     RAZORPAY_KEY_ID: str
+    RAZORPAY_WEBHOOK_SECRET: Optional[str] = None
     DATABASE_URL: str
+    # Optional streaming replica for read-only routes
+    DATABASE_REPLICA_URL: Optional[str] = None
     
     sql_echo: bool = False
     db_pool_size: int = 5
     db_max_overflow: int = 10
     db_pool_timeout: int = 30
     db_pool_recycle: int = 1800
+    # Reads fall back to the primary while the replica lags by more than this
+    db_replica_max_lag_seconds: float = 5.0
+    db_replica_lag_check_interval: float = 5.0
+
+    auth_jwks_cache_ttl: int = 600
+    # Floor between refreshes triggered by an unknown `kid`
+    auth_jwks_min_refresh_interval: int = 30
+    auth_token_cache_size: int = 1024
+    auth_leeway_seconds: int = 10
+
+    # "razorpay" or "stub" (in-memory gateway for local development and tests)
+    payment_gateway: str = "razorpay"
+    razorpay_api_url: str = "https://api.razorpay.com/v1"
+    razorpay_connect_timeout_seconds: float = 3.0
+    razorpay_read_timeout_seconds: float = 10.0
+    razorpay_max_retries: int = 3
+    razorpay_backoff_base_seconds: float = 0.25
+    # When the webhook has not credited a payment yet, verify-payment fetches it
+    # from the provider instead of answering 202 "pending"
+    razorpay_verify_fetch_fallback: bool = True
+
+    redis_url: str = "redis://localhost:6379/1"
+
+    # Upload rate limits per priority tier: token bucket refilled at `rate`
+    # requests per second, holding at most `burst` tokens
+    rate_limit_enabled: bool = True
+    rate_limit_tiers: Dict[str, Dict[str, float]] = {
+        "low": {"rate": 0.5, "burst": 10},
+        "medium": {"rate": 1.0, "burst": 20},
+        "high": {"rate": 2.0, "burst": 30},
+        "urgent": {"rate": 2.0, "burst": 30},
+    }
+
+    # Per-tenant jobs are held in Redis sub-queues and released round-robin,
+    # keeping at most this many messages waiting in the broker's images queue
+    fair_share_enabled: bool = True
+    fair_share_broker_depth: int = 50
+    # A task taken from a tenant queue is restored if not published within this
+    fair_share_lease_seconds: float = 60.0
+
+    # GET /jobs/{id}/output: "redirect" (302 to a cached signed URL) or
+    # "proxy" (stream through the API with Range support)
+    job_output_delivery: str = "redirect"
+    job_output_url_ttl_seconds: int = 3600
+    job_output_url_cache_size: int = 4096
+    # Cache-Control scope for immutable outputs; use "public" only behind a
+    # CDN that keys its cache on the Authorization header
+    job_output_cache_scope: str = "private"
+
+    # Redis cache of wallet balances, kept current on every balance write;
+    # the TTL only bounds staleness if Redis missed a write
+    balance_cache_enabled: bool = True
+    balance_cache_ttl_seconds: int = 30
+    balance_cache_metrics_interval: float = 60.0
+
+    # Upload deduplication: how long Idempotency-Key responses are replayed,
+    # how long an unfinished request holds its key, and how long identical
+    # in-flight uploads attach to the first one's job
+    idempotency_ttl_seconds: int = 86400
+    idempotency_lock_ttl_seconds: int = 60
+    single_flight_ttl_seconds: int = 900
+    single_flight_wait_seconds: float = 10.0
+
+    # Webhook dispatcher: events per delivery and how long a partial batch
+    # may wait, delivery attempts before dead-lettering and their backoff
+    webhook_batch_size: int = 50
+    webhook_batch_window_ms: int = 500
+    webhook_max_attempts: int = 8
+    webhook_backoff_base_seconds: float = 5.0
+    webhook_backoff_max_seconds: float = 3600.0
+    webhook_timeout_seconds: float = 10.0
+    webhook_max_concurrency: int = 64
+    webhook_claim_size: int = 500
+    webhook_lease_seconds: float = 60.0
+    webhook_poll_interval: float = 0.2
+    webhook_metrics_interval: float = 30.0
+    # Local development only: accept http:// and private or loopback
+    # subscriber URLs (e.g. the receiver stub on localhost)
+    webhook_allow_private_targets: bool = False
+
+    # Outbox dispatcher: a message that fails to publish is retried with
+    # exponential backoff and dead-lettered after outbox_max_attempts
+    outbox_batch_size: int = 500
+    outbox_poll_interval: float = 0.2
+    outbox_max_attempts: int = 10
+    outbox_backoff_base_seconds: float = 1.0
+    outbox_backoff_max_seconds: float = 300.0
+
+    # Pipelined image worker: concurrent storage transfers, CPU processes
+    # (0 = one per core) and the bound on each inter-stage queue
+    pipeline_io_concurrency: int = 32
+    pipeline_cpu_workers: int = 0
+    pipeline_queue_size: int = 64
+
+    # Host-wide decode memory budget shared by all worker processes
+    # (0 = half of physical memory). Jobs estimated above the large-image
+    # threshold are moved to the large-image queue; jobs that cannot reserve
+    # within the wait are requeued after the requeue delay.
+    worker_memory_budget_mb: int = 0
+    worker_memory_budget_path: str = "/tmp/image-workers-memory-budget.json"
+    worker_memory_wait_seconds: float = 10.0
+    worker_memory_requeue_seconds: int = 15
+    large_image_threshold_mb: int = 512
+    # Uploads are routed to images.small up to this size (single frame)
+    small_image_max_megapixels: float = 1.0
+    # Uploads whose header declares more pixels per frame, or more frames,
+    # are rejected before anything is stored
+    upload_max_megapixels: float = 100.0
+    upload_max_frames: int = 1000
+    # Jobs on images up to this size cost the base price; larger ones cost
+    # proportionally more
+    pricing_included_megapixels: float = 12.0
+
+    # Image processing backends: JSON profile written by
+    # `python -m app.services.image_processor.backends`, or calibrate when the
+    # worker starts (the result is saved to the profile path when set)
+    image_backend_profile_path: Optional[str] = None
+    image_backend_calibrate: bool = False
+
+    # Storage client: connect timeout and read timeout per operation
+    # (download, upload, sign, list, delete), attempts with full-jitter
+    # backoff, and a per-process circuit breaker that refuses calls for
+    # `storage_breaker_reset_seconds` after that many consecutive failures.
+    # With hedging on, a download still running at the observed latency
+    # percentile gets a second identical request; the first response wins.
+    storage_connect_timeout_seconds: float = 3.0
+    storage_read_timeouts: Dict[str, float] = {
+        "download": 30.0,
+        "upload": 60.0,
+        "sign": 5.0,
+        "list": 15.0,
+        "delete": 15.0,
+    }
+    storage_max_attempts: int = 3
+    storage_retry_base_seconds: float = 0.2
+    storage_retry_max_seconds: float = 5.0
+    storage_breaker_failure_threshold: int = 5
+    storage_breaker_reset_seconds: float = 30.0
+    storage_hedge_enabled: bool = False
+    storage_hedge_percentile: float = 0.95
+    storage_hedge_min_samples: int = 50
+
+    # Storage lifecycle worker: days to keep outputs per job type (types not
+    # listed are kept forever), how old an unreferenced object must be before
+    # it is collected (uploads land in storage before their rows commit), and
+    # listing/delete batch sizes
+    storage_retention_days: Dict[str, int] = {}
+    storage_orphan_grace_hours: float = 24.0
+    storage_lifecycle_page_size: int = 1000
+    storage_lifecycle_delete_batch_size: int = 1000
+    storage_lifecycle_max_deletes_per_run: int = 100000
+    storage_lifecycle_interval_seconds: float = 3600.0
+    storage_lifecycle_dry_run: bool = False
+
+    # Responses of at least this size are gzip (or brotli, with brotli-asgi
+    # installed) compressed for clients that accept it
+    response_compression_enabled: bool = True
+    response_compression_min_bytes: int = 4096
+
+    log_level: str = "INFO"
+    # Fraction of /health requests written to the access log (5xx always logged)
+    log_health_sample_rate: float = 0.01
 
     class Config:
         env_file = ".env"
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+def __getattr__(name: str):
+    # `settings` is built on first access rather than at import, so importing
+    # a module that merely references it does not read the environment
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
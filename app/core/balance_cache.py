@@ -0,0 +1,190 @@
+"""
+Redis cache of wallet balances (wallet row plus shards), keyed by user.
+
+Fills are ordered by the wallet row's `version` column, which every write
+to the balance or shard_count bumps, and all cache calls happen after the
+write has committed, so Redis latency never adds to the row lock hold time.
+A write that changes a balance either:
+
+- knows the new total and version from its UPDATE ... RETURNING: it stores
+  them with `complete_write`, which only replaces an entry of an older
+  version, so a slow writer or a reader that loaded the balance before the
+  commit can never leave an older balance behind.
+- does not (sharded wallets): it calls `invalidate`, which bumps the user's
+  epoch counter. Entries are only read back at the epoch they were stored
+  in, and a reader only fills if the epoch did not move while it loaded.
+  Passing the wallet version also keeps writers older than it out.
+
+Entries also expire after `balance_cache_ttl_seconds`, which bounds
+staleness if an invalidation is lost (e.g. Redis was unreachable when the
+write committed).
+
+Redis errors are logged and fall through to the database.
+"""
+import logging
+import time
+from decimal import Decimal
+from typing import Awaitable, Callable, Optional, Tuple
+
+from app.config import settings
+from app.core.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Returns {cached balance or false, current epoch}
+_GET_SCRIPT = """
+local epoch = redis.call('GET', KEYS[2]) or '0'
+local entry = redis.call('HMGET', KEYS[1], 'balance', 'epoch')
+if entry[1] and entry[2] == epoch then
+    return {entry[1], epoch}
+end
+return {false, epoch}
+"""
+
+# A reader's fill: ARGV[1] is the epoch read before loading, ARGV[2] the
+# version loaded. Skipped if the epoch moved, or an entry for this epoch or
+# a newer version is already stored (a writer's balance is exact, ours may
+# predate its commit).
+_FILL_SCRIPT = """
+local epoch = redis.call('GET', KEYS[2]) or '0'
+if epoch ~= ARGV[1] then
+    return 0
+end
+local entry = redis.call('HMGET', KEYS[1], 'version', 'epoch')
+if entry[2] == epoch or (entry[1] and tonumber(entry[1]) > tonumber(ARGV[2])) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'balance', ARGV[3], 'version', ARGV[2], 'epoch', epoch)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+# A committed write's balance at version ARGV[1], unless a newer one is stored
+_WRITE_SCRIPT = """
+local version = redis.call('HGET', KEYS[1], 'version')
+if version and tonumber(version) >= tonumber(ARGV[1]) then
+    return 0
+end
+local epoch = redis.call('GET', KEYS[2]) or '0'
+redis.call('HSET', KEYS[1], 'balance', ARGV[2], 'version', ARGV[1], 'epoch', epoch)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# Bump the epoch and raise the entry's version to ARGV[1], if given
+_INVALIDATE_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if ARGV[1] ~= '' then
+    local version = redis.call('HGET', KEYS[1], 'version')
+    if not version or tonumber(version) < tonumber(ARGV[1]) then
+        redis.call('HSET', KEYS[1], 'version', ARGV[1])
+        redis.call('EXPIRE', KEYS[1], ARGV[2])
+    end
+end
+return 1
+"""
+
+# Outlives any entry by far, so a counter is never reset under a live entry
+_EPOCH_TTL_SECONDS = 86400
+
+# Loads (total balance, wallet version), or None if the user has no wallet
+BalanceLoader = Callable[[], Awaitable[Optional[Tuple[Decimal, int]]]]
+
+
+class BalanceCache:
+    def __init__(self, prefix: str = "wallet-balance"):
+        self.prefix = prefix
+        self._registered = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._last_report = time.monotonic()
+
+    def _script(self, name: str):
+        if self._registered is None:
+            redis = get_async_redis()
+            self._registered = {
+                "get": redis.register_script(_GET_SCRIPT),
+                "fill": redis.register_script(_FILL_SCRIPT),
+                "write": redis.register_script(_WRITE_SCRIPT),
+                "invalidate": redis.register_script(_INVALIDATE_SCRIPT),
+            }
+        return self._registered[name]
+
+    def _keys(self, user_id) -> list:
+        return [f"{self.prefix}:{user_id}", f"{self.prefix}:epoch:{user_id}"]
+
+    async def get(self, user_id, loader: BalanceLoader) -> Optional[Decimal]:
+        """Cached balance for the user, loading and caching it on a miss."""
+        if not settings.balance_cache_enabled:
+            loaded = await loader()
+            return loaded[0] if loaded is not None else None
+        try:
+            cached, epoch = await self._script("get")(keys=self._keys(user_id))
+        except Exception:
+            self._record_error()
+            loaded = await loader()
+            return loaded[0] if loaded is not None else None
+
+        if cached is not None:
+            self._record(hit=True)
+            return Decimal(cached.decode())
+        self._record(hit=False)
+        loaded = await loader()
+        if loaded is None:
+            return None
+        balance, version = loaded
+        await self._run(
+            "fill", user_id, [epoch, version, str(balance), settings.balance_cache_ttl_seconds]
+        )
+        return balance
+
+    async def complete_write(self, user_id, version: int, balance: Decimal) -> None:
+        """Store the balance a committed write returned, with the wallet version it set."""
+        if settings.balance_cache_enabled:
+            await self._run("write", user_id, [version, str(balance), settings.balance_cache_ttl_seconds])
+
+    async def invalidate(self, user_id, version: Optional[int] = None) -> None:
+        """
+        Call after committing a write whose new balance is not known, with
+        the wallet version it read or set if there is one.
+        """
+        if settings.balance_cache_enabled:
+            await self._run(
+                "invalidate", user_id,
+                ["" if version is None else version, settings.balance_cache_ttl_seconds, _EPOCH_TTL_SECONDS],
+            )
+
+    async def _run(self, script: str, user_id, args: list) -> None:
+        try:
+            await self._script(script)(keys=self._keys(user_id), args=args)
+        except Exception:
+            self._record_error()
+
+    def _record_error(self) -> None:
+        self.errors += 1
+        logger.warning("Balance cache unavailable", exc_info=True)
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        now = time.monotonic()
+        if now - self._last_report >= settings.balance_cache_metrics_interval:
+            lookups = self.hits + self.misses
+            logger.info(
+                "Balance cache metrics",
+                extra={
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "errors": self.errors,
+                    "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                },
+            )
+            self.hits = self.misses = self.errors = 0
+            self._last_report = now
+
+
+balance_cache = BalanceCache()
@@ -0,0 +1,30 @@
+"""
+Content-addressed storage paths for processed outputs.
+
+An output is stored under the SHA-256 of its bytes, `processed/<sha256>/<name>`,
+so a path never changes content: it can be cached forever and its digest
+doubles as a strong ETag.
+"""
+import hashlib
+import mimetypes
+import re
+from typing import Optional
+
+# Folder holding one `<sha256>/` folder per distinct output
+CONTENT_ROOT = "processed"
+
+_CONTENT_ADDRESSED = re.compile(r"^processed/([0-9a-f]{64})/[^/]+$")
+
+
+def content_addressed_path(data: bytes, name: str) -> str:
+    return f"{CONTENT_ROOT}/{hashlib.sha256(data).hexdigest()}/{name}"
+
+
+def content_digest(path: str) -> Optional[str]:
+    """SHA-256 encoded in a content-addressed path, or None for other paths."""
+    match = _CONTENT_ADDRESSED.match(path)
+    return match.group(1) if match else None
+
+
+def content_type_for(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
@@ -1,16 +1,17 @@
-from fastapi.responses import JSONResponse
+from app.core.responses import DefaultJSONResponse
 from fastapi import Request
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    return JSONResponse(
+    return DefaultJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None),
     )
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    return JSONResponse(
+    return DefaultJSONResponse(
         status_code=422,
         content={"detail": exc.errors()},
     )
@@ -0,0 +1,46 @@
+"""
+Per-attempt timing of image jobs, recorded on ImageJob so queue wait and
+processing time can be reported after the fact (app.services.job_report).
+"""
+import os
+import socket
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import func
+
+# Cleared when an attempt starts, so a retry never reports an earlier attempt's numbers
+_ATTEMPT_FIELDS = ("finished_at", "download_ms", "process_ms", "upload_ms", "input_bytes", "output_bytes")
+
+
+def worker_id(hostname: Optional[str] = None) -> str:
+    return f"{hostname or socket.gethostname()}:{os.getpid()}"
+
+
+def attempt_started(hostname: Optional[str] = None) -> Dict[str, Any]:
+    """ImageJob values for an attempt that is starting now."""
+    return {
+        **dict.fromkeys(_ATTEMPT_FIELDS),
+        "started_at": func.now(),
+        "worker_id": worker_id(hostname),
+    }
+
+
+class StageTimer:
+    """Collects stage durations and byte counts as ImageJob column values."""
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.values[f"{name}_ms"] = round((time.perf_counter() - started) * 1000)
+
+    def finished(self) -> Dict[str, Any]:
+        """Values for the final update of a job that completed or gave up."""
+        return {**self.values, "finished_at": func.now()}
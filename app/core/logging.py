@@ -1,40 +1,107 @@
+import atexit
+import copy
+import json
+import logging
 import os
-from logging.config import dictConfig
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 LOG_DIR = "logs"
 LOG_FILE_PATH = os.path.join(LOG_DIR, "app.log")
 
-def setup_logging():
+# Attributes present on every LogRecord; anything else was passed via `extra=`
+_RESERVED_ATTRS = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None)).keys()
+) | {"message", "asctime", "taskName"}
+
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Render a log record as a single JSON line.
+    Fields passed through `extra=` are emitted as top-level keys.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class _StructuredQueueHandler(QueueHandler):
+    """
+    QueueHandler that keeps `extra=` fields intact for the JSON formatter.
+    The stock prepare() pre-formats the record with a plain Formatter.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level: str = "INFO") -> QueueListener:
+    """
+    Configure the root logger to hand records to a QueueHandler.
+    Formatting and I/O (console + rotating file) happen on the QueueListener's
+    background thread, so logging never blocks the event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
     if not os.path.exists(LOG_DIR):
         os.makedirs(LOG_DIR)
 
-    logging_config = {
-        "version": 1,
-        "disable_existing_loggers": False,
-        "formatters": {
-            "default": {
-                "format": "[%(asctime)s] %(levelname)s in %(name)s: %(message)s",
-            }
-        },
-        "handlers": {
-            "console": {
-                "class": "logging.StreamHandler",
-                "formatter": "default",
-            },
-            "file": {
-               "class": "logging.handlers.RotatingFileHandler",
-               "filename": LOG_FILE_PATH,
-               "formatter": "default",
-               "maxBytes": 10485760,  # 10 MB
-               "backupCount": 5,
-               "encoding": "utf-8"
-            }
-
-        },
-        "root": {
-            "level": "INFO",
-            "handlers": ["console", "file"],
-        },
-    }
-
-    dictConfig(logging_config)
+    formatter = JsonFormatter()
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+
+    file_handler = RotatingFileHandler(
+        LOG_FILE_PATH,
+        maxBytes=10485760,  # 10 MB
+        backupCount=5,
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    _listener = QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(stop_logging)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_StructuredQueueHandler(log_queue))
+    root.setLevel(level)
+
+    return _listener
+
+
+def stop_logging() -> None:
+    """Flush pending records and stop the background listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
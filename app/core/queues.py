@@ -0,0 +1,16 @@
+"""
+Celery queue names. Kept apart from app.celery so that publishers which
+only need to pick a queue (the upload route) do not import Celery.
+"""
+
+# Image jobs get their own queue so they can be served either by a prefork
+# worker (`-Q images`) or by the pipelined worker in app.services.image_pipeline
+IMAGE_QUEUE = "images"
+# Images whose decoded footprint exceeds `large_image_threshold_mb`; served by
+# a low-concurrency worker with a bigger memory budget
+LARGE_IMAGE_QUEUE = "images.large"
+# Single-frame images up to `small_image_max_megapixels`; cheap enough for a
+# high-concurrency worker
+SMALL_IMAGE_QUEUE = "images.small"
+# Every queue process_image jobs are routed to at upload, smallest first
+IMAGE_QUEUES = (SMALL_IMAGE_QUEUE, IMAGE_QUEUE, LARGE_IMAGE_QUEUE)
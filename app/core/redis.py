@@ -0,0 +1,19 @@
+from functools import lru_cache
+
+from app.config import settings
+
+
+@lru_cache
+def get_async_redis():
+    """Process-wide asyncio Redis client (connection pool) for the API."""
+    import redis.asyncio as redis
+
+    return redis.from_url(settings.redis_url)
+
+
+@lru_cache
+def get_sync_redis():
+    """Process-wide blocking Redis client for workers and dispatchers."""
+    import redis
+
+    return redis.from_url(settings.redis_url)
@@ -0,0 +1,31 @@
+"""
+orjson-backed JSON response, used as the application's default response class.
+
+Routes with a `response_model` are serialized by Pydantic straight from ORM
+attributes; this class renders everything else (plain dicts, error bodies).
+orjson is optional: without it responses fall back to the stdlib encoder.
+"""
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    # Money is serialized as a string, like Pydantic does for Decimal
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+DefaultJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
@@ -1,41 +1,98 @@
-from sqlalchemy import create_engine
+import logging
+import time
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base, sessionmaker as sync_sessionmaker
-from app.config import settings
-
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.sql_echo,
-    pool_size=settings.db_pool_size,
-    max_overflow=settings.db_max_overflow,
-    pool_timeout=settings.db_pool_timeout,
-    pool_recycle=settings.db_pool_recycle,
-)
+from app.config import get_settings
 
-async_session = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+# Engines are created on first use: the API never builds the psycopg2 engine
+# and Celery workers never build the asyncpg one (creating an engine imports
+# its DBAPI). Module attributes such as `engine` and `SessionLocal` resolve
+# through __getattr__ below, so existing imports keep working.
+
+
+def _pool_options() -> dict:
+    settings = get_settings()
+    return dict(
+        echo=settings.sql_echo,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+
+
+@lru_cache
+def get_async_engine():
+    return create_async_engine(get_settings().DATABASE_URL, **_pool_options())
+
+
+@lru_cache
+def get_async_sessionmaker():
+    return sessionmaker(
+        get_async_engine(), class_=AsyncSession, expire_on_commit=False
+    )
+
+
+@lru_cache
+def get_replica_engine():
+    replica_url = get_settings().DATABASE_REPLICA_URL
+    if not replica_url:
+        return None
+    return create_async_engine(replica_url, **_pool_options())
+
+
+@lru_cache
+def get_replica_sessionmaker():
+    replica_engine = get_replica_engine()
+    if replica_engine is None:
+        return None
+    return sessionmaker(
+        replica_engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+
 # Create a synchronous engine for Celery tasks
-sync_engine = create_engine(
-    settings.DATABASE_URL.replace("asyncpg", "psycopg2"),  # For PostgreSQL, adjust if needed
-    echo=settings.sql_echo,
-    pool_size=settings.db_pool_size,
-    max_overflow=settings.db_max_overflow,
-    pool_timeout=settings.db_pool_timeout,
-    pool_recycle=settings.db_pool_recycle,
-)
+@lru_cache
+def get_sync_engine():
+    return create_engine(
+        get_settings().DATABASE_URL.replace("asyncpg", "psycopg2"),  # For PostgreSQL, adjust if needed
+        **_pool_options(),
+    )
+
+
+@lru_cache
+def get_sync_sessionmaker():
+    return sync_sessionmaker(
+        bind=get_sync_engine(),
+        autocommit=False,
+        autoflush=False,
+    )
+
+
+async def warm_up_async_pool() -> None:
+    """Open a pooled connection (primary and replica) ahead of the first request."""
+    for db_engine in (get_async_engine(), get_replica_engine()):
+        if db_engine is not None:
+            async with db_engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+
+
+def warm_up_sync_pool() -> None:
+    """Open a pooled connection ahead of the first task."""
+    with get_sync_engine().connect() as connection:
+        connection.execute(text("SELECT 1"))
 
-SessionLocal = sync_sessionmaker(
-    bind=sync_engine,
-    autocommit=False,
-    autoflush=False,
-)
 
 async def get_db():
-    async with async_session() as session:
+    async with get_async_sessionmaker()() as session:
         try:
             yield session
             await session.commit()
@@ -43,4 +100,89 @@ async def get_db():
             await session.rollback()
             raise
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+
+# Zero when the replica has replayed everything it received, otherwise the
+# age of the last replayed transaction
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class SessionRouter:
+    """
+    Chooses the session factory for read-only work: the replica when one is
+    configured and its replication lag is within `max_lag`, otherwise the
+    primary. Lag is sampled at most once per `check_interval`.
+    """
+
+    def __init__(self, primary, replica=None, max_lag: float = 5.0, check_interval: float = 5.0):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._replica_ok = replica is not None
+        self._checked_at = 0.0
+
+    async def _check_replica(self) -> None:
+        self._checked_at = time.monotonic()
+        try:
+            async with self.replica() as session:
+                lag: Optional[float] = (await session.execute(REPLICA_LAG_QUERY)).scalar()
+            healthy = lag is not None and float(lag) <= self.max_lag
+        except Exception:
+            logger.exception("Replica lag check failed")
+            lag, healthy = None, False
+        if healthy != self._replica_ok:
+            logger.warning(
+                "Read routing changed",
+                extra={"target": "replica" if healthy else "primary", "replica_lag_s": lag},
+            )
+        self._replica_ok = healthy
+
+    async def reader(self):
+        if self.replica is None:
+            return self.primary
+        if time.monotonic() - self._checked_at > self.check_interval:
+            await self._check_replica()
+        return self.replica if self._replica_ok else self.primary
+
+
+@lru_cache
+def get_session_router() -> SessionRouter:
+    settings = get_settings()
+    return SessionRouter(
+        get_async_sessionmaker(),
+        get_replica_sessionmaker(),
+        max_lag=settings.db_replica_max_lag_seconds,
+        check_interval=settings.db_replica_lag_check_interval,
+    )
+
+
+async def get_read_db():
+    """
+    Session for read-only routes: served from the replica when it is healthy,
+    and never committed.
+    """
+    session_factory = await get_session_router().reader()
+    async with session_factory() as session:
+        yield session
+
+
+_LAZY_ATTRIBUTES = {
+    "engine": get_async_engine,
+    "async_session": get_async_sessionmaker,
+    "replica_engine": get_replica_engine,
+    "replica_session": get_replica_sessionmaker,
+    "sync_engine": get_sync_engine,
+    "SessionLocal": get_sync_sessionmaker,
+    "session_router": get_session_router,
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
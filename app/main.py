@@ -1,19 +1,67 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.datastructures import Default
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from app.core.logging import setup_logging
+from app.middleware.compression import CompressionMiddleware
 from app.middleware.logging import LoggingMiddleware
+from app.config import settings
 from app.core.exceptions import http_exception_handler, validation_exception_handler
-from app.api.routes import health, payment, upload
+from app.api.routes import health, images, jobs, payment, upload, webhooks
+from app.core.redis import get_async_redis
+from app.core.responses import DefaultJSONResponse
+from app.database import get_async_engine, warm_up_async_pool
+from app.services.payment_gateway import get_payment_gateway
+from app.services.storage_service import close_storage_client, open_storage_client
 
-setup_logging()
+setup_logging(settings.log_level)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Image task FastAPI Application")
-app.add_middleware(LoggingMiddleware)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up happens here, not at import: open pooled DB connections (best effort).
+    try:
+        await warm_up_async_pool()
+    except Exception:
+        logger.exception("Database warm-up failed")
+    open_storage_client()
+    yield
+    await close_storage_client()
+    await get_payment_gateway().aclose()
+    if get_async_redis.cache_info().currsize:
+        await get_async_redis().aclose()
+    await get_async_engine().dispose()
+
+
+# Wrapped in Default() so routes with a response_model keep FastAPI's
+# Pydantic fast path; the class renders plain dict responses
+app = FastAPI(
+    title="Image task FastAPI Application",
+    lifespan=lifespan,
+    default_response_class=Default(DefaultJSONResponse),
+)
+if settings.response_compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.response_compression_min_bytes,
+        # Job outputs are already-compressed images and may be Range requests
+        exclude_paths=[r"^/jobs/[^/]+/output$"],
+    )
+app.add_middleware(
+    LoggingMiddleware,
+    sample_rates={"/health": settings.log_health_sample_rate},
+)
 
 app.include_router(health.router)
 app.include_router(upload.router)
+app.include_router(images.router)
+app.include_router(jobs.router)
 app.include_router(payment.router)
+app.include_router(payment.webhook_router)
+app.include_router(webhooks.router)
 
 app.add_exception_handler(StarletteHTTPException, http_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -1,27 +1,166 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
 import httpx
 from fastapi import HTTPException, status, Request
-from jose import JWTError
+from jose import JWTError, jwt
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Asymmetric algorithms only: a JWKS never carries a shared HMAC secret.
+ALLOWED_ALGORITHMS = ("RS256", "ES256")
+# Share of the TTL after which the JWKS is refreshed in the background
+REFRESH_AHEAD = 0.8
+
+
 class SupabaseAuth:
+    """
+    Verifies Supabase access tokens locally against a cached JWKS.
+
+    - The JWKS is refreshed in the background once it is older than
+      REFRESH_AHEAD x `jwks_cache_ttl`, and inline when a token carries an
+      unknown `kid`; concurrent refreshes are collapsed into one. If a
+      refresh fails, the cached keys keep being served.
+    - Verified claims are kept in a small LRU keyed by the token's SHA-256,
+      so repeat requests with the same token skip signature verification.
+    - The result is memoized on `request.state`, so several dependencies on
+      `get_current_user` in one request verify the token only once.
+    """
+
     def __init__(self):
         self.project_id = settings.SUPABASE_PROJECT_ID
         self.jwks_url = settings.SUPABASE_AUTH_JWKS_URL
         self.supabasekey = settings.SUPABASE_KEY
-        self._jwks_cache = None
-
-    async def get_jwks(self, user_token=None):
-        if self._jwks_cache is None:
-            headers = {"apikey": self.supabasekey}
-            if user_token:
-                headers["Authorization"] = f"Bearer {user_token}"
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(self.jwks_url, headers=headers)
-                resp.raise_for_status()
-                self._jwks_cache = resp.json()
-        return self._jwks_cache
+        self.audience = settings.SUPABASE_JWT_AUDIENCE
+        self.jwks_cache_ttl = settings.auth_jwks_cache_ttl
+        self.jwks_min_refresh_interval = settings.auth_jwks_min_refresh_interval
+        self.token_cache_size = settings.auth_token_cache_size
+        self.leeway = settings.auth_leeway_seconds
+
+        self._keys_by_kid: Dict[str, Dict[str, Any]] = {}
+        self._jwks_fetched_at: float = 0.0
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._refresh_failed_at: float = 0.0
+        self._background_refresh: Optional[asyncio.Task] = None
+        self._token_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def _lock(self) -> asyncio.Lock:
+        # Created lazily so the lock binds to the running event loop
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        return self._refresh_lock
+
+    async def _fetch_jwks(self) -> Dict[str, Any]:
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            resp = await client.get(self.jwks_url, headers={"apikey": self.supabasekey})
+            resp.raise_for_status()
+            return resp.json()
+
+    async def refresh_jwks(self, seen_at: float) -> None:
+        """
+        Refresh the key set unless another caller already did so after `seen_at`.
+        A failed refresh keeps the cached keys and is not retried for
+        `jwks_min_refresh_interval`; it only raises when no keys are cached.
+        """
+        async with self._lock():
+            if self._jwks_fetched_at > seen_at:
+                return
+            if self._keys_by_kid and time.monotonic() - self._refresh_failed_at < self.jwks_min_refresh_interval:
+                return
+            try:
+                jwks = await self._fetch_jwks()
+            except (httpx.HTTPError, ValueError):
+                self._refresh_failed_at = time.monotonic()
+                if not self._keys_by_kid:
+                    raise
+                logger.warning(
+                    "JWKS refresh failed, serving cached keys",
+                    exc_info=True,
+                    extra={"jwks_url": self.jwks_url, "key_age_s": round(time.monotonic() - self._jwks_fetched_at)},
+                )
+                return
+            self._keys_by_kid = {key["kid"]: key for key in jwks.get("keys", []) if "kid" in key}
+            self._jwks_fetched_at = time.monotonic()
+            logger.info("JWKS refreshed", extra={"key_count": len(self._keys_by_kid)})
+
+    async def get_signing_key(self, kid: str) -> Optional[Dict[str, Any]]:
+        seen_at = self._jwks_fetched_at
+        age = time.monotonic() - seen_at
+        if not self._keys_by_kid:
+            await self.refresh_jwks(seen_at)
+        elif kid not in self._keys_by_kid and age > self.jwks_min_refresh_interval:
+            # Key rotation: the issuer may have published a new key
+            await self.refresh_jwks(seen_at)
+        elif age > self.jwks_cache_ttl * REFRESH_AHEAD:
+            self._refresh_in_background(seen_at)
+        return self._keys_by_kid.get(kid)
+
+    def _refresh_in_background(self, seen_at: float) -> None:
+        if self._background_refresh is not None and not self._background_refresh.done():
+            return
+        # Keys are cached, so refresh_jwks logs failures instead of raising
+        self._background_refresh = asyncio.create_task(self.refresh_jwks(seen_at))
+
+    def _cached_claims(self, token_hash: str) -> Optional[Dict[str, Any]]:
+        claims = self._token_cache.get(token_hash)
+        if claims is None:
+            return None
+        if claims.get("exp", 0) + self.leeway <= time.time():
+            del self._token_cache[token_hash]
+            return None
+        self._token_cache.move_to_end(token_hash)
+        return claims
+
+    def _store_claims(self, token_hash: str, claims: Dict[str, Any]) -> None:
+        self._token_cache[token_hash] = claims
+        self._token_cache.move_to_end(token_hash)
+        while len(self._token_cache) > self.token_cache_size:
+            self._token_cache.popitem(last=False)
+
+    async def verify_token(self, token: str) -> Dict[str, Any]:
+        """
+        Verify signature, expiry and audience; returns the token claims with
+        `id` set to the subject.
+        """
+        token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        claims = self._cached_claims(token_hash)
+        if claims is not None:
+            return claims
+
+        header = jwt.get_unverified_header(token)
+        kid = header.get("kid")
+        alg = header.get("alg")
+        if not kid or alg not in ALLOWED_ALGORITHMS:
+            raise JWTError("Unsupported token header")
+
+        key = await self.get_signing_key(kid)
+        if key is None:
+            raise JWTError("Unknown signing key")
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[key.get("alg", alg)],
+            audience=self.audience,
+            options={"leeway": self.leeway},
+        )
+        if "exp" not in claims or "sub" not in claims:
+            raise JWTError("Token is missing required claims")
+        claims["id"] = claims["sub"]
+
+        self._store_claims(token_hash, claims)
+        return claims
 
     async def get_current_user(self, request: Request):
+        cached = getattr(request.state, "current_user", None)
+        if cached is not None:
+            return cached
+
         auth_header = request.headers.get("Authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
             raise HTTPException(
@@ -30,13 +169,21 @@ class SupabaseAuth:
             )
         token = auth_header.split(" ")[1]
         try:
-            jwks = await self.get_jwks(user_token=token)         
-            return jwks
+            claims = await self.verify_token(token)
         except JWTError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid or expired token"
             )
+        except httpx.HTTPError:
+            logger.exception("JWKS fetch failed", extra={"jwks_url": self.jwks_url})
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service unavailable"
+            )
+
+        request.state.current_user = claims
+        return claims
 
 
-supabaseauth=SupabaseAuth()
\ No newline at end of file
+supabaseauth=SupabaseAuth()
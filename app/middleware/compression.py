@@ -0,0 +1,32 @@
+import re
+from typing import Sequence
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class CompressionMiddleware:
+    """
+    Compress responses of at least `minimum_size` bytes with brotli when the
+    optional `brotli-asgi` package is installed (gzip for clients that do not
+    accept br), otherwise with gzip.
+
+    Paths matching `exclude_paths` bypass compression entirely: image bytes
+    do not shrink, and ranged responses must not be re-encoded.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int, exclude_paths: Sequence[str] = ()):
+        self.app = app
+        self.exclude = [re.compile(pattern) for pattern in exclude_paths]
+        try:
+            from brotli_asgi import BrotliMiddleware
+
+            self.compressed = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        except ImportError:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or any(p.match(scope.get("path", "")) for p in self.exclude):
+            await self.app(scope, receive, send)
+            return
+        await self.compressed(scope, receive, send)
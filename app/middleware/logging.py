@@ -1,20 +1,59 @@
-import time
 import logging
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+import random
+import time
+from typing import Dict, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger("request_logger")
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = (time.time() - start_time) * 1000
 
-        logger.info(
-            f"{request.method} {request.url.path} - "
-            f"Status: {response.status_code} - "
-            f"Time: {process_time:.2f}ms"
-        )
+class LoggingMiddleware:
+    """
+    Pure ASGI access-log middleware.
+
+    Unlike BaseHTTPMiddleware it does not spawn a task per request or buffer
+    the response body; it only observes `http.response.start` for the status.
+    Paths listed in `sample_rates` are logged with the given probability,
+    except for 5xx responses which are always logged.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rates: Optional[Dict[str, float]] = None):
+        self.app = app
+        self.sample_rates = sample_rates or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+        response_bytes = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
 
-        return response
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = scope.get("path", "")
+            rate = self.sample_rates.get(path)
+            if rate is None or status_code >= 500 or random.random() < rate:
+                client = scope.get("client")
+                logger.info(
+                    "request",
+                    extra={
+                        "method": scope.get("method"),
+                        "path": path,
+                        "status": status_code,
+                        "duration_ms": round((time.perf_counter() - start_time) * 1000, 2),
+                        "response_bytes": response_bytes,
+                        "client_ip": client[0] if client else None,
+                    },
+                )
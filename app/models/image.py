@@ -1,11 +1,16 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, DateTime, String, Text
+from sqlalchemy import Column, DateTime, Index, Integer, SmallInteger, String, Text
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
 
 class Image(Base):
     __tablename__ = "images"
+    __table_args__ = (
+        Index("ix_images_user_id_created_at", "user_id", "created_at", "id"),
+        # Storage reconciliation looks objects up by path
+        Index("ix_images_storage_path", "storage_path"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), nullable=False)  # Added user_id field
@@ -13,6 +18,13 @@ class Image(Base):
     image_type = Column(String, nullable=False) 
     note = Column(Text, nullable=True)
     storage_path = Column(String, nullable=False)
+    # Read from the image header at upload; NULL for images uploaded before
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    color_mode = Column(String(16), nullable=True)
+    file_format = Column(String(16), nullable=True)
+    frame_count = Column(Integer, nullable=True)
+    exif_orientation = Column(SmallInteger, nullable=True)
     created_at = Column(DateTime(timezone=True), default=datetime.now, nullable=False)
     updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now, nullable=False)
 
@@ -27,6 +39,12 @@ class Image(Base):
             "image_type": self.image_type,
             "note": self.note,
             "storage_path": self.storage_path,
+            "width": self.width,
+            "height": self.height,
+            "color_mode": self.color_mode,
+            "file_format": self.file_format,
+            "frame_count": self.frame_count,
+            "exif_orientation": self.exif_orientation,
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
         }
@@ -1,6 +1,6 @@
 from datetime import datetime
 import uuid
-from sqlalchemy import UUID, Column, DateTime, Enum, ForeignKey, String
+from sqlalchemy import UUID, BigInteger, Column, DateTime, Enum, ForeignKey, Index, Integer, String, text
 from app.database import Base
 import enum
 
@@ -19,8 +19,33 @@ class JobType(str, enum.Enum):
     THUMBNAIL = "thumbnail"
     GRAYSCALE = "grayscale"
 
+class JobPriority(str, enum.Enum):
+    """Priority tiers an upload may ask for; matched case-insensitively."""
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
+    URGENT = "urgent"
+
+    @classmethod
+    def _missing_(cls, value):
+        if isinstance(value, str):
+            return cls.__members__.get(value.upper())
+        return None
+
 class ImageJob(Base):
     __tablename__ = "image_jobs"
+    __table_args__ = (
+        Index("ix_image_jobs_image_id", "image_id"),
+        Index(
+            "ix_image_jobs_storage_path",
+            "storage_path",
+            postgresql_where=text("storage_path IS NOT NULL"),
+        ),
+        # Latency reports scan recent finished jobs
+        Index("ix_image_jobs_finished_at", "finished_at"),
+        # Storage lifecycle: which processed/<digest>/ folders are still referenced
+        Index("ix_image_jobs_storage_digest", text("split_part(storage_path, '/', 2)")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     image_id = Column(UUID(as_uuid=True), ForeignKey("images.id", ondelete="CASCADE"), nullable=False)
@@ -30,6 +55,17 @@ class ImageJob(Base):
     storage_path = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), default=datetime.now, nullable=False)
     updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now, nullable=False)
+    # Lifecycle timestamps, from the database clock so API and worker hosts agree.
+    # started_at and the fields below describe the latest processing attempt.
+    queued_at = Column(DateTime(timezone=True), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    download_ms = Column(Integer, nullable=True)
+    process_ms = Column(Integer, nullable=True)
+    upload_ms = Column(Integer, nullable=True)
+    input_bytes = Column(BigInteger, nullable=True)
+    output_bytes = Column(BigInteger, nullable=True)
+    worker_id = Column(String(255), nullable=True)
 
     def __repr__(self):
         return f"<ImageJob {self.id}: {self.job_type} ({self.status})>"
@@ -44,4 +80,13 @@ class ImageJob(Base):
             "storage_path": self.storage_path,
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
+            "queued_at": self.queued_at.isoformat() if self.queued_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "download_ms": self.download_ms,
+            "process_ms": self.process_ms,
+            "upload_ms": self.upload_ms,
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+            "worker_id": self.worker_id,
         }
@@ -0,0 +1,46 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Column, DateTime, Identity, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
+from app.database import Base
+
+
+class OutboxMessage(Base):
+    """
+    A Celery task waiting to be published. Rows are written in the same
+    transaction as the state change that calls for the task and removed by
+    the outbox dispatcher once the broker has accepted them.
+    """
+    __tablename__ = "outbox"
+    __table_args__ = (Index("ix_outbox_next_attempt_at", "next_attempt_at", "id"),)
+
+    id = Column(BigInteger, Identity(always=False), primary_key=True)
+    task_name = Column(String, nullable=False)
+    kwargs = Column(JSONB, nullable=False)
+    queue = Column(String, nullable=True)
+    # Set for per-tenant work; such messages go through the fair-share queue
+    tenant_id = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # Pushed back after a failed publish, so one bad message does not hold up the rest
+    next_attempt_at = Column(DateTime(timezone=True), default=datetime.now, server_default=text("now()"), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=datetime.now, nullable=False)
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id}: {self.task_name}>"
+
+
+class OutboxDeadLetter(Base):
+    """A message that exhausted its publish attempts."""
+    __tablename__ = "outbox_dead_letters"
+
+    id = Column(BigInteger, primary_key=True)
+    task_name = Column(String, nullable=False)
+    kwargs = Column(JSONB, nullable=False)
+    queue = Column(String, nullable=True)
+    tenant_id = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    failed_at = Column(DateTime(timezone=True), default=datetime.now, nullable=False)
+
+    def __repr__(self):
+        return f"<OutboxDeadLetter {self.id}: {self.task_name}>"
@@ -1,7 +1,7 @@
 import enum
 import uuid
 from datetime import datetime
-from sqlalchemy import DECIMAL, Column, DateTime, Enum, String, ForeignKey
+from sqlalchemy import DECIMAL, Column, DateTime, Enum, String, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
 
@@ -15,6 +15,17 @@ class TransactionType(str, enum.Enum):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_user_id_created_at", "user_id", "created_at", "id"),
+        # A provider payment is credited at most once, whichever of
+        # verify-payment and the webhook gets there first
+        Index(
+            "uq_transactions_topup_reference",
+            "reference_id",
+            unique=True,
+            postgresql_where=text("transaction_type = 'TOPUP'"),
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), nullable=False) 
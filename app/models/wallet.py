@@ -1,15 +1,20 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import DECIMAL, Column, DateTime
+from sqlalchemy import DECIMAL, BigInteger, Column, DateTime, ForeignKey, Index, Integer, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
 
 class Wallet(Base):
     __tablename__ = "wallet"
+    __table_args__ = (Index("ix_wallet_user_id", "user_id", unique=True),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), nullable=False) 
     balance = Column(DECIMAL(18, 2), nullable=False, default=0.00)
+    # 0 = single-row balance; N > 0 = balance spread across N WalletShard rows
+    shard_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped by every write to balance or shard_count; orders balance cache fills
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), default=datetime.now, nullable=False)
     updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now, nullable=False)
 
@@ -21,6 +26,26 @@ class Wallet(Base):
             "id": str(self.id),
             "user_id": str(self.user_id),
             "balance": str(self.balance),
+            "shard_count": self.shard_count,
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
         }
+
+
+class WalletShard(Base):
+    """
+    A slice of a sharded wallet's balance. Debits pick a shard at random so
+    concurrent debits for one tenant lock different rows; the rebalancer
+    periodically sweeps the parent wallet's balance and evens the shards out.
+    """
+    __tablename__ = "wallet_shards"
+    __table_args__ = (UniqueConstraint("wallet_id", "shard_index", name="uq_wallet_shards_wallet_index"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    wallet_id = Column(UUID(as_uuid=True), ForeignKey("wallet.id", ondelete="CASCADE"), nullable=False)
+    shard_index = Column(Integer, nullable=False)
+    balance = Column(DECIMAL(18, 2), nullable=False, default=0.00)
+    updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now, nullable=False)
+
+    def __repr__(self):
+        return f"<WalletShard {self.wallet_id}[{self.shard_index}]: {self.balance}>"
@@ -0,0 +1,64 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, ForeignKey, Identity, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from app.database import Base
+
+
+class WebhookSubscription(Base):
+    """An endpoint a user wants job completion events pushed to."""
+    __tablename__ = "webhook_subscriptions"
+    __table_args__ = (Index("ix_webhook_subscriptions_user_id", "user_id"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    url = Column(String, nullable=False)
+    # Shared secret for the HMAC signature on every delivery
+    secret = Column(String, nullable=False)
+    is_active = Column(Boolean, nullable=False, default=True, server_default="true")
+    created_at = Column(DateTime(timezone=True), default=datetime.now, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=datetime.now, onupdate=datetime.now, nullable=False)
+
+    def __repr__(self):
+        return f"<WebhookSubscription {self.id}: {self.url}>"
+
+
+class WebhookEvent(Base):
+    """
+    An event waiting to be delivered to one subscription. Written in the same
+    transaction as the job status change and deleted once delivered.
+    """
+    __tablename__ = "webhook_events"
+    __table_args__ = (Index("ix_webhook_events_next_attempt_at", "next_attempt_at", "id"),)
+
+    id = Column(BigInteger, Identity(always=False), primary_key=True)
+    subscription_id = Column(
+        UUID(as_uuid=True), ForeignKey("webhook_subscriptions.id", ondelete="CASCADE"), nullable=False
+    )
+    event_type = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), default=datetime.now, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=datetime.now, nullable=False)
+
+    def __repr__(self):
+        return f"<WebhookEvent {self.id}: {self.event_type}>"
+
+
+class WebhookDeadLetter(Base):
+    """An event that exhausted its delivery attempts."""
+    __tablename__ = "webhook_dead_letters"
+
+    id = Column(BigInteger, primary_key=True)
+    subscription_id = Column(
+        UUID(as_uuid=True), ForeignKey("webhook_subscriptions.id", ondelete="CASCADE"), nullable=False
+    )
+    event_type = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    failed_at = Column(DateTime(timezone=True), default=datetime.now, nullable=False)
+
+    def __repr__(self):
+        return f"<WebhookDeadLetter {self.id}: {self.event_type}>"
@@ -1,8 +1,10 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update, delete
+from sqlalchemy import func, update, delete
 from uuid import UUID
-from app.models.imageJob import ImageJob
+from app.models.image import Image
+from app.models.imageJob import ImageJob, ImageStatus
+from app.models.outbox import OutboxMessage
 
 
 class ImageJobRepository:
@@ -21,6 +23,15 @@ class ImageJobRepository:
         )
         return result.scalar_one_or_none()
 
+    async def get_job_with_owner(self, job_id: UUID) -> tuple[ImageJob, str] | None:
+        """The job and the user_id of the image it belongs to."""
+        result = await self.session.execute(
+            select(ImageJob, Image.user_id)
+            .join(Image, Image.id == ImageJob.image_id)
+            .where(ImageJob.id == job_id)
+        )
+        return result.one_or_none()
+
     async def list_jobs_for_image(self, image_id: UUID) -> list[ImageJob]:
         result = await self.session.execute(
             select(ImageJob).where(ImageJob.image_id == image_id)
@@ -33,6 +44,29 @@ class ImageJobRepository:
         )
         await self.session.commit()
 
+    async def queue_job(
+        self,
+        job_id: UUID,
+        task_name: str,
+        task_kwargs: dict,
+        queue: str | None = None,
+        tenant_id: str | None = None,
+    ) -> None:
+        """
+        Mark the job QUEUED and write its task to the outbox in the same
+        transaction; the outbox dispatcher publishes it to the broker, through
+        the fair-share queue when `tenant_id` is given.
+        """
+        await self.session.execute(
+            update(ImageJob)
+            .where(ImageJob.id == job_id)
+            .values(status=ImageStatus.QUEUED, queued_at=func.now())
+        )
+        self.session.add(OutboxMessage(
+            task_name=task_name, kwargs=task_kwargs, queue=queue, tenant_id=tenant_id
+        ))
+        await self.session.commit()
+
     async def delete_job(self, job_id: UUID) -> None:
         await self.session.execute(delete(ImageJob).where(ImageJob.id == job_id))
         await self.session.commit()
@@ -1,8 +1,11 @@
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update, delete
+from sqlalchemy import update, delete, true, tuple_
 from uuid import UUID
+from app.core.pagination import Cursor
 from app.models.image import Image
+from app.models.imageJob import ImageJob, ImageStatus, JobType
 
 
 class ImageRepository:
@@ -29,7 +32,47 @@ class ImageRepository:
         )
         return result.scalars().all()
 
+    async def list_images_page(self, user_id: UUID, limit: int, cursor: Optional[Cursor] = None):
+        """
+        Newest-first page of the user's images, keyset-paginated on
+        (created_at, id), each joined with its latest job and the output of
+        its latest completed thumbnail job, all in one query.
+        Returns limit + 1 rows of (Image, job_status, job_type, thumbnail_path)
+        so the caller can tell whether another page exists.
+        """
+        latest_job = (
+            select(ImageJob.status, ImageJob.job_type)
+            .where(ImageJob.image_id == Image.id)
+            .order_by(ImageJob.created_at.desc())
+            .limit(1)
+            .lateral("latest_job")
+        )
+        thumbnail = (
+            select(ImageJob.storage_path)
+            .where(
+                ImageJob.image_id == Image.id,
+                ImageJob.job_type == JobType.THUMBNAIL,
+                ImageJob.status == ImageStatus.COMPLETED,
+            )
+            .order_by(ImageJob.created_at.desc())
+            .limit(1)
+            .lateral("thumbnail")
+        )
+        query = (
+            select(Image, latest_job.c.status, latest_job.c.job_type, thumbnail.c.storage_path)
+            .select_from(Image)
+            .outerjoin(latest_job, true())
+            .outerjoin(thumbnail, true())
+            .where(Image.user_id == user_id)
+        )
+        if cursor is not None:
+            query = query.where(tuple_(Image.created_at, Image.id) < tuple_(*cursor))
+        query = query.order_by(Image.created_at.desc(), Image.id.desc()).limit(limit + 1)
+        result = await self.session.execute(query)
+        return result.all()
+
     async def delete_image(self, image_id: UUID) -> None:
+        # Storage objects are reclaimed later by app.services.storage_lifecycle
         await self.session.execute(delete(Image).where(Image.id == image_id))
         await self.session.commit()
 
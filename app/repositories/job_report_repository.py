@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import List
+from sqlalchemy import Float, func, select, type_coerce
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.imageJob import ImageJob, ImageStatus
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def _ms_between(start, end):
+    return func.extract("epoch", end - start) * 1000
+
+
+def _percentiles(expr):
+    """[p50, p95, p99] of `expr`, from a single sort per group."""
+    return type_coerce(
+        func.percentile_cont(array(PERCENTILES, type_=Float)).within_group(expr), ARRAY(Float)
+    )
+
+
+class JobReportRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def latency_by_day(self, since: datetime) -> List[Row]:
+        """
+        One row per UTC day, job type and priority for jobs finished since
+        `since`: job counts, wait/run/total latency percentiles in ms (queue
+        wait, processing attempt, queued to finished), mean stage timings and
+        bytes in and out. Jobs recorded before stage timing existed are skipped.
+        """
+        day = func.date_trunc("day", func.timezone("UTC", ImageJob.finished_at)).label("day")
+        completed = ImageJob.status == ImageStatus.COMPLETED
+        result = await self.session.execute(
+            select(
+                day,
+                ImageJob.job_type,
+                ImageJob.priority,
+                func.count().filter(completed).label("completed"),
+                func.count().filter(ImageJob.status == ImageStatus.FAILED).label("failed"),
+                _percentiles(_ms_between(ImageJob.queued_at, ImageJob.started_at)).label("wait_ms"),
+                _percentiles(_ms_between(ImageJob.started_at, ImageJob.finished_at)).label("run_ms"),
+                _percentiles(_ms_between(ImageJob.queued_at, ImageJob.finished_at)).label("total_ms"),
+                func.avg(ImageJob.download_ms).label("download_ms"),
+                func.avg(ImageJob.process_ms).label("process_ms"),
+                func.avg(ImageJob.upload_ms).label("upload_ms"),
+                func.coalesce(func.sum(ImageJob.input_bytes).filter(completed), 0).label("input_bytes"),
+                func.coalesce(func.sum(ImageJob.output_bytes).filter(completed), 0).label("output_bytes"),
+            )
+            .where(ImageJob.finished_at >= since)
+            .group_by(day, ImageJob.job_type, ImageJob.priority)
+            .order_by(day, ImageJob.job_type, ImageJob.priority)
+        )
+        return list(result.all())
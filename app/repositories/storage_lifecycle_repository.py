@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Dict, Sequence, Set
+from sqlalchemy import and_, false, func, or_, select, union, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.content_address import CONTENT_ROOT
+from app.models.image import Image
+from app.models.imageJob import ImageJob, ImageStatus, JobType
+
+
+def _expired(cutoffs: Dict[JobType, datetime]):
+    """Completed jobs whose output is past its job type's retention period."""
+    if not cutoffs:
+        return false()
+    return and_(
+        ImageJob.status == ImageStatus.COMPLETED,
+        or_(*(and_(ImageJob.job_type == job_type, ImageJob.updated_at < cutoff) for job_type, cutoff in cutoffs.items())),
+    )
+
+
+class StorageLifecycleRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def live_paths(self, paths: Sequence[str], cutoffs: Dict[JobType, datetime]) -> Set[str]:
+        """
+        The subset of `paths` still referenced: by an image, or by a job whose
+        output has not expired. Outputs are content-addressed, so one path may
+        be shared by several jobs and stays live while any of them keeps it.
+        """
+        if not paths:
+            return set()
+        result = await self.session.execute(
+            union(
+                select(Image.storage_path).where(Image.storage_path.in_(paths)),
+                select(ImageJob.storage_path).where(ImageJob.storage_path.in_(paths), ~_expired(cutoffs)),
+            )
+        )
+        return set(result.scalars())
+
+    async def live_digests(self, digests: Sequence[str], cutoffs: Dict[JobType, datetime]) -> Set[str]:
+        """
+        The subset of content-addressed output `digests` (`processed/<digest>/`
+        folders) that some job with an unexpired output still points into.
+        """
+        if not digests:
+            return set()
+        digest = func.split_part(ImageJob.storage_path, "/", 2)
+        result = await self.session.execute(
+            select(digest).distinct().where(
+                digest.in_(digests),
+                ImageJob.storage_path.startswith(f"{CONTENT_ROOT}/"),
+                ~_expired(cutoffs),
+            )
+        )
+        return set(result.scalars())
+
+    async def expire_outputs(self, paths: Sequence[str], cutoffs: Dict[JobType, datetime]) -> int:
+        """Detach expired jobs from `paths` before those objects are deleted."""
+        if not paths or not cutoffs:
+            return 0
+        result = await self.session.execute(
+            update(ImageJob)
+            .where(ImageJob.storage_path.in_(paths), _expired(cutoffs))
+            .values(storage_path=None)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+        return result.rowcount
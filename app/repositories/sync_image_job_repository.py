@@ -1,7 +1,11 @@
-from sqlalchemy import update, delete
+from sqlalchemy import String, cast, func, insert, literal, select, update, delete
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session
 from uuid import UUID
-from app.models.imageJob import ImageJob
+from app.models.image import Image
+from app.models.imageJob import ImageJob, ImageStatus
+from app.models.outbox import OutboxMessage
+from app.models.webhook import WebhookEvent, WebhookSubscription
 from typing import Dict, Any, Optional, List
 
 class SyncImageJobRepository:
@@ -37,3 +41,64 @@ class SyncImageJobRepository:
         stmt = update(ImageJob).where(ImageJob.id == job_id).values(**values)
         self.session.execute(stmt)
         self.session.commit()
+
+    def requeue_job(
+        self,
+        job_id: UUID,
+        task_name: str,
+        task_kwargs: Dict[str, Any],
+        queue: Optional[str],
+        delay_seconds: Optional[float] = None,
+    ) -> None:
+        """
+        Mark the job QUEUED and write its task back to the outbox in one
+        transaction, as ImageJobRepository.queue_job does, with the image's
+        owner as tenant so it goes through the fair-share queue again. The
+        message is not published before `delay_seconds` have passed.
+        """
+        self.session.execute(update(ImageJob).where(ImageJob.id == job_id).values(status=ImageStatus.QUEUED))
+        next_attempt_at = func.now()
+        if delay_seconds:
+            next_attempt_at += func.make_interval(0, 0, 0, 0, 0, 0, delay_seconds)
+        self.session.execute(
+            insert(OutboxMessage).from_select(
+                ["task_name", "kwargs", "queue", "tenant_id", "next_attempt_at", "created_at"],
+                select(
+                    literal(task_name),
+                    literal(task_kwargs, JSONB),
+                    literal(queue, String),
+                    cast(Image.user_id, String),
+                    next_attempt_at,
+                    func.now(),
+                )
+                .join(ImageJob, ImageJob.image_id == Image.id)
+                .where(ImageJob.id == job_id),
+            )
+        )
+        self.session.commit()
+
+    def finish_job(self, job_id: UUID, values: Dict[str, Any], event_type: str, payload: Dict[str, Any]) -> None:
+        """
+        Apply the final job update and queue a webhook event for each of the
+        owner's active subscriptions, in one transaction.
+        """
+        self.session.execute(update(ImageJob).where(ImageJob.id == job_id).values(**values))
+        subscribers = (
+            select(
+                WebhookSubscription.id,
+                literal(event_type),
+                literal(payload, JSONB),
+                func.now(),
+                func.now(),
+            )
+            .join(Image, Image.user_id == WebhookSubscription.user_id)
+            .join(ImageJob, ImageJob.image_id == Image.id)
+            .where(ImageJob.id == job_id, WebhookSubscription.is_active.is_(True))
+        )
+        self.session.execute(
+            insert(WebhookEvent).from_select(
+                ["subscription_id", "event_type", "payload", "next_attempt_at", "created_at"],
+                subscribers,
+            )
+        )
+        self.session.commit()
@@ -0,0 +1,79 @@
+from typing import List
+from sqlalchemy import Float, delete, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+from app.models.outbox import OutboxDeadLetter, OutboxMessage
+
+
+class SyncOutboxRepository:
+    """
+    Synchronous outbox access for the outbox dispatcher.
+    """
+    def __init__(self, session: Session):
+        self.session = session
+
+    def claim_batch(self, limit: int) -> List[OutboxMessage]:
+        """
+        Oldest due messages, row-locked with SKIP LOCKED so several
+        dispatchers can drain the outbox side by side. The locks are held
+        until the caller commits.
+        """
+        return (
+            self.session.query(OutboxMessage)
+            .filter(OutboxMessage.next_attempt_at <= func.now())
+            .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+    def delete_messages(self, message_ids: List[int]) -> None:
+        if message_ids:
+            self.session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(message_ids)))
+
+    def record_failure(
+        self,
+        message_ids: List[int],
+        error: str,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+    ) -> int:
+        """
+        Count a failed publish: messages out of attempts move to the
+        dead-letter table, the rest are rescheduled with jittered exponential
+        backoff. Returns the number of dead-lettered messages.
+        """
+        if not message_ids:
+            return 0
+        exhausted = (OutboxMessage.id.in_(message_ids)) & (OutboxMessage.attempts + 1 >= max_attempts)
+        moved = self.session.execute(
+            insert(OutboxDeadLetter).from_select(
+                ["id", "task_name", "kwargs", "queue", "tenant_id", "attempts", "last_error", "created_at", "failed_at"],
+                select(
+                    OutboxMessage.id,
+                    OutboxMessage.task_name,
+                    OutboxMessage.kwargs,
+                    OutboxMessage.queue,
+                    OutboxMessage.tenant_id,
+                    OutboxMessage.attempts + 1,
+                    literal(error),
+                    OutboxMessage.created_at,
+                    func.now(),
+                ).where(exhausted),
+            )
+        )
+        self.session.execute(delete(OutboxMessage).where(exhausted))
+
+        delay_seconds = func.least(
+            literal(backoff_max, Float),
+            literal(backoff_base, Float) * func.power(2, OutboxMessage.attempts),
+        ) * (0.5 + func.random())
+        self.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(message_ids))
+            .values(
+                attempts=OutboxMessage.attempts + 1,
+                next_attempt_at=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, delay_seconds),
+            )
+        )
+        return moved.rowcount
@@ -0,0 +1,84 @@
+from decimal import Decimal, ROUND_DOWN
+from typing import List
+from uuid import UUID
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.models.wallet import Wallet, WalletShard
+
+CENT = Decimal("0.01")
+
+
+class SyncWalletRepository:
+    """
+    Synchronous wallet operations for use in Celery tasks.
+    """
+    def __init__(self, session: Session):
+        self.session = session
+
+    def list_sharded_wallet_ids(self) -> List[UUID]:
+        rows = (
+            self.session.query(Wallet.id)
+            .filter(Wallet.shard_count > 0)
+            .all()
+        )
+        # Wallets switched back to unsharded mode may still hold shard rows
+        rows += (
+            self.session.query(WalletShard.wallet_id)
+            .join(Wallet, Wallet.id == WalletShard.wallet_id)
+            .filter(Wallet.shard_count == 0)
+            .distinct()
+            .all()
+        )
+        return [row[0] for row in rows]
+
+    def rebalance_shards(self, wallet_id: UUID) -> None:
+        """
+        Sweep the wallet row's balance into its shards and spread the total
+        evenly (any remainder cents go to shard 0). Shards at or beyond
+        shard_count are folded back and deleted. The wallet row is locked FOR
+        NO KEY UPDATE so in-flight shard debits, which need a KEY SHARE lock
+        on it for their ledger rows, cannot deadlock with us.
+        """
+        wallet = (
+            self.session.query(Wallet)
+            .filter(Wallet.id == wallet_id)
+            .with_for_update(key_share=True)
+            .first()
+        )
+        if not wallet:
+            self.session.rollback()
+            return
+
+        shards = (
+            self.session.query(WalletShard)
+            .filter(WalletShard.wallet_id == wallet_id)
+            .order_by(WalletShard.shard_index)
+            .with_for_update()
+            .all()
+        )
+        total = wallet.balance + sum((shard.balance for shard in shards), Decimal("0"))
+        shard_count = wallet.shard_count
+
+        by_index = {shard.shard_index: shard for shard in shards}
+        for index, shard in by_index.items():
+            if index >= shard_count:
+                self.session.delete(shard)
+
+        if shard_count == 0:
+            wallet.balance = total
+            self.session.commit()
+            return
+
+        share = (total / shard_count).quantize(CENT, rounding=ROUND_DOWN)
+        for index in range(shard_count):
+            shard = by_index.get(index)
+            if shard is None:
+                shard = WalletShard(id=uuid.uuid4(), wallet_id=wallet_id, shard_index=index)
+                self.session.add(shard)
+                by_index[index] = shard
+            shard.balance = share
+        by_index[0].balance += total - share * shard_count
+        wallet.balance = Decimal("0")
+        self.session.commit()
@@ -1,6 +1,10 @@
+from typing import AsyncIterator, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.models.transactions import Transaction
+from sqlalchemy import select, tuple_
+from app.core.pagination import Cursor
+from app.models.transactions import Transaction, TransactionType
+
+EXPORT_BATCH_SIZE = 500
 
 class TransactionRepository:
     def __init__(self, session: AsyncSession):
@@ -18,3 +22,40 @@ class TransactionRepository:
             select(Transaction).where(Transaction.user_id == user_id)
         )
         return result.scalars().all()
+
+    async def get_topup_by_reference(self, reference_id: str):
+        result = await self.session.execute(
+            select(Transaction).where(
+                Transaction.reference_id == reference_id,
+                Transaction.transaction_type == TransactionType.TOPUP,
+            )
+        )
+        return result.scalars().first()
+
+    async def get_transactions_page(self, user_id, limit: int, cursor: Optional[Cursor] = None):
+        """
+        Newest-first page of the user's transactions, keyset-paginated on
+        (created_at, id). Fetches limit + 1 rows so the caller can tell
+        whether another page exists.
+        """
+        query = select(Transaction).where(Transaction.user_id == user_id)
+        if cursor is not None:
+            query = query.where(tuple_(Transaction.created_at, Transaction.id) < tuple_(*cursor))
+        query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(limit + 1)
+        result = await self.session.execute(query)
+        return result.scalars().all()
+
+    async def stream_transactions_by_user_id(self, user_id) -> AsyncIterator[Transaction]:
+        """
+        Iterate over all of the user's transactions through a server-side
+        cursor, EXPORT_BATCH_SIZE rows at a time, so memory stays flat
+        regardless of history length.
+        """
+        result = await self.session.stream_scalars(
+            select(Transaction)
+            .where(Transaction.user_id == user_id)
+            .order_by(Transaction.created_at.desc(), Transaction.id.desc())
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for transaction in result:
+            yield transaction
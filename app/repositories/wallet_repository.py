@@ -1,9 +1,12 @@
-from datetime import datetime
+import random
+import uuid
 from decimal import Decimal
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import case, cast, exists, func, insert, literal, null, select, text, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from app.models.wallet import Wallet
+from app.core.balance_cache import balance_cache
+from app.models.wallet import Wallet, WalletShard
 from app.models.transactions import Transaction, TransactionType
 
 class WalletRepository:
@@ -35,47 +38,398 @@ class WalletRepository:
         for key, value in update_data.items():
             if hasattr(wallet, key):
                 setattr(wallet, key, value)
+        wallet.version = Wallet.version + 1
         await self.session.commit()
         await self.session.refresh(wallet)
+        await balance_cache.invalidate(wallet.user_id, wallet.version)
         return wallet
     
-    async def deduct_balance(self, wallet_id, amount: Decimal, reference: str, description: str = None):
+    async def get_balance_by_user_id(self, user_id):
         """
-        Deduct specified amount from wallet balance and create a transaction record
-        
+        Total balance for the user's wallet: the wallet row plus all of its
+        shards. Returns None if the user has no wallet.
+        """
+        row = await self._load_balance(user_id)
+        return row.total_balance if row is not None else None
+
+    async def _load_balance(self, user_id):
+        """(total_balance, version) of the user's wallet, or None if it has none."""
+        shard_total = (
+            select(func.coalesce(func.sum(WalletShard.balance), 0))
+            .where(WalletShard.wallet_id == Wallet.id)
+            .scalar_subquery()
+        )
+        result = await self.session.execute(
+            select((Wallet.balance + shard_total).label("total_balance"), Wallet.version)
+            .where(Wallet.user_id == user_id)
+        )
+        return result.first()
+
+    async def get_cached_balance_by_user_id(self, user_id):
+        """
+        get_balance_by_user_id through the Redis balance cache. Misses are
+        loaded with this repository's session, so use a primary session: a
+        lagging replica could otherwise put an old balance in the cache.
+        """
+        return await balance_cache.get(user_id, lambda: self._load_balance(user_id))
+
+    async def _commit_balance_change(self, user_id, version: int = None, total_balance: Decimal = None) -> None:
+        """
+        Commit a write that changed the user's balance, then update the cache:
+        with `total_balance` (the wallet's new total and version, as RETURNING
+        gave them) it is stored without another query; otherwise the entry is
+        invalidated. Redis is only called once the row locks are released.
+        """
+        await self.session.commit()
+        if total_balance is not None:
+            await balance_cache.complete_write(user_id, version, total_balance)
+        else:
+            await balance_cache.invalidate(user_id, version)
+
+    @staticmethod
+    def _unsharded_total():
+        """
+        RETURNING expression of a wallet row update: the new balance when it is
+        the wallet's whole balance, NULL if shard rows (even of a wallet being
+        unsharded, not yet folded back) may hold part of it.
+        """
+        return case(
+            (~exists().where(WalletShard.wallet_id == Wallet.id), Wallet.balance),
+            else_=null(),
+        ).label("total_balance")
+
+    async def get_or_create_wallet_id(self, user_id):
+        """
+        Wallet ID for the user, creating an empty wallet if needed. Safe
+        against concurrent creation thanks to the unique user_id index.
+        """
+        await self.session.execute(
+            pg_insert(Wallet)
+            .values(id=uuid.uuid4(), user_id=user_id, balance=0, shard_count=0,
+                    created_at=func.now(), updated_at=func.now())
+            .on_conflict_do_nothing(index_elements=["user_id"])
+        )
+        result = await self.session.execute(select(Wallet.id).where(Wallet.user_id == user_id))
+        return result.scalar_one()
+
+    def _credit(self, wallet_id, amount, name: str):
+        """
+        CTEs crediting `amount` to a wallet in the same statement: unsharded
+        wallets on the wallet row, sharded wallets spread evenly across their
+        shards (remainder cents on shard 0), so debits find the funds where
+        they look for them without waiting for the rebalancer.
+        Returns (row_credit, shard_credit); at most one of them updates rows.
+        """
+        row_credit = (
+            update(Wallet)
+            .where(Wallet.id == wallet_id, Wallet.shard_count == 0)
+            .values(balance=Wallet.balance + amount, version=Wallet.version + 1, updated_at=func.now())
+            .returning(Wallet.id, Wallet.user_id, Wallet.balance, Wallet.version, self._unsharded_total())
+            .cte(f"{name}_row")
+        )
+        share = func.trunc(amount / Wallet.shard_count, 2)
+        remainder = case((WalletShard.shard_index == 0, amount - share * Wallet.shard_count), else_=0)
+        shard_credit = (
+            update(WalletShard)
+            .where(
+                WalletShard.wallet_id == wallet_id,
+                Wallet.id == WalletShard.wallet_id,
+                Wallet.shard_count > 0,
+                WalletShard.shard_index < Wallet.shard_count,
+            )
+            .values(balance=WalletShard.balance + share + remainder, updated_at=func.now())
+            .returning(WalletShard.wallet_id)
+            .cte(f"{name}_shards")
+        )
+        return row_credit, shard_credit
+
+    async def apply_topup(self, wallet_id, user_id, amount: Decimal, payment_id: str):
+        """
+        Record a TOPUP transaction for payment_id and credit the wallet, in
+        one statement. Returns the transaction ID, or None if this payment
+        was already applied.
+        """
+        topup = (
+            pg_insert(Transaction)
+            .values(
+                id=uuid.uuid4(),
+                user_id=user_id,
+                wallet_id=wallet_id,
+                transaction_type=TransactionType.TOPUP,
+                reference_id=payment_id,
+                amount=amount,
+                created_at=func.now(),
+                updated_at=func.now(),
+            )
+            .on_conflict_do_nothing(
+                index_elements=["reference_id"],
+                index_where=text("transaction_type = 'TOPUP'"),
+            )
+            .returning(Transaction.id, Transaction.wallet_id, Transaction.amount)
+            .cte("topup")
+        )
+        # add_cte: data-modifying CTEs run whether or not the query reads them
+        row_credit, shard_credit = self._credit(topup.c.wallet_id, topup.c.amount, "credited")
+        result = await self.session.execute(
+            select(topup.c.id, row_credit.c.version, row_credit.c.total_balance)
+            .select_from(topup.outerjoin(row_credit, row_credit.c.id == topup.c.wallet_id))
+            .add_cte(shard_credit)
+        )
+        row = result.first()
+        if row is None:
+            await self.session.commit()
+            return None
+        await self._commit_balance_change(user_id, row.version, row.total_balance)
+        return row.id
+
+    async def credit_balance(self, wallet_id, amount: Decimal):
+        """
+        Atomically add amount to the wallet (its shards, if sharded).
+        Returns the wallet row's new balance, or None if the wallet does not exist.
+        """
+        row_credit, shard_credit = self._credit(wallet_id, literal(amount, Wallet.balance.type), "credited")
+        result = await self.session.execute(
+            select(
+                Wallet.user_id,
+                Wallet.balance,
+                row_credit.c.balance.label("credited_balance"),
+                func.coalesce(row_credit.c.version, Wallet.version).label("version"),
+                row_credit.c.total_balance,
+            )
+            .outerjoin(row_credit, row_credit.c.id == Wallet.id)
+            .add_cte(shard_credit)
+            .where(Wallet.id == wallet_id)
+        )
+        row = result.first()
+        if row is None:
+            await self.session.commit()
+            return None
+        await self._commit_balance_change(row.user_id, row.version, row.total_balance)
+        return row.credited_balance if row.credited_balance is not None else row.balance
+
+    async def set_shard_count(self, wallet_id, shard_count: int) -> None:
+        """
+        Switch a wallet into (or out of, with 0) sharded-balance mode.
+        Missing shard rows are created empty; the rebalancer moves funds into
+        them and folds shards beyond shard_count back into the wallet row.
+        """
+        result = await self.session.execute(
+            update(Wallet)
+            .where(Wallet.id == wallet_id)
+            .values(shard_count=shard_count, version=Wallet.version + 1)
+            .returning(Wallet.user_id, Wallet.version)
+        )
+        wallet = result.first()
+        if shard_count > 0:
+            await self.session.execute(
+                pg_insert(WalletShard)
+                .values([
+                    {"id": uuid.uuid4(), "wallet_id": wallet_id, "shard_index": index, "balance": 0}
+                    for index in range(shard_count)
+                ])
+                .on_conflict_do_nothing(index_elements=["wallet_id", "shard_index"])
+            )
+        if wallet is None:
+            await self.session.commit()
+            return
+        # The total is unchanged, but writers older than this version must no
+        # longer store theirs: the wallet's shards may now hold part of it
+        await self._commit_balance_change(wallet.user_id, wallet.version)
+
+    async def deduct_balance(self, wallet_id, amount: Decimal, reference: str):
+        """
+        Atomically deduct specified amount from wallet balance and create a transaction record
+
         Args:
             wallet_id: ID of the wallet to deduct from
             amount: Amount to deduct
             reference: Reference ID for the transaction
-            description: Optional description of the transaction
-            
+
         Returns:
-            Tuple[Wallet, Transaction]: Updated wallet and transaction record, or (None, None) if failed
+            Tuple[Decimal, UUID]: Remaining balance of the debited row and transaction ID,
+            or (None, None) if the wallet does not exist or has insufficient funds
         """
-        # Get wallet
-        wallet = await self.get_wallet_by_id(wallet_id)
-        if not wallet or wallet.balance < amount:
+        return await self._debit(Wallet.id == wallet_id, amount, reference)
+
+    async def deduct_balance_for_user(self, user_id, amount: Decimal, reference: str):
+        """
+        Same as deduct_balance, but addresses the wallet by its owner so the
+        caller does not need to look the wallet up first.
+        """
+        return await self._debit(Wallet.user_id == user_id, amount, reference)
+
+    async def _debit(self, wallet_clause, amount: Decimal, reference: str):
+        """
+        One statement debits the wallet row of an unsharded wallet, or one
+        randomly picked shard of a sharded one. Only a sharded wallet whose
+        picked shard cannot cover the amount falls back to the locked spread
+        debit; for an unsharded wallet a miss means insufficient funds.
+        """
+        result = await self.session.execute(self._debit_statement(wallet_clause, amount, reference))
+        wallet = result.first()
+        row = None
+        total_balance = None
+        if wallet is not None:
+            if wallet.transaction_id is not None:
+                row = wallet.balance, wallet.transaction_id
+                total_balance = wallet.total_balance
+            elif wallet.shard_count > 0:
+                # Nothing was written, but a shard the UPDATE waited on and
+                # then found short stays locked; release it so the spread
+                # debit takes its locks in the rebalancer's order.
+                await self.session.rollback()
+                row = await self._spread_debit(wallet_clause, amount, reference)
+
+        if row is None:
+            await self.session.commit()
             return None, None
-            
-        # Update wallet balance
-        wallet.balance -= amount
-        wallet.updated_at = datetime.now()
-        
-        # Create transaction record
+        await self._commit_balance_change(wallet.user_id, wallet.version, total_balance)
+        return row
+
+    def _debit_statement(self, wallet_clause, amount: Decimal, reference: str):
+        """
+        Conditional debit and ledger insert in a single statement:
+
+            WITH row_debit AS (
+                UPDATE wallet SET balance = balance - :amt, version = version + 1
+                WHERE <clause> AND shard_count = 0 AND balance >= :amt RETURNING ...
+            ), shard_debit AS (
+                UPDATE wallet_shards SET balance = balance - :amt FROM wallet
+                WHERE <clause> AND shard_count > 0 AND shard_index = :pick % shard_count
+                  AND wallet_shards.balance >= :amt RETURNING ...
+            ), debited AS (SELECT ... FROM row_debit UNION ALL SELECT ... FROM shard_debit),
+            inserted AS (INSERT INTO transactions (...) SELECT ... FROM debited RETURNING id, wallet_id)
+            SELECT wallet.user_id, wallet.shard_count, debited.balance, inserted.id
+            FROM wallet LEFT JOIN debited ... LEFT JOIN inserted ... WHERE <clause>
+
+        The row lock taken by the UPDATE serialises concurrent debits of a
+        row, and the balance check is re-evaluated against the committed
+        value, so no row can ever be overdrawn. A wallet row comes back even
+        when nothing was debited, telling the caller whether it is sharded.
+        """
+        row_debit = (
+            update(Wallet)
+            .where(wallet_clause, Wallet.shard_count == 0, Wallet.balance >= amount)
+            .values(balance=Wallet.balance - amount, version=Wallet.version + 1, updated_at=func.now())
+            .returning(Wallet.id, Wallet.user_id, Wallet.balance, Wallet.version, self._unsharded_total())
+            .cte("row_debit")
+        )
+        # The shard is picked in Python and reduced modulo shard_count in SQL,
+        # so the choice is a constant for the statement rather than a
+        # per-row random() evaluation.
+        pick = random.randrange(1 << 30)
+        shard_debit = (
+            update(WalletShard)
+            .where(
+                WalletShard.wallet_id == Wallet.id,
+                wallet_clause,
+                Wallet.shard_count > 0,
+                WalletShard.shard_index == pick % Wallet.shard_count,
+                WalletShard.balance >= amount,
+            )
+            .values(balance=WalletShard.balance - amount, updated_at=func.now())
+            .returning(
+                Wallet.id.label("id"),
+                Wallet.user_id.label("user_id"),
+                WalletShard.balance.label("balance"),
+                Wallet.version.label("version"),
+            )
+            .cte("shard_debit")
+        )
+        debited = union_all(
+            select(
+                row_debit.c.id, row_debit.c.user_id, row_debit.c.balance, row_debit.c.version,
+                row_debit.c.total_balance,
+            ),
+            select(shard_debit.c.id, shard_debit.c.user_id, shard_debit.c.balance, shard_debit.c.version, null()),
+        ).cte("debited")
+        inserted = (
+            insert(Transaction)
+            .from_select(
+                [
+                    Transaction.id,
+                    Transaction.user_id,
+                    Transaction.wallet_id,
+                    Transaction.transaction_type,
+                    Transaction.reference_id,
+                    Transaction.amount,
+                    Transaction.created_at,
+                    Transaction.updated_at,
+                ],
+                select(
+                    cast(uuid.uuid4(), Transaction.id.type),
+                    debited.c.user_id,
+                    debited.c.id,
+                    cast(TransactionType.DEBIT, Transaction.transaction_type.type),
+                    cast(reference, Transaction.reference_id.type),
+                    cast(amount, Transaction.amount.type),
+                    func.now(),
+                    func.now(),
+                ),
+            )
+            .returning(Transaction.id, Transaction.wallet_id)
+            .cte("inserted")
+        )
+        return (
+            select(
+                Wallet.user_id,
+                Wallet.shard_count,
+                func.coalesce(debited.c.version, Wallet.version).label("version"),
+                debited.c.balance,
+                debited.c.total_balance,
+                inserted.c.id.label("transaction_id"),
+            )
+            .outerjoin(debited, debited.c.id == Wallet.id)
+            .outerjoin(inserted, inserted.c.wallet_id == Wallet.id)
+            .where(wallet_clause)
+        )
+
+    async def _spread_debit(self, wallet_clause, amount: Decimal, reference: str):
+        """
+        Slow path for sharded wallets whose funds are fragmented: lock the
+        wallet row and its shards (same order as the rebalancer) and drain them
+        until the amount is covered. The wallet row is locked FOR NO KEY
+        UPDATE: a concurrent shard debit holds its shard and needs a KEY SHARE
+        lock on the wallet for its ledger row's foreign key, which FOR UPDATE
+        would block, deadlocking with our wait for that shard.
+        """
+        result = await self.session.execute(
+            select(Wallet)
+            .where(wallet_clause)
+            .with_for_update(key_share=True)
+            .execution_options(populate_existing=True)
+        )
+        wallet = result.scalars().first()
+        if not wallet or wallet.shard_count == 0:
+            return None
+
+        result = await self.session.execute(
+            select(WalletShard)
+            .where(WalletShard.wallet_id == wallet.id)
+            .order_by(WalletShard.shard_index)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        shards = result.scalars().all()
+        if wallet.balance + sum(shard.balance for shard in shards) < amount:
+            return None
+
+        remaining = amount
+        for row in [wallet, *sorted(shards, key=lambda shard: shard.balance, reverse=True)]:
+            taken = min(row.balance, remaining)
+            row.balance -= taken
+            remaining -= taken
+            if remaining == 0:
+                break
+
         transaction = Transaction(
+            id=uuid.uuid4(),
             user_id=wallet.user_id,
-            wallet_id=wallet_id,
+            wallet_id=wallet.id,
             transaction_type=TransactionType.DEBIT,
             reference_id=reference,
-            amount=amount
+            amount=amount,
         )
-        
-        # Add both to session and commit
         self.session.add(transaction)
-        await self.session.commit()
-        
-        # Refresh objects
-        await self.session.refresh(wallet)
-        await self.session.refresh(transaction)
-        
-        return wallet, transaction
\ No newline at end of file
+        await self.session.flush()
+        return wallet.balance, transaction.id
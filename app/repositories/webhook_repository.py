@@ -0,0 +1,121 @@
+from datetime import timedelta
+from typing import Dict, List, Sequence
+from uuid import UUID
+from sqlalchemy import Float, delete, func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.webhook import WebhookDeadLetter, WebhookEvent, WebhookSubscription
+
+
+class WebhookRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create_subscription(self, subscription: WebhookSubscription) -> WebhookSubscription:
+        self.session.add(subscription)
+        await self.session.commit()
+        await self.session.refresh(subscription)
+        return subscription
+
+    async def list_subscriptions(self, user_id: UUID) -> list[WebhookSubscription]:
+        result = await self.session.execute(
+            select(WebhookSubscription)
+            .where(WebhookSubscription.user_id == user_id)
+            .order_by(WebhookSubscription.created_at)
+        )
+        return result.scalars().all()
+
+    async def delete_subscription(self, subscription_id: UUID, user_id: UUID) -> bool:
+        result = await self.session.execute(
+            delete(WebhookSubscription).where(
+                WebhookSubscription.id == subscription_id,
+                WebhookSubscription.user_id == user_id,
+            )
+        )
+        await self.session.commit()
+        return result.rowcount > 0
+
+    async def get_subscriptions(self, subscription_ids: Sequence[UUID]) -> Dict[UUID, WebhookSubscription]:
+        result = await self.session.execute(
+            select(WebhookSubscription).where(WebhookSubscription.id.in_(subscription_ids))
+        )
+        return {s.id: s for s in result.scalars()}
+
+    async def claim_due_events(self, limit: int, lease_seconds: float):
+        """
+        Lease up to `limit` due events: their next_attempt_at is pushed
+        `lease_seconds` ahead, so other dispatchers skip them until this one
+        has delivered or rescheduled them (or crashed).
+        """
+        due = (
+            select(WebhookEvent.id)
+            .where(WebhookEvent.next_attempt_at <= func.now())
+            .order_by(WebhookEvent.next_attempt_at, WebhookEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte("due")
+        )
+        result = await self.session.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id.in_(select(due.c.id)))
+            .values(next_attempt_at=func.now() + timedelta(seconds=lease_seconds))
+            .returning(
+                WebhookEvent.id,
+                WebhookEvent.subscription_id,
+                WebhookEvent.payload,
+                WebhookEvent.attempts,
+                WebhookEvent.created_at,
+            )
+        )
+        events = result.all()
+        await self.session.commit()
+        return events
+
+    async def delete_events(self, event_ids: List[int]) -> None:
+        await self.session.execute(delete(WebhookEvent).where(WebhookEvent.id.in_(event_ids)))
+        await self.session.commit()
+
+    async def record_failure(
+        self,
+        event_ids: List[int],
+        error: str,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+    ) -> int:
+        """
+        Count a failed attempt: events out of attempts move to the dead-letter
+        table, the rest are rescheduled with jittered exponential backoff.
+        Returns the number of dead-lettered events.
+        """
+        exhausted = (WebhookEvent.id.in_(event_ids)) & (WebhookEvent.attempts + 1 >= max_attempts)
+        moved = await self.session.execute(
+            insert(WebhookDeadLetter).from_select(
+                ["id", "subscription_id", "event_type", "payload", "attempts", "last_error", "created_at", "failed_at"],
+                select(
+                    WebhookEvent.id,
+                    WebhookEvent.subscription_id,
+                    WebhookEvent.event_type,
+                    WebhookEvent.payload,
+                    WebhookEvent.attempts + 1,
+                    literal(error),
+                    WebhookEvent.created_at,
+                    func.now(),
+                ).where(exhausted),
+            )
+        )
+        await self.session.execute(delete(WebhookEvent).where(exhausted))
+
+        delay_seconds = func.least(
+            literal(backoff_max, Float),
+            literal(backoff_base, Float) * func.power(2, WebhookEvent.attempts),
+        ) * (0.5 + func.random())
+        await self.session.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id.in_(event_ids))
+            .values(
+                attempts=WebhookEvent.attempts + 1,
+                next_attempt_at=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, delay_seconds),
+            )
+        )
+        await self.session.commit()
+        return moved.rowcount
@@ -1,4 +1,8 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+from pydantic import BaseModel, Field, UUID4
+from app.models.transactions import TransactionType
 
 class PaymentCreateRequest(BaseModel):
     amount: float = Field(..., gt=0, description="Amount to be paid (in INR)")
@@ -21,4 +25,23 @@ class PaymentResponse(BaseModel):
     currency: str
     receipt_id: str
     razorpay_key: str
-    
\ No newline at end of file
+
+
+# Built straight from Transaction rows (no to_dict); amounts serialize as strings
+class TransactionResponse(BaseModel):
+    id: UUID4
+    user_id: UUID4
+    wallet_id: UUID4
+    transaction_type: TransactionType
+    reference_id: str
+    amount: Decimal
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class TransactionPage(BaseModel):
+    transactions: List[TransactionResponse]
+    next_cursor: Optional[str] = None
@@ -51,6 +51,9 @@ class ImageResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     storage_path: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    frame_count: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -59,8 +62,13 @@ class ImageResponse(BaseModel):
             UUID4: lambda v: str(v)
         }
 
-# Schema for image listing with pagination
+# Gallery entry: image plus its latest job and a signed preview URL
+class ImageListItem(ImageResponse):
+    latest_job_status: Optional[str] = None
+    latest_job_type: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+
+# Schema for image listing with keyset pagination
 class ImageList(BaseModel):
-    items: list[ImageResponse]
-    total: int
-    page: int
\ No newline at end of file
+    items: list[ImageListItem]
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,35 @@
+from datetime import datetime
+from typing import List
+from pydantic import BaseModel, HttpUrl, UUID4, field_validator
+
+from app.services.webhooks import check_webhook_url
+
+
+class WebhookSubscriptionCreate(BaseModel):
+    url: HttpUrl
+
+    @field_validator("url")
+    @classmethod
+    def https_and_public(cls, url: HttpUrl) -> HttpUrl:
+        # DNS is checked by the route; this rejects what needs no lookup
+        check_webhook_url(str(url))
+        return url
+
+
+class WebhookSubscriptionResponse(BaseModel):
+    id: UUID4
+    url: str
+    is_active: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class WebhookSubscriptionCreated(WebhookSubscriptionResponse):
+    # Returned only once, when the subscription is created
+    secret: str
+
+
+class WebhookSubscriptionList(BaseModel):
+    items: List[WebhookSubscriptionResponse]
@@ -0,0 +1,122 @@
+"""
+Fair-share queueing for per-tenant work.
+
+Each tenant's tasks wait in their own Redis list; a ring of tenants with
+pending work is served round-robin, one task per turn. The outbox dispatcher
+keeps only a short backlog in the broker queue and tops it up from the ring,
+so a tenant with thousands of queued jobs delays everyone else by at most one
+job per turn instead of its whole backlog.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.core.redis import get_sync_redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS: ring, active set, tenant list. ARGV: tenant, payload
+PUSH_SCRIPT = """
+redis.call('RPUSH', KEYS[3], ARGV[2])
+if redis.call('SADD', KEYS[2], ARGV[1]) == 1 then
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+# KEYS: ring, active set, leases. ARGV: tenant list prefix, lease ms.
+# Takes the head of the next tenant's list, leases it until now + lease ms,
+# and rotates the tenant to the back of the ring while it still has work.
+POP_SCRIPT = """
+local tenant = redis.call('LPOP', KEYS[1])
+if not tenant then
+    return nil
+end
+local list_key = ARGV[1] .. tenant
+local payload = redis.call('LPOP', list_key)
+if redis.call('LLEN', list_key) > 0 then
+    redis.call('RPUSH', KEYS[1], tenant)
+else
+    redis.call('SREM', KEYS[2], tenant)
+end
+if payload then
+    local now = redis.call('TIME')
+    local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+    redis.call('ZADD', KEYS[3], now_ms + tonumber(ARGV[2]), payload)
+end
+return payload
+"""
+
+# KEYS: ring, active set, tenant list, leases. ARGV: tenant, payload
+# Puts a leased task back at the front of its tenant's list. A no-op if the
+# lease is gone (acked, or already restored by another dispatcher).
+RESTORE_SCRIPT = """
+if redis.call('ZREM', KEYS[4], ARGV[2]) == 0 then
+    return 0
+end
+redis.call('LPUSH', KEYS[3], ARGV[2])
+if redis.call('SADD', KEYS[2], ARGV[1]) == 1 then
+    redis.call('LPUSH', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+# KEYS: leases. Returns leased payloads whose lease has run out.
+EXPIRED_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+return redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now_ms)
+"""
+
+
+class FairShareQueue:
+    """
+    A popped task stays leased (in a sorted set scored by lease deadline)
+    until it is acked once the broker has accepted it. If the publish fails
+    it is restored straight away. If its dispatcher dies first, the lease
+    runs out and `recover_expired` returns it to the front of its tenant's
+    list, so a crash can duplicate a task but never lose one.
+    """
+
+    def __init__(self, name: str, lease_seconds: float = 60.0):
+        self.ring_key = f"fairshare:{name}:ring"
+        self.active_key = f"fairshare:{name}:active"
+        self.lease_key = f"fairshare:{name}:leased"
+        self.tenant_prefix = f"fairshare:{name}:tenant:"
+        self.lease_ms = int(lease_seconds * 1000)
+        self._redis = get_sync_redis()
+        self._push = self._redis.register_script(PUSH_SCRIPT)
+        self._pop = self._redis.register_script(POP_SCRIPT)
+        self._restore = self._redis.register_script(RESTORE_SCRIPT)
+        self._expired = self._redis.register_script(EXPIRED_SCRIPT)
+
+    def _keys(self, tenant: str) -> List[str]:
+        return [self.ring_key, self.active_key, self.tenant_prefix + tenant]
+
+    def push(self, tenant: str, envelope: Dict[str, Any]) -> None:
+        self._push(keys=self._keys(tenant), args=[tenant, json.dumps(envelope)])
+
+    def pop(self) -> Optional[Dict[str, Any]]:
+        """Lease the next task in round-robin order; ack or restore it when done."""
+        payload = self._pop(
+            keys=[self.ring_key, self.active_key, self.lease_key], args=[self.tenant_prefix, self.lease_ms]
+        )
+        return json.loads(payload) if payload is not None else None
+
+    def ack(self, envelope: Dict[str, Any]) -> None:
+        """The leased task was published; forget it."""
+        self._redis.zrem(self.lease_key, json.dumps(envelope))
+
+    def restore(self, tenant: str, envelope: Dict[str, Any]) -> bool:
+        """Return a leased task to the front of its tenant's list."""
+        return bool(self._restore(keys=self._keys(tenant) + [self.lease_key], args=[tenant, json.dumps(envelope)]))
+
+    def recover_expired(self) -> int:
+        """Restore tasks whose lease ran out (their dispatcher died). Returns how many."""
+        recovered = 0
+        for payload in self._expired(keys=[self.lease_key]):
+            envelope = json.loads(payload)
+            recovered += self.restore(envelope["tenant_id"], envelope)
+        if recovered:
+            logger.warning("Recovered fair-share tasks with expired leases", extra={"count": recovered})
+        return recovered
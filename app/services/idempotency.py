@@ -0,0 +1,163 @@
+"""
+Request deduplication for job submission, backed by Redis.
+
+- Idempotency keys: the first request with a given `Idempotency-Key` runs;
+  repeats get the stored response, a 409 while the first is still running,
+  or a 422 if they reuse the key for a different request.
+- Single flight: identical (content, operation) submissions from one user
+  that arrive while a job for them is still in flight attach to that job.
+"""
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.core.redis import get_async_redis
+
+_PENDING = "pending"
+
+# Set the key to `value` with a new TTL only if it still holds `expected`
+_REPLACE_IF = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Delete the key only if it still holds `expected`
+_DELETE_IF = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class Flight:
+    """A job published by a single-flight leader."""
+    job_id: str
+    body: Dict[str, Any]
+    raw: bytes
+
+
+@dataclass
+class StoredResponse:
+    status_code: int
+    body: Dict[str, Any]
+
+
+class IdempotencyConflict(Exception):
+    """The key (or an identical request) is in use by a request that has not finished."""
+
+
+class IdempotencyMismatch(Exception):
+    """The key was first used with a different request payload."""
+
+
+class IdempotencyStore:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+
+    def _key(self, user_id: str, idempotency_key: str) -> str:
+        return f"idempotency:{self.prefix}:{user_id}:{idempotency_key}"
+
+    async def begin(self, user_id: str, idempotency_key: str, fingerprint: str) -> Optional[StoredResponse]:
+        """
+        Claim the key for this request. Returns None when the caller should
+        run the request, or the response of the request that already did.
+        """
+        redis = get_async_redis()
+        key = self._key(user_id, idempotency_key)
+        marker = json.dumps({"state": _PENDING, "fingerprint": fingerprint})
+        if await redis.set(key, marker, nx=True, ex=settings.idempotency_lock_ttl_seconds):
+            return None
+
+        raw = await redis.get(key)
+        if raw is None:
+            # Released between our SET and GET: the earlier attempt failed
+            return await self.begin(user_id, idempotency_key, fingerprint)
+        entry = json.loads(raw)
+        if entry["fingerprint"] != fingerprint:
+            raise IdempotencyMismatch()
+        if entry["state"] == _PENDING:
+            raise IdempotencyConflict()
+        return StoredResponse(entry["status_code"], entry["body"])
+
+    async def complete(
+        self, user_id: str, idempotency_key: str, fingerprint: str, status_code: int, body: Dict[str, Any]
+    ) -> None:
+        await get_async_redis().set(
+            self._key(user_id, idempotency_key),
+            json.dumps({"state": "completed", "fingerprint": fingerprint, "status_code": status_code, "body": body}),
+            ex=settings.idempotency_ttl_seconds,
+        )
+
+    async def release(self, user_id: str, idempotency_key: str) -> None:
+        """Forget a request that failed, so the client can retry it."""
+        await get_async_redis().delete(self._key(user_id, idempotency_key))
+
+
+class SingleFlight:
+    """
+    One leader per (user, content, operation) creates the job; followers wait
+    for the leader to publish the job id and reuse its result.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._replace_if = None
+        self._delete_if = None
+
+    def _scripts(self):
+        if self._replace_if is None:
+            redis = get_async_redis()
+            self._replace_if = redis.register_script(_REPLACE_IF)
+            self._delete_if = redis.register_script(_DELETE_IF)
+        return self._replace_if, self._delete_if
+
+    def _key(self, user_id: str, content_hash: str, operation: str) -> str:
+        return f"singleflight:{self.prefix}:{user_id}:{content_hash}:{operation}"
+
+    async def acquire(self, user_id: str, content_hash: str, operation: str) -> Optional[Flight]:
+        """
+        Returns None if the caller is the leader, otherwise the job the leader
+        published. Callers must check that the job is still in flight before
+        reusing it, and may call `take_over` to lead when it is not. Raises
+        IdempotencyConflict if the leader does not publish in time.
+        """
+        redis = get_async_redis()
+        key = self._key(user_id, content_hash, operation)
+        deadline = asyncio.get_running_loop().time() + settings.single_flight_wait_seconds
+        while True:
+            if await redis.set(key, _PENDING, nx=True, ex=settings.idempotency_lock_ttl_seconds):
+                return None
+            raw = await redis.get(key)
+            if raw is not None and raw != _PENDING.encode():
+                entry = json.loads(raw)
+                return Flight(entry["job_id"], entry["body"], raw)
+            if asyncio.get_running_loop().time() >= deadline:
+                raise IdempotencyConflict()
+            await asyncio.sleep(0.1)
+
+    async def take_over(self, user_id: str, content_hash: str, operation: str, stale: Flight) -> bool:
+        """Become leader in place of a finished job's entry."""
+        replace_if, _ = self._scripts()
+        return bool(await replace_if(
+            keys=[self._key(user_id, content_hash, operation)],
+            args=[stale.raw, _PENDING, settings.idempotency_lock_ttl_seconds],
+        ))
+
+    async def publish(self, user_id: str, content_hash: str, operation: str, job_id: str, body: Dict[str, Any]) -> None:
+        await get_async_redis().set(
+            self._key(user_id, content_hash, operation),
+            json.dumps({"job_id": job_id, "body": body}),
+            ex=settings.single_flight_ttl_seconds,
+        )
+
+    async def release(self, user_id: str, content_hash: str, operation: str) -> None:
+        """Give up leadership after a failure so a follower can lead."""
+        _, delete_if = self._scripts()
+        await delete_if(keys=[self._key(user_id, content_hash, operation)], args=[_PENDING])
@@ -0,0 +1,113 @@
+"""
+Image header inspection, shared by the upload API and the workers.
+
+`read_image_header` parses only the header (Image.open without load), so it
+is cheap enough to run on every upload: the recorded dimensions drive the
+decompression-bomb check, megapixel pricing and queue routing before any
+worker downloads or decodes the pixels.
+
+Pillow is imported by the functions that use it, not by this module, so
+the API process does not load it until the first upload.
+"""
+import os
+import warnings
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Optional
+
+# Formats whose animations are kept frame by frame
+ANIMATED_FORMATS = ("GIF", "WEBP")
+# Frames transformed concurrently; Pillow releases the GIL while resampling
+FRAME_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# Full-size pixel buffers alive at once while a job runs: the decoded source
+# plus the converted/resized copy (thumbnail works in place after draft)
+INTERMEDIATE_BUFFERS = {"grayscale": 2, "thumbnail": 1, "resize": 2}
+# Upper bound on an output frame's pixels, for job types that do not keep the input size
+OUTPUT_PIXELS = {"thumbnail": 128 * 128, "resize": 800 * 600}
+
+
+class InvalidImage(Exception):
+    """The bytes are not an image Pillow can identify."""
+
+
+class DecompressionBomb(Exception):
+    """The header declares more pixels than we are willing to decode."""
+
+
+@dataclass
+class ImageHeader:
+    width: int
+    height: int
+    mode: str
+    format: str
+    frame_count: int
+    # EXIF Orientation tag (1-8), None when absent
+    orientation: Optional[int] = None
+
+    @property
+    def megapixels(self) -> float:
+        return self.width * self.height / 1_000_000
+
+    @property
+    def total_megapixels(self) -> float:
+        """Megapixels across all frames: what processing actually touches."""
+        return self.megapixels * self.frame_count
+
+
+def read_image_header(data: bytes, max_pixels: Optional[int] = None) -> ImageHeader:
+    """
+    Parse the header of an encoded image. Raises InvalidImage for anything
+    Pillow cannot identify and DecompressionBomb when a frame is larger than
+    `max_pixels` (Pillow's own limit applies when it is None).
+    """
+    from PIL import ExifTags, Image
+
+    try:
+        with warnings.catch_warnings():
+            # We enforce our own limit below rather than warn on Pillow's
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(BytesIO(data)) as img:
+                width, height = img.size
+                if max_pixels is not None and width * height > max_pixels:
+                    raise DecompressionBomb(f"{width}x{height} exceeds {max_pixels} pixels")
+                frame_count = getattr(img, "n_frames", 1) if img.format in ANIMATED_FORMATS else 1
+                # Only EXIF already parsed with the header: getexif() would
+                # decode a PNG whose eXIf chunk follows the pixel data
+                orientation = None
+                raw_exif = img.info.get("exif")
+                if raw_exif:
+                    exif = Image.Exif()
+                    exif.load(raw_exif)
+                    orientation = exif.get(ExifTags.Base.Orientation)
+                return ImageHeader(width, height, img.mode, img.format, frame_count, orientation)
+    except Image.DecompressionBombError as exc:
+        raise DecompressionBomb(str(exc)) from exc
+    except DecompressionBomb:
+        raise
+    except Exception as exc:
+        raise InvalidImage(str(exc)) from exc
+
+
+def estimate_footprint(header: ImageHeader, encoded_bytes: int, job_type: str) -> int:
+    """
+    Estimate peak memory for processing an image from its header.
+
+    Returns:
+        int: width x height x bytes per pixel x intermediate buffers, plus the
+        encoded input and output buffers
+    """
+    from PIL import Image
+
+    width, height = header.width, header.height
+    bands = Image.getmodebands(header.mode)
+    # Pillow stores multi-band and 32-bit single-band pixels in 4 bytes
+    bytes_per_pixel = 4 if bands > 1 or header.mode in ("I", "F") else 1
+    buffers = INTERMEDIATE_BUFFERS.get(job_type, 2)
+    if header.frame_count > 1:
+        # Animated: RGBA frames in flight on the frame pool, every transformed
+        # output frame (held until it is encoded), plus the GIF writer's
+        # palettised copy of each
+        output_pixels = OUTPUT_PIXELS.get(job_type, width * height)
+        retained = header.frame_count * output_pixels * (5 if header.format == "GIF" else 4)
+        return width * height * 4 * (buffers + FRAME_WORKERS) + retained + 2 * encoded_bytes
+    return width * height * bytes_per_pixel * buffers + 2 * encoded_bytes
@@ -0,0 +1,334 @@
+"""
+Pipelined image worker: an alternative to the prefork Celery worker for the
+`images` and `images.small` queues.
+
+A prefork child spends most of a job blocked on storage round trips while its
+core sits idle. Here each job flows through three stages connected by bounded
+asyncio queues:
+
+    fetch  (async, `pipeline_io_concurrency` coroutines)  download + mark PROCESSING
+    cpu    (process pool sized to the core count)          decode, transform, encode
+    store  (async, `pipeline_io_concurrency` coroutines)  upload + mark COMPLETED
+
+so downloads and uploads for many jobs overlap while the cores stay busy.
+Before the CPU stage each job reserves its estimated decoded footprint from
+the host-wide memory budget; jobs above the large-image threshold are moved
+to the large-image queue instead.
+Broker messages are acked only after the store stage finishes, and the
+bounded queues push back on the broker consumer when the CPU stage is full.
+
+    python -m app.services.image_pipeline
+"""
+import asyncio
+import logging
+import os
+import queue
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+import httpx
+from kombu import Connection, Consumer, Queue
+
+from app.celery import IMAGE_QUEUE, LARGE_IMAGE_QUEUE, SMALL_IMAGE_QUEUE, celeryapp
+from app.config import settings
+from app.core.content_address import content_type_for
+from app.core.job_timing import StageTimer, attempt_started
+from app.core.logging import setup_logging
+from app.database import SessionLocal
+from app.models.imageJob import ImageStatus
+from app.repositories.sync_image_job_repository import SyncImageJobRepository
+from app.services.image_processor.processors import estimate_decoded_bytes, run_processor, warm_up
+from app.services.memory_budget import MemoryBudgetExceeded, get_memory_budget
+from app.services.storage_service import StorageService
+from app.services.webhooks import JOB_COMPLETED, JOB_FAILED, job_event
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 3
+RETRY_COUNTDOWN = 120
+
+
+@dataclass
+class PipelineJob:
+    message: Any
+    kwargs: Dict[str, Any]
+    retries: int
+    image_data: bytes = b""
+    footprint: int = 0
+    output_path: str = ""
+    output_data: bytes = b""
+    timer: StageTimer = field(default_factory=StageTimer)
+
+    @property
+    def job_id(self) -> UUID:
+        return UUID(self.kwargs["job_id"])
+
+
+def _finish(job: "PipelineJob", values: Dict[str, Any], event_type: str) -> None:
+    """Final status update plus the job's webhook events, in one transaction."""
+    db = SessionLocal()
+    try:
+        SyncImageJobRepository(db).finish_job(
+            job.job_id,
+            values,
+            event_type,
+            job_event(
+                event_type,
+                job.kwargs["image_id"],
+                job.kwargs["job_id"],
+                job.kwargs["job_type"],
+                values.get("storage_path"),
+            ),
+        )
+    finally:
+        db.close()
+
+
+def _set_status(job_id: UUID, values: Dict[str, Any]) -> Optional[ImageStatus]:
+    """Apply `values` to the job and return its previous status."""
+    db = SessionLocal()
+    try:
+        job_repo = SyncImageJobRepository(db)
+        job = job_repo.get_job_by_id(job_id)
+        previous = job.status if job is not None else None
+        if previous != ImageStatus.COMPLETED:
+            job_repo.update_job_metadata(job_id, values)
+        return previous
+    finally:
+        db.close()
+
+
+class ImagePipeline:
+    def __init__(self, io_concurrency: int, cpu_workers: int, queue_size: int):
+        self.io_concurrency = io_concurrency
+        self.cpu_workers = cpu_workers
+        self.queue_size = queue_size
+        # Messages are acked on the consumer thread that received them
+        self.acks: "queue.Queue[Any]" = queue.Queue()
+        self.budget = get_memory_budget()
+
+    async def run(self, stop_event: threading.Event) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.intake: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self.decoded: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self.encoded: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self.cpu_pool = ProcessPoolExecutor(
+            max_workers=self.cpu_workers, initializer=warm_up
+        )
+
+        limits = httpx.Limits(
+            max_connections=self.io_concurrency * 2,
+            max_keepalive_connections=self.io_concurrency * 2,
+        )
+        async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+            self.storage = StorageService(async_client=client)
+            workers = [
+                *(asyncio.create_task(self._fetch_stage()) for _ in range(self.io_concurrency)),
+                *(asyncio.create_task(self._cpu_stage()) for _ in range(self.cpu_workers)),
+                *(asyncio.create_task(self._store_stage()) for _ in range(self.io_concurrency)),
+            ]
+            consumer = threading.Thread(
+                target=self._consume, args=(stop_event,), name="pipeline-consumer", daemon=True
+            )
+            consumer.start()
+            logger.info(
+                "Image pipeline started",
+                extra={"io_concurrency": self.io_concurrency, "cpu_workers": self.cpu_workers},
+            )
+
+            await asyncio.to_thread(consumer.join)
+            # Unacked in-flight messages are redelivered by the broker
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        self.cpu_pool.shutdown(cancel_futures=True)
+
+    def _consume(self, stop_event: threading.Event) -> None:
+        """Broker consumer thread: feeds the intake queue and performs acks."""
+        with Connection(celeryapp.conf.broker_url) as connection:
+            consumer = Consumer(
+                connection,
+                queues=[Queue(IMAGE_QUEUE), Queue(SMALL_IMAGE_QUEUE)],
+                callbacks=[self._on_message],
+                accept=celeryapp.conf.accept_content,
+                prefetch_count=self.queue_size,
+            )
+            with consumer:
+                while not stop_event.is_set():
+                    try:
+                        connection.drain_events(timeout=0.5)
+                    except TimeoutError:
+                        pass
+                    while not self.acks.empty():
+                        self.acks.get_nowait().ack()
+
+    def _on_message(self, body: Any, message: Any) -> None:
+        if message.headers.get("task") != "process_image":
+            logger.warning("Rejecting unknown task", extra={"task": message.headers.get("task")})
+            message.reject()
+            return
+        _, kwargs, _ = body
+        job = PipelineJob(message, kwargs, message.headers.get("retries") or 0)
+        # Blocks the consumer while intake is full: backpressure to the broker
+        asyncio.run_coroutine_threadsafe(self.intake.put(job), self.loop).result()
+
+    async def _fetch_stage(self) -> None:
+        while True:
+            job = await self.intake.get()
+            try:
+                previous = await asyncio.to_thread(
+                    _set_status, job.job_id, {"status": ImageStatus.PROCESSING, **attempt_started()}
+                )
+                if previous == ImageStatus.COMPLETED:
+                    # The outbox delivers at least once; skip finished jobs
+                    self.acks.put(job.message)
+                    continue
+                with job.timer.stage("download"):
+                    job.image_data = await self.storage.download_file(job.kwargs["storage_path"])
+                job.timer.values["input_bytes"] = len(job.image_data)
+                job.footprint = estimate_decoded_bytes(job.image_data, job.kwargs["job_type"])
+                if job.footprint > settings.large_image_threshold_mb * 1024 * 1024:
+                    await self._requeue(job, LARGE_IMAGE_QUEUE, None)
+                    continue
+            except Exception as exc:
+                await self._fail(job, exc)
+                continue
+            await self.decoded.put(job)
+
+    async def _cpu_stage(self) -> None:
+        while True:
+            job = await self.decoded.get()
+            try:
+                token = await self._reserve(job.footprint)
+            except Exception as exc:
+                await self._fail(job, exc)
+                continue
+            if token is None:
+                job.image_data = b""
+                queue_name = job.message.delivery_info.get("routing_key") or IMAGE_QUEUE
+                await self._requeue(job, queue_name, settings.worker_memory_requeue_seconds)
+                continue
+            try:
+                with job.timer.stage("process"):
+                    job.output_path, job.output_data = await self.loop.run_in_executor(
+                        self.cpu_pool,
+                        run_processor,
+                        job.kwargs["job_type"],
+                        job.kwargs["storage_path"],
+                        job.image_data,
+                    )
+                job.timer.values["output_bytes"] = len(job.output_data)
+            except Exception as exc:
+                await self._fail(job, exc)
+                continue
+            finally:
+                job.image_data = b""
+                await asyncio.to_thread(self.budget.release, token)
+            await self.encoded.put(job)
+
+    async def _store_stage(self) -> None:
+        while True:
+            job = await self.encoded.get()
+            try:
+                with job.timer.stage("upload"):
+                    await self.storage.upload_bytes(
+                        job.output_data, job.output_path, content_type_for(job.output_path)
+                    )
+                await asyncio.to_thread(
+                    _finish,
+                    job,
+                    {"status": ImageStatus.COMPLETED, "storage_path": job.output_path, **job.timer.finished()},
+                    JOB_COMPLETED,
+                )
+            except Exception as exc:
+                await self._fail(job, exc)
+                continue
+            self.acks.put(job.message)
+
+    async def _reserve(self, nbytes: int) -> Optional[str]:
+        """Wait up to `worker_memory_wait_seconds` for room in the budget."""
+        deadline = self.loop.time() + settings.worker_memory_wait_seconds
+        while True:
+            token = await asyncio.to_thread(self.budget.try_reserve, nbytes)
+            if token is not None or self.loop.time() >= deadline:
+                return token
+            await asyncio.sleep(0.1)
+
+    async def _requeue(self, job: PipelineJob, queue_name: str, countdown: Optional[int]) -> None:
+        """Republish the job without spending one of its retries."""
+        try:
+            await asyncio.to_thread(_set_status, job.job_id, {"status": ImageStatus.QUEUED})
+            await asyncio.to_thread(
+                celeryapp.send_task,
+                "process_image",
+                kwargs=job.kwargs,
+                queue=queue_name,
+                countdown=countdown,
+                retries=job.retries,
+            )
+        except Exception:
+            logger.exception("Failed to requeue job", extra={"job_id": job.kwargs.get("job_id")})
+            return
+        logger.info(
+            "Job requeued",
+            extra={"job_id": job.kwargs.get("job_id"), "queue": queue_name, "footprint_bytes": job.footprint},
+        )
+        self.acks.put(job.message)
+
+    async def _fail(self, job: PipelineJob, exc: Exception) -> None:
+        """Mark the job FAILED and republish it with a delay, like Task.retry."""
+        logger.error(
+            "Processing failed",
+            exc_info=exc,
+            extra={
+                "image_id": job.kwargs.get("image_id"),
+                "job_id": job.kwargs.get("job_id"),
+                "job_type": job.kwargs.get("job_type"),
+                "retries": job.retries,
+            },
+        )
+        # A job larger than the whole budget can never be retried successfully
+        retry = job.retries < MAX_RETRIES and not isinstance(exc, MemoryBudgetExceeded)
+        try:
+            if not retry:
+                await asyncio.to_thread(
+                    _finish, job, {"status": ImageStatus.FAILED, **job.timer.finished()}, JOB_FAILED
+                )
+            else:
+                await asyncio.to_thread(
+                    _set_status, job.job_id, {"status": ImageStatus.FAILED, **job.timer.values}
+                )
+                await asyncio.to_thread(
+                    celeryapp.send_task,
+                    "process_image",
+                    kwargs=job.kwargs,
+                    countdown=RETRY_COUNTDOWN,
+                    retries=job.retries + 1,
+                )
+        except Exception:
+            # Leave the message unacked so the broker redelivers it
+            logger.exception("Failed to record job failure", extra={"job_id": job.kwargs.get("job_id")})
+            return
+        self.acks.put(job.message)
+
+
+def main() -> None:
+    setup_logging(settings.log_level)
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+
+    pipeline = ImagePipeline(
+        io_concurrency=settings.pipeline_io_concurrency,
+        cpu_workers=settings.pipeline_cpu_workers or os.cpu_count() or 1,
+        queue_size=settings.pipeline_queue_size,
+    )
+    asyncio.run(pipeline.run(stop_event))
+
+
+if __name__ == "__main__":
+    main()
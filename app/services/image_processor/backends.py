@@ -0,0 +1,316 @@
+"""
+Interchangeable implementations of the per-image operations.
+
+Each backend implements grayscale, resize, thumbnail and encode. Pillow is
+always available; the OpenCV backend is used only when `cv2` and `numpy` are
+installed. Which backend runs an operation is chosen per operation and image
+size class, from a stored benchmark profile or by calibrating at worker
+start-up. A backend is only eligible for an operation if its output stays
+within PIXEL_TOLERANCE of Pillow's on the calibration images.
+
+Write a profile once per host type with:
+
+    python -m app.services.image_processor.backends --output backend-profile.json
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageChops, ImageStat
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: every process calibrates for itself
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Where a calibrated profile is shared between the worker processes on a
+# host when IMAGE_BACKEND_PROFILE_PATH is not set
+DEFAULT_PROFILE_PATH = os.path.join(tempfile.gettempdir(), "image-backend-profile.json")
+
+OPERATIONS = ("grayscale", "resize", "thumbnail", "encode")
+
+# Upper bounds (in megapixels) of each size class; larger images are "large"
+SIZE_CLASSES = (("small", 0.5), ("medium", 4.0))
+CALIBRATION_SIZES = {"small": (640, 480), "medium": (1920, 1080), "large": (4000, 3000)}
+
+# Largest mean absolute per-channel difference (0-255 scale) allowed between a
+# backend's output and Pillow's. Resampling kernels differ slightly between
+# libraries; encode is compared after decoding, so it includes lossy artefacts.
+PIXEL_TOLERANCE = {"grayscale": 1.0, "resize": 3.0, "thumbnail": 3.0, "encode": 4.0}
+
+# Encoder settings shared by all backends so their outputs are comparable
+JPEG_QUALITY = 75
+WEBP_QUALITY = 80
+
+
+def size_class(size: Tuple[int, int]) -> str:
+    megapixels = size[0] * size[1] / 1_000_000
+    for name, limit in SIZE_CLASSES:
+        if megapixels <= limit:
+            return name
+    return "large"
+
+
+def thumbnail_size(size: Tuple[int, int], bound: Tuple[int, int]) -> Tuple[int, int]:
+    """Size Image.thumbnail would produce: fit within `bound`, keep aspect ratio."""
+    width, height = size
+    scale = min(bound[0] / width, bound[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+class PillowBackend:
+    name = "pillow"
+
+    def grayscale(self, img: Image.Image) -> Image.Image:
+        return img.convert("L")
+
+    def resize(self, img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        return img.resize(size, Image.LANCZOS)
+
+    def thumbnail(self, img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        img.thumbnail(size)
+        return img
+
+    def encode(self, img: Image.Image, save_format: str) -> bytes:
+        output = BytesIO()
+        img.save(output, format=save_format)
+        return output.getvalue()
+
+
+class OpenCVBackend:
+    """NumPy/OpenCV implementations; images cross over as arrays without copies where possible."""
+    name = "opencv"
+
+    ENCODE_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+
+    def __init__(self):
+        import cv2
+        import numpy
+
+        self.cv2 = cv2
+        self.np = numpy
+
+    def _array(self, img: Image.Image):
+        if img.mode not in ("L", "RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        return self.np.asarray(img), img.mode
+
+    def grayscale(self, img: Image.Image) -> Image.Image:
+        array, mode = self._array(img)
+        if mode == "L":
+            return Image.fromarray(array)
+        code = self.cv2.COLOR_RGBA2GRAY if mode == "RGBA" else self.cv2.COLOR_RGB2GRAY
+        return Image.fromarray(self.cv2.cvtColor(array, code))
+
+    def resize(self, img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        array, _ = self._array(img)
+        # Pillow's Lanczos widens its kernel when shrinking; OpenCV's does not,
+        # so area averaging is the closer (and alias-free) match for downscales
+        shrinking = size[0] < img.size[0] and size[1] < img.size[1]
+        interpolation = self.cv2.INTER_AREA if shrinking else self.cv2.INTER_LANCZOS4
+        return Image.fromarray(self.cv2.resize(array, size, interpolation=interpolation))
+
+    def thumbnail(self, img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        array, _ = self._array(img)
+        target = thumbnail_size(img.size, size)
+        if target == img.size:
+            return img
+        return Image.fromarray(self.cv2.resize(array, target, interpolation=self.cv2.INTER_AREA))
+
+    def encode(self, img: Image.Image, save_format: str) -> bytes:
+        ext = self.ENCODE_FORMATS.get(save_format)
+        if ext is None or (save_format == "JPEG" and img.mode not in ("L", "RGB")):
+            return PillowBackend().encode(img, save_format)
+        array, mode = self._array(img)
+        if mode == "RGB":
+            array = self.cv2.cvtColor(array, self.cv2.COLOR_RGB2BGR)
+        elif mode == "RGBA":
+            array = self.cv2.cvtColor(array, self.cv2.COLOR_RGBA2BGRA)
+        params = []
+        if save_format == "JPEG":
+            params = [self.cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+        elif save_format == "WEBP":
+            params = [self.cv2.IMWRITE_WEBP_QUALITY, WEBP_QUALITY]
+        ok, buffer = self.cv2.imencode(ext, array, params)
+        if not ok:
+            raise ValueError(f"OpenCV could not encode {save_format}")
+        return buffer.tobytes()
+
+
+def available_backends() -> List[object]:
+    backends: List[object] = [PillowBackend()]
+    try:
+        backends.append(OpenCVBackend())
+    except ImportError:
+        pass
+    return backends
+
+
+def mean_difference(a: Image.Image, b: Image.Image) -> float:
+    if a.size != b.size:
+        return float("inf")
+    if a.mode != b.mode:
+        b = b.convert(a.mode)
+    return max(ImageStat.Stat(ImageChops.difference(a, b)).mean)
+
+
+def within_tolerance(operation: str, reference: Image.Image, candidate: Image.Image) -> bool:
+    return mean_difference(reference, candidate) <= PIXEL_TOLERANCE[operation]
+
+
+def _calibration_image(size: Tuple[int, int]) -> Image.Image:
+    # Smooth gradients plus fractal edges: exercises resampling like a
+    # photograph would, and is deterministic so profiles are comparable
+    gradient = Image.linear_gradient("L").resize(size)
+    detail = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 64)
+    return Image.merge("RGB", (gradient, detail, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+
+
+def _run(backend, operation: str, img: Image.Image) -> Image.Image:
+    if operation == "grayscale":
+        return backend.grayscale(img.copy())
+    if operation == "resize":
+        return backend.resize(img.copy(), (800, 600))
+    if operation == "thumbnail":
+        return backend.thumbnail(img.copy(), (128, 128))
+    return Image.open(BytesIO(backend.encode(img.copy(), "JPEG"))).convert("RGB")
+
+
+def calibrate(repeats: int = 3) -> Dict[str, Dict[str, str]]:
+    """
+    Time every available backend on synthetic images of each size class and
+    return {operation: {size_class: fastest backend name}}. Backends whose
+    output is outside the tolerance of Pillow's are skipped.
+    """
+    backends = available_backends()
+    profile: Dict[str, Dict[str, str]] = {operation: {} for operation in OPERATIONS}
+    for class_name, size in CALIBRATION_SIZES.items():
+        img = _calibration_image(size)
+        for operation in OPERATIONS:
+            reference = _run(backends[0], operation, img)
+            best: Optional[Tuple[float, str]] = None
+            for backend in backends:
+                try:
+                    result = _run(backend, operation, img)
+                except Exception:
+                    logger.exception("Backend failed during calibration", extra={"backend": backend.name})
+                    continue
+                if backend is not backends[0] and not within_tolerance(operation, reference, result):
+                    logger.warning(
+                        "Backend outside pixel tolerance",
+                        extra={"backend": backend.name, "operation": operation, "size_class": class_name},
+                    )
+                    continue
+                started = time.perf_counter()
+                for _ in range(repeats):
+                    _run(backend, operation, img)
+                elapsed = (time.perf_counter() - started) / repeats
+                if best is None or elapsed < best[0]:
+                    best = (elapsed, backend.name)
+            profile[operation][class_name] = best[1] if best else PillowBackend.name
+    return profile
+
+
+class BackendSelector:
+    def __init__(self, profile: Optional[Dict[str, Dict[str, str]]] = None):
+        self.backends = {backend.name: backend for backend in available_backends()}
+        self.profile = profile or {}
+
+    def get(self, operation: str, size: Tuple[int, int]):
+        name = self.profile.get(operation, {}).get(size_class(size), PillowBackend.name)
+        # A profile written on a host with OpenCV may be read on one without it
+        return self.backends.get(name) or self.backends[PillowBackend.name]
+
+
+_selector = BackendSelector()
+
+
+def get_backend(operation: str, size: Tuple[int, int]):
+    return _selector.get(operation, size)
+
+
+def read_profile(profile_path: str) -> Optional[Dict[str, Dict[str, str]]]:
+    """The profile stored at `profile_path`, or None if it is missing or unreadable."""
+    try:
+        with open(profile_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logger.warning("Ignoring unreadable backend profile", extra={"path": profile_path}, exc_info=True)
+        return None
+
+
+def write_profile(profile_path: str, profile: Dict[str, Dict[str, str]]) -> None:
+    """Write to a temporary file and rename it over `profile_path`, so readers never see a partial profile."""
+    directory = os.path.dirname(os.path.abspath(profile_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".backend-profile-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(profile, f, indent=2)
+        os.replace(tmp_path, profile_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _calibrate_once(profile_path: str) -> Dict[str, Dict[str, str]]:
+    """
+    Calibrate and store the profile unless another process already has.
+    Every worker process calls configure() at start-up; an exclusive lock on
+    `<profile_path>.lock` lets the first one calibrate while the others wait
+    and then read its result.
+    """
+    if fcntl is None:
+        profile = calibrate()
+        write_profile(profile_path, profile)
+        return profile
+    with open(profile_path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            profile = read_profile(profile_path)
+            if profile is None:
+                profile = calibrate()
+                write_profile(profile_path, profile)
+            return profile
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def configure(profile_path: Optional[str] = None, run_calibration: bool = False) -> Dict[str, Dict[str, str]]:
+    """
+    Install the backend profile for this process: read from `profile_path` if
+    it holds one, otherwise calibrate when `run_calibration` is set. Only one
+    process per host calibrates; the others pick up the profile it writes to
+    `profile_path` (DEFAULT_PROFILE_PATH when unset). Pillow is used for
+    everything when neither applies.
+    """
+    global _selector
+    profile = read_profile(profile_path) if profile_path else None
+    if profile is None and run_calibration:
+        profile = _calibrate_once(profile_path or DEFAULT_PROFILE_PATH)
+    profile = profile or {}
+    _selector = BackendSelector(profile)
+    logger.info("Image backends configured", extra={"profile": profile})
+    return profile
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark image backends and write a profile.")
+    parser.add_argument("--output", required=True, help="Path of the JSON profile to write")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    profile = calibrate(args.repeats)
+    write_profile(args.output, profile)
+    print(json.dumps(profile, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,59 @@
 import os
-from PIL import Image
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageSequence
 from io import BytesIO
+from app.config import settings
+from app.core.content_address import content_addressed_path
+from app.services.image_processor import backends
+from app.services.image_processor.backends import get_backend
+from app.services.image_metadata import ANIMATED_FORMATS, FRAME_WORKERS, estimate_footprint, read_image_header
+
+def warm_up():
+    """
+    Load Pillow's format plugins up front (normally done lazily on the first
+    Image.open), so the first task does not pay for it, and pick the
+    processing backend for each operation and size class.
+    """
+    Image.init()
+    backends.configure(settings.image_backend_profile_path, settings.image_backend_calibrate)
+
+def _transformed_frames(img, transform):
+    """
+    Decode frames in order and transform them on a thread pool, yielding the
+    results in order. At most FRAME_WORKERS frames are in flight.
+    """
+    with ThreadPoolExecutor(max_workers=FRAME_WORKERS) as pool:
+        pending = deque()
+        for frame in ImageSequence.Iterator(img):
+            # convert() copies, detaching the frame from the decoder's state
+            pending.append(pool.submit(transform, frame.convert("RGBA")))
+            if len(pending) >= FRAME_WORKERS:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def is_animated(img, save_format):
+    return getattr(img, "is_animated", False) and img.format in ANIMATED_FORMATS and save_format in ANIMATED_FORMATS
+
+
+def save_animated(img, transform, output, save_format):
+    """
+    Apply `transform` to every frame and encode the animation. Pillow's GIF
+    and WebP writers both take the whole frame list, so every transformed
+    frame is held until encoding is done; estimate_footprint counts them.
+    """
+    frames = list(_transformed_frames(img, transform))
+    frames[0].save(
+        output,
+        format=save_format,
+        save_all=True,
+        append_images=frames[1:],
+        duration=[frame.info.get("duration", 0) for frame in frames],
+        loop=img.info.get("loop", 0),
+    )
+
 
 def process_greyscale(storage_path, image_data):
     """
@@ -14,14 +67,15 @@ def process_greyscale(storage_path, image_data):
         tuple: (processed_file_path, processed_image_data)
     """
     img = Image.open(BytesIO(image_data))
-    
-    # Convert to greyscale
-    grey_img = img.convert('L')
-    
-    # Save to BytesIO
     output = BytesIO()
     save_format = get_save_format(storage_path)
-    grey_img.save(output, format=save_format)
+
+    if is_animated(img, save_format):
+        save_animated(img, lambda frame: frame.convert('LA'), output, save_format)
+    else:
+        # Convert to greyscale
+        grey_img = get_backend("grayscale", img.size).grayscale(img)
+        output.write(get_backend("encode", grey_img.size).encode(grey_img, save_format))
     output_data = output.getvalue()
     
     filename = os.path.basename(storage_path)
@@ -43,14 +97,18 @@ def process_thumbnail(storage_path, image_data, size=(128, 128)):
         tuple: (processed_file_path, processed_image_data)
     """
     img = Image.open(BytesIO(image_data))
-    
-    # Create thumbnail
-    img.thumbnail(size)
-    
-   
     output = BytesIO()
     save_format = get_save_format(storage_path)
-    img.save(output, format=save_format)
+
+    if is_animated(img, save_format):
+        def thumbnail_frame(frame):
+            frame.thumbnail(size)
+            return frame
+        save_animated(img, thumbnail_frame, output, save_format)
+    else:
+        # Create thumbnail
+        thumb_img = get_backend("thumbnail", img.size).thumbnail(img, size)
+        output.write(get_backend("encode", thumb_img.size).encode(thumb_img, save_format))
     output_data = output.getvalue()
     
     filename = os.path.basename(storage_path)
@@ -74,13 +132,15 @@ def process_resize(storage_path, image_data, width, height):
     """
 
     img = Image.open(BytesIO(image_data))
-    
-    # Resize image
-    resized_img = img.resize((width, height), Image.LANCZOS)
-    
     output = BytesIO()
     save_format = get_save_format(storage_path)
-    resized_img.save(output, format=save_format)
+
+    if is_animated(img, save_format):
+        save_animated(img, lambda frame: frame.resize((width, height), Image.LANCZOS), output, save_format)
+    else:
+        # Resize image
+        resized_img = get_backend("resize", img.size).resize(img, (width, height))
+        output.write(get_backend("encode", resized_img.size).encode(resized_img, save_format))
     output_data = output.getvalue()
     
    
@@ -90,6 +150,41 @@ def process_resize(storage_path, image_data, width, height):
     
     return processed_path, output_data
 
+def estimate_decoded_bytes(image_data, job_type):
+    """
+    Estimate peak memory for processing an image from its header alone;
+    pixel data is not decoded here. See image_metadata.estimate_footprint.
+    """
+    return estimate_footprint(read_image_header(image_data), len(image_data), job_type)
+
+DEFAULT_THUMBNAIL_SIZE = (128, 128)
+DEFAULT_RESIZE_WIDTH = 800
+DEFAULT_RESIZE_HEIGHT = 600
+
+def run_processor(job_type, storage_path, image_data):
+    """
+    Decode, transform and encode an image for a job type.
+    Pure CPU work with picklable arguments, so it can run in a process pool.
+
+    Returns:
+        tuple: (output_storage_path, processed_image_data); the path is
+        content-addressed, see app.core.content_address
+    """
+    if job_type == "grayscale":
+        processed_path, output_data = process_greyscale(storage_path, image_data)
+    elif job_type == "thumbnail":
+        processed_path, output_data = process_thumbnail(
+            storage_path, image_data, DEFAULT_THUMBNAIL_SIZE
+        )
+    elif job_type == "resize":
+        processed_path, output_data = process_resize(
+            storage_path, image_data, DEFAULT_RESIZE_WIDTH, DEFAULT_RESIZE_HEIGHT
+        )
+    else:
+        raise ValueError(f"Unsupported job_type: {job_type}")
+
+    return content_addressed_path(output_data, os.path.basename(processed_path)), output_data
+
 def get_save_format(file_path):
     """
     Determine the save format based on file extension
@@ -101,6 +196,8 @@ def get_save_format(file_path):
         return 'PNG'
     elif ext == '.webp':
         return 'WEBP'
+    elif ext == '.gif':
+        return 'GIF'
     else:
         # Default to JPEG if unknown
         return 'JPEG'
\ No newline at end of file
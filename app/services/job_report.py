@@ -0,0 +1,100 @@
+"""
+Latency and throughput report for image jobs, built from the timestamps and
+stage timings workers record on `image_jobs`.
+
+For every UTC day, job type and priority it prints p50/p95/p99 of queue wait
+(queued to started), run time (the final attempt, started to finished) and
+total time (queued to finished), mean download/process/upload times, and
+throughput as completed jobs per hour over the part of the day inside the
+report window. Percentiles are computed in the database.
+
+    python -m app.services.job_report [--days 7] [--json]
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.config import settings
+from app.core.logging import setup_logging
+from app.database import get_async_engine, get_async_sessionmaker
+from app.repositories.job_report_repository import PERCENTILES, JobReportRepository
+
+
+def _round(value: Optional[Any]) -> Optional[float]:
+    return None if value is None else round(float(value), 1)
+
+
+def _percentile_fields(name: str, values: Optional[Sequence[Any]]) -> Dict[str, Optional[float]]:
+    values = values or [None] * len(PERCENTILES)
+    return {f"{name}_p{round(q * 100)}": _round(value) for q, value in zip(PERCENTILES, values)}
+
+
+async def build_report(days: int) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(days=days)
+    async with get_async_sessionmaker()() as session:
+        rows = await JobReportRepository(session).latency_by_day(since)
+
+    report = []
+    for row in rows:
+        day_start = row.day.replace(tzinfo=timezone.utc)
+        # The first and last day are only partly inside the window
+        hours = (min(day_start + timedelta(days=1), now) - max(day_start, since)).total_seconds() / 3600
+        report.append({
+            "day": day_start.date().isoformat(),
+            "job_type": row.job_type.value,
+            "priority": row.priority,
+            "completed": row.completed,
+            "failed": row.failed,
+            "jobs_per_hour": round(row.completed / hours, 2) if hours > 0 else None,
+            **_percentile_fields("wait_ms", row.wait_ms),
+            **_percentile_fields("run_ms", row.run_ms),
+            **_percentile_fields("total_ms", row.total_ms),
+            "download_ms_avg": _round(row.download_ms),
+            "process_ms_avg": _round(row.process_ms),
+            "upload_ms_avg": _round(row.upload_ms),
+            "input_bytes": int(row.input_bytes),
+            "output_bytes": int(row.output_bytes),
+        })
+    return report
+
+
+def format_table(report: List[Dict[str, Any]]) -> str:
+    columns = [
+        "day", "job_type", "priority", "completed", "failed", "jobs_per_hour",
+        "wait_ms_p50", "wait_ms_p95", "wait_ms_p99",
+        "run_ms_p50", "run_ms_p95", "run_ms_p99",
+        "total_ms_p50", "total_ms_p95", "total_ms_p99",
+        "download_ms_avg", "process_ms_avg", "upload_ms_avg",
+    ]
+    cells = [columns] + [["-" if row[c] is None else str(row[c]) for c in columns] for row in report]
+    widths = [max(len(line[i]) for line in cells) for i in range(len(columns))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(line, widths)) for line in cells)
+
+
+async def _main(days: int, as_json: bool) -> None:
+    try:
+        report = await build_report(days)
+    finally:
+        await get_async_engine().dispose()
+    if as_json:
+        print(json.dumps(report, indent=2))
+    elif report:
+        print(format_table(report))
+    else:
+        print(f"No jobs finished in the last {days} days.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report image job latency percentiles and throughput.")
+    parser.add_argument("--days", type=int, default=7, help="Report on jobs finished in the last N days")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+    setup_logging(settings.log_level)
+    asyncio.run(_main(args.days, args.json))
+
+
+if __name__ == "__main__":
+    main()
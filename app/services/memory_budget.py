@@ -0,0 +1,107 @@
+"""
+Host-wide memory budget for image decoding.
+
+Every worker process on a host (prefork children, pipelined workers) reserves
+the estimated decoded footprint of an image before decoding it. Reservations
+are kept in a small ledger file guarded by an exclusive flock, keyed by pid,
+so entries left behind by a killed process are reclaimed on the next access.
+"""
+import fcntl
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, Optional
+
+from app.config import settings
+
+
+class MemoryBudgetExhausted(Exception):
+    """No room in the budget within the wait period; the job should be requeued."""
+
+
+class MemoryBudgetExceeded(Exception):
+    """The reservation is larger than the whole budget and can never succeed."""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MemoryBudget:
+    def __init__(self, path: str, capacity_bytes: int):
+        self.path = path
+        self.capacity_bytes = capacity_bytes
+
+    @contextmanager
+    def _ledger(self) -> Iterator[Dict[str, Dict[str, int]]]:
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                ledger = json.loads(raw) if raw else {}
+                ledger = {pid: r for pid, r in ledger.items() if _pid_alive(int(pid))}
+                yield ledger
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(ledger))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def reserved_bytes(self) -> int:
+        with self._ledger() as ledger:
+            return sum(sum(r.values()) for r in ledger.values())
+
+    def try_reserve(self, nbytes: int) -> Optional[str]:
+        """Reserve `nbytes` if it fits; returns a token for release() or None."""
+        if nbytes > self.capacity_bytes:
+            raise MemoryBudgetExceeded(
+                f"{nbytes} bytes exceeds the {self.capacity_bytes} byte budget"
+            )
+        with self._ledger() as ledger:
+            used = sum(sum(r.values()) for r in ledger.values())
+            if used + nbytes > self.capacity_bytes:
+                return None
+            token = uuid.uuid4().hex
+            ledger.setdefault(str(os.getpid()), {})[token] = nbytes
+            return token
+
+    def release(self, token: str) -> None:
+        with self._ledger() as ledger:
+            ledger.get(str(os.getpid()), {}).pop(token, None)
+
+    @contextmanager
+    def reserve(self, nbytes: int, timeout: float, poll_interval: float = 0.1) -> Iterator[None]:
+        """Hold a reservation for the duration of the block, waiting up to `timeout`."""
+        deadline = time.monotonic() + timeout
+        token = self.try_reserve(nbytes)
+        while token is None:
+            if time.monotonic() >= deadline:
+                raise MemoryBudgetExhausted(f"No room for {nbytes} bytes after {timeout}s")
+            time.sleep(poll_interval)
+            token = self.try_reserve(nbytes)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+
+def _default_capacity_bytes() -> int:
+    # Half of physical memory, leaving room for the interpreter and page cache
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2
+
+
+@lru_cache
+def get_memory_budget() -> MemoryBudget:
+    capacity = settings.worker_memory_budget_mb * 1024 * 1024 or _default_capacity_bytes()
+    return MemoryBudget(settings.worker_memory_budget_path, capacity)
@@ -0,0 +1,180 @@
+"""
+Outbox dispatcher: drains the `outbox` table into the Celery broker.
+Per-tenant messages are parked in the fair-share queue and released to the
+broker round-robin by tenant.
+
+Run one or more alongside the API:
+
+    python -m app.services.outbox_dispatcher
+"""
+import logging
+import signal
+import threading
+from functools import lru_cache
+
+from kombu import Queue
+
+from app.celery import IMAGE_QUEUE, IMAGE_QUEUES, celeryapp
+from app.config import settings
+from app.core.logging import setup_logging
+from app.database import SessionLocal
+from app.repositories.sync_outbox_repository import SyncOutboxRepository
+from app.services.fair_share import FairShareQueue
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache
+def get_fair_share_queue(queue_name: str = IMAGE_QUEUE) -> FairShareQueue:
+    """One fair-share queue per broker queue, so each is topped up separately."""
+    return FairShareQueue(queue_name, lease_seconds=settings.fair_share_lease_seconds)
+
+
+def dispatch_batch(batch_size: int) -> int:
+    """
+    Publish up to `batch_size` due messages over a single pooled producer
+    connection and delete the ones the broker accepted, in one transaction.
+    A message that fails is rescheduled with backoff, and dead-lettered
+    after `outbox_max_attempts`; the rest of the batch still goes out.
+    Delivery is at-least-once: a crash between publish and commit republishes
+    the batch, so tasks must tolerate duplicates.
+    """
+    db = SessionLocal()
+    try:
+        outbox_repo = SyncOutboxRepository(db)
+        messages = outbox_repo.claim_batch(batch_size)
+        if not messages:
+            db.rollback()
+            return 0
+
+        published, failed = [], []
+        last_error = None
+        with celeryapp.producer_or_acquire() as producer:
+            for message in messages:
+                try:
+                    _publish(message, producer)
+                except Exception as e:
+                    logger.exception(
+                        "Outbox publish failed",
+                        extra={"message_id": message.id, "attempts": message.attempts + 1},
+                    )
+                    failed.append(message.id)
+                    last_error = f"{type(e).__name__}: {e}"
+                else:
+                    published.append(message.id)
+
+        dead = outbox_repo.record_failure(
+            failed,
+            last_error,
+            settings.outbox_max_attempts,
+            settings.outbox_backoff_base_seconds,
+            settings.outbox_backoff_max_seconds,
+        )
+        if dead:
+            logger.error("Outbox messages dead-lettered", extra={"count": dead})
+        outbox_repo.delete_messages(published)
+        db.commit()
+        return len(published)
+    finally:
+        db.close()
+
+
+def _publish(message, producer) -> None:
+    if message.tenant_id and settings.fair_share_enabled:
+        get_fair_share_queue(message.queue or IMAGE_QUEUE).push(message.tenant_id, {
+            "task_name": message.task_name,
+            "kwargs": message.kwargs,
+            "queue": message.queue,
+            "tenant_id": message.tenant_id,
+        })
+        return
+    celeryapp.send_task(
+        message.task_name,
+        kwargs=message.kwargs,
+        queue=message.queue,
+        producer=producer,
+    )
+
+
+def _broker_queue_depth(queue_name: str) -> int:
+    with celeryapp.connection_for_write() as connection:
+        try:
+            _, count, _ = Queue(queue_name).bind(connection.default_channel).queue_declare(passive=True)
+        except Exception:
+            # Not declared yet (e.g. an empty Redis list): nothing waiting
+            return 0
+        return count
+
+
+def feed_fair_share(max_depth: int) -> int:
+    """
+    Top each of the broker's image queues up to `max_depth` messages, taking
+    one task per tenant in round-robin order from its fair-share queue.
+    Tasks are leased while they are published, so none is lost if the
+    publish fails or this dispatcher dies midway.
+    """
+    return sum(_feed_queue(queue_name, max_depth) for queue_name in IMAGE_QUEUES)
+
+
+def _feed_queue(queue_name: str, max_depth: int) -> int:
+    room = max_depth - _broker_queue_depth(queue_name)
+    if room <= 0:
+        return 0
+
+    fair_queue = get_fair_share_queue(queue_name)
+    fair_queue.recover_expired()
+    fed = 0
+    with celeryapp.producer_or_acquire() as producer:
+        while fed < room:
+            envelope = fair_queue.pop()
+            if envelope is None:
+                break
+            try:
+                celeryapp.send_task(
+                    envelope["task_name"],
+                    kwargs=envelope["kwargs"],
+                    queue=envelope["queue"],
+                    producer=producer,
+                )
+            except Exception:
+                fair_queue.restore(envelope["tenant_id"], envelope)
+                raise
+            fair_queue.ack(envelope)
+            fed += 1
+    return fed
+
+
+def run(stop_event: threading.Event) -> None:
+    batch_size = settings.outbox_batch_size
+    while not stop_event.is_set():
+        try:
+            dispatched = dispatch_batch(batch_size)
+        except Exception:
+            logger.exception("Outbox dispatch failed")
+            dispatched = 0
+        if dispatched:
+            logger.info("Outbox batch dispatched", extra={"count": dispatched})
+        if settings.fair_share_enabled:
+            try:
+                fed = feed_fair_share(settings.fair_share_broker_depth)
+            except Exception:
+                logger.exception("Fair-share feed failed")
+                fed = 0
+            if fed:
+                logger.info("Fair-share tasks published", extra={"count": fed})
+        # A full batch means there is likely more waiting; otherwise back off
+        if dispatched < batch_size:
+            stop_event.wait(settings.outbox_poll_interval)
+
+
+def main() -> None:
+    setup_logging(settings.log_level)
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+    logger.info("Outbox dispatcher started")
+    run(stop_event)
+
+
+if __name__ == "__main__":
+    main()
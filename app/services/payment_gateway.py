@@ -0,0 +1,203 @@
+import abc
+import asyncio
+import hashlib
+import hmac
+import logging
+import random
+import uuid
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentGatewayError(Exception):
+    """Raised when the payment provider cannot complete a request."""
+
+
+class PaymentGateway(abc.ABC):
+    """
+    Async interface to the payment provider used by the payment routes.
+    """
+
+    @abc.abstractmethod
+    async def create_order(self, amount: int, currency: str, notes: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Create an order for `amount` in the currency's smallest unit."""
+
+    @abc.abstractmethod
+    async def fetch_order(self, order_id: str) -> Dict[str, Any]:
+        """The order as created, including the notes it was created with."""
+
+    @abc.abstractmethod
+    async def fetch_payment(self, payment_id: str) -> Dict[str, Any]:
+        """A payment and its status."""
+
+    def verify_checkout_signature(self, order_id: str, payment_id: str, signature: str) -> bool:
+        """Signature returned to the browser by the checkout widget."""
+        generated = hmac.new(
+            bytes(settings.RAZORPAY_KEY_SECRET, "utf-8"),
+            f"{order_id}|{payment_id}".encode("utf-8"),
+            hashlib.sha256,
+        ).hexdigest()
+        return hmac.compare_digest(generated, signature)
+
+    def verify_webhook_signature(self, body: bytes, signature: str) -> bool:
+        """`X-Razorpay-Signature` of a webhook delivery."""
+        if not settings.RAZORPAY_WEBHOOK_SECRET:
+            return False
+        generated = hmac.new(
+            bytes(settings.RAZORPAY_WEBHOOK_SECRET, "utf-8"), body, hashlib.sha256
+        ).hexdigest()
+        return hmac.compare_digest(generated, signature)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class RazorpayGateway(PaymentGateway):
+    """
+    Talks to the Razorpay REST API over a pooled httpx.AsyncClient instead of
+    the blocking SDK, so provider round trips never stall the event loop.
+    Reads are retried with jittered exponential backoff on transport errors,
+    429 and 5xx responses. Creating an order is not idempotent: it is only
+    retried when Razorpay cannot have acted on it (connection not
+    established, or 429), so a lost response never creates a second order.
+    """
+
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+    # Safe to retry whether or not the request is idempotent
+    NOT_PROCESSED_STATUS_CODES = {429}
+    NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+    def __init__(self):
+        self.base_url = settings.razorpay_api_url
+        self.max_retries = settings.razorpay_max_retries
+        self.backoff_base = settings.razorpay_backoff_base_seconds
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET),
+                timeout=httpx.Timeout(
+                    settings.razorpay_read_timeout_seconds,
+                    connect=settings.razorpay_connect_timeout_seconds,
+                ),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def _request(self, method: str, path: str, idempotent: bool = True, **kwargs) -> Dict[str, Any]:
+        client = self._get_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.request(method, path, **kwargs)
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                error: Exception = PaymentGatewayError(
+                    f"Razorpay returned {response.status_code} for {method} {path}"
+                )
+                retryable = idempotent or response.status_code in self.NOT_PROCESSED_STATUS_CODES
+            except httpx.TransportError as exc:
+                error = exc
+                retryable = idempotent or isinstance(exc, self.NOT_SENT_ERRORS)
+            except httpx.HTTPStatusError as exc:
+                raise PaymentGatewayError(
+                    f"Razorpay rejected {method} {path}: {exc.response.text}"
+                ) from exc
+
+            if not retryable or attempt == self.max_retries:
+                raise PaymentGatewayError(str(error)) from error
+            delay = self.backoff_base * (2 ** attempt) * random.uniform(0.5, 1.5)
+            logger.warning(
+                "Razorpay request failed, retrying",
+                extra={"method": method, "path": path, "attempt": attempt + 1, "delay_s": round(delay, 3)},
+            )
+            await asyncio.sleep(delay)
+
+    async def create_order(self, amount: int, currency: str, notes: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        return await self._request(
+            "POST", "/orders", idempotent=False,
+            json={"amount": amount, "currency": currency, "notes": notes or {}},
+        )
+
+    async def fetch_order(self, order_id: str) -> Dict[str, Any]:
+        return await self._request("GET", f"/orders/{order_id}")
+
+    async def fetch_payment(self, payment_id: str) -> Dict[str, Any]:
+        return await self._request("GET", f"/payments/{payment_id}")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class StubPaymentGateway(PaymentGateway):
+    """
+    In-process gateway for local development and tests: orders are kept in
+    memory and every payment made against them reports as authorized.
+    """
+
+    def __init__(self):
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.payments: Dict[str, Dict[str, Any]] = {}
+
+    async def create_order(self, amount: int, currency: str, notes: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        order = {
+            "id": f"order_stub_{uuid.uuid4().hex[:14]}",
+            "amount": amount,
+            "currency": currency,
+            "notes": notes or {},
+            "status": "created",
+        }
+        self.orders[order["id"]] = order
+        return order
+
+    def pay(self, order_id: str) -> Dict[str, Any]:
+        """Simulate the customer completing checkout for an order."""
+        order = self.orders[order_id]
+        payment = {
+            "id": f"pay_stub_{uuid.uuid4().hex[:14]}",
+            "order_id": order_id,
+            "amount": order["amount"],
+            "currency": order["currency"],
+            "notes": order["notes"],
+            "status": "authorized",
+        }
+        self.payments[payment["id"]] = payment
+        return payment
+
+    async def fetch_order(self, order_id: str) -> Dict[str, Any]:
+        try:
+            return self.orders[order_id]
+        except KeyError:
+            raise PaymentGatewayError(f"Unknown order {order_id}")
+
+    async def fetch_payment(self, payment_id: str) -> Dict[str, Any]:
+        try:
+            return self.payments[payment_id]
+        except KeyError:
+            raise PaymentGatewayError(f"Unknown payment {payment_id}")
+
+
+_gateway: Optional[PaymentGateway] = None
+
+
+def get_payment_gateway() -> PaymentGateway:
+    """
+    Process-wide gateway selected by `settings.payment_gateway`
+    ("razorpay" or "stub").
+    """
+    global _gateway
+    if _gateway is None:
+        if settings.payment_gateway == "stub":
+            _gateway = StubPaymentGateway()
+        else:
+            _gateway = RazorpayGateway()
+    return _gateway
@@ -0,0 +1,74 @@
+import logging
+import math
+from typing import Tuple
+
+from app.config import settings
+from app.core.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Refill from elapsed time, then take `cost` tokens if available. Runs
+# atomically inside Redis, so concurrent API processes never over-admit.
+# Returns {allowed, retry_after_ms}.
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+
+local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now_ms
+
+tokens = math.min(burst, tokens + (now_ms - ts) * rate / 1000)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = math.ceil((cost - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', key, 'tokens', tokens, 'ts', now_ms)
+redis.call('PEXPIRE', key, math.ceil(burst * 1000 / rate) + 1000)
+return {allowed, retry_after}
+"""
+
+
+class TokenBucketRateLimiter:
+    """
+    Per-key token buckets in Redis, parameterised per priority tier by
+    `settings.rate_limit_tiers`.
+    """
+
+    def __init__(self, prefix: str = "ratelimit"):
+        self.prefix = prefix
+        self._script = None
+
+    def _get_script(self):
+        if self._script is None:
+            self._script = get_async_redis().register_script(TOKEN_BUCKET_SCRIPT)
+        return self._script
+
+    async def acquire(self, key: str, tier: str, cost: int = 1) -> Tuple[bool, int]:
+        """
+        Take `cost` tokens from the bucket for (`key`, `tier`).
+        Returns (allowed, retry_after_seconds).
+        """
+        tiers = settings.rate_limit_tiers
+        # Unknown tiers share the "low" bucket rather than getting their own
+        tier = tier.lower() if tier.lower() in tiers else "low"
+        limits = tiers[tier]
+        allowed, retry_after_ms = await self._get_script()(
+            keys=[f"{self.prefix}:{tier}:{key}"],
+            args=[limits["rate"], limits["burst"], cost],
+        )
+        return bool(allowed), math.ceil(retry_after_ms / 1000)
+
+
+rate_limiter = TokenBucketRateLimiter()
@@ -0,0 +1,205 @@
+"""
+Storage lifecycle worker: reclaims storage objects nothing points at any more.
+
+Each run walks the bucket listing page by page and checks every page against
+`images` and `image_jobs` (output folders a job still uses are not listed at
+all). An object is collected when no image references it and every job that
+does has outlived its job type's retention period
+(`storage_retention_days`). That covers uploads whose DB insert failed,
+originals and outputs of deleted images, and expired outputs. Objects younger
+than `storage_orphan_grace_hours` are never touched.
+
+Candidates are rechecked right before each bulk delete, and expired jobs are
+detached from their outputs first, so a crash leaves an orphan for the next
+run rather than a job pointing at a missing object. With --dry-run nothing is
+changed and the report shows what would have been reclaimed.
+
+    python -m app.services.storage_lifecycle [--dry-run] [--once]
+"""
+import argparse
+import asyncio
+import logging
+import signal
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Tuple
+
+import httpx
+
+from app.config import settings
+from app.core.content_address import CONTENT_ROOT
+from app.core.logging import setup_logging
+from app.database import get_async_engine, get_async_sessionmaker
+from app.models.imageJob import JobType
+from app.repositories.storage_lifecycle_repository import StorageLifecycleRepository
+from app.services.storage_service import StorageError, StorageService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LifecycleReport:
+    dry_run: bool
+    objects_scanned: int = 0
+    bytes_scanned: int = 0
+    # processed/<sha256>/ folders a job still points into, not listed
+    live_outputs_skipped: int = 0
+    candidates: int = 0
+    candidate_bytes: int = 0
+    jobs_expired: int = 0
+    objects_deleted: int = 0
+    bytes_reclaimed: int = 0
+    delete_failures: int = 0
+    truncated: bool = False
+    duration_seconds: float = 0.0
+
+
+def retention_cutoffs(now: datetime) -> Dict[JobType, datetime]:
+    return {
+        JobType(job_type): now - timedelta(days=days)
+        for job_type, days in settings.storage_retention_days.items()
+        if days > 0
+    }
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class StorageLifecycleManager:
+    def __init__(self, storage: StorageService, dry_run: bool = False):
+        self.storage = storage
+        self.dry_run = dry_run
+        self.sessionmaker = get_async_sessionmaker()
+        self.page_size = settings.storage_lifecycle_page_size
+
+    async def _walk(self, cutoffs: Dict[JobType, datetime], report: LifecycleReport) -> AsyncIterator[List[Tuple[str, int, datetime]]]:
+        """
+        Pages of (path, size, updated_at) for the bucket's objects. Each output
+        has its own `processed/<sha256>/` folder, so those folders are checked
+        against the jobs a page at a time and only unreferenced ones are
+        listed: a pass costs one listing per page plus one per orphaned or
+        expired output, not one per output. (A referenced folder's objects are
+        all kept, including a copy under a name no job uses any more.)
+        """
+        folders = [""]
+        while folders:
+            folder = folders.pop()
+            offset = 0
+            while True:
+                entries = await self.storage.list_objects(folder, limit=self.page_size, offset=offset)
+                files, subfolders = [], []
+                for entry in entries:
+                    path = f"{folder}/{entry['name']}" if folder else entry["name"]
+                    if entry.get("id") is None:
+                        subfolders.append(path)
+                    else:
+                        metadata = entry.get("metadata") or {}
+                        updated = entry.get("updated_at") or entry.get("created_at")
+                        files.append((path, int(metadata.get("size") or 0), _parse_time(updated)))
+                if folder == CONTENT_ROOT and subfolders:
+                    async with self.sessionmaker() as session:
+                        live = await StorageLifecycleRepository(session).live_digests(
+                            [path.rpartition("/")[2] for path in subfolders], cutoffs
+                        )
+                    report.live_outputs_skipped += len(live)
+                    subfolders = [path for path in subfolders if path.rpartition("/")[2] not in live]
+                folders.extend(subfolders)
+                if files:
+                    yield files
+                if len(entries) < self.page_size:
+                    break
+                offset += len(entries)
+
+    async def run_once(self) -> LifecycleReport:
+        started = time.monotonic()
+        now = datetime.now(timezone.utc)
+        cutoffs = retention_cutoffs(now)
+        grace_cutoff = now - timedelta(hours=settings.storage_orphan_grace_hours)
+        report = LifecycleReport(dry_run=self.dry_run)
+
+        # Nothing is deleted while walking, so listing offsets stay valid;
+        # the run is capped and the next one picks up where this stopped
+        candidates: Dict[str, int] = {}
+        async for page in self._walk(cutoffs, report):
+            report.objects_scanned += len(page)
+            report.bytes_scanned += sum(size for _, size, _ in page)
+            old_enough = [(path, size) for path, size, updated in page if updated < grace_cutoff]
+            async with self.sessionmaker() as session:
+                live = await StorageLifecycleRepository(session).live_paths(
+                    [path for path, _ in old_enough], cutoffs
+                )
+            for path, size in old_enough:
+                if path not in live:
+                    candidates[path] = size
+            if len(candidates) >= settings.storage_lifecycle_max_deletes_per_run:
+                report.truncated = True
+                break
+
+        report.candidates = len(candidates)
+        report.candidate_bytes = sum(candidates.values())
+        if not self.dry_run:
+            await self._delete(candidates, cutoffs, report)
+
+        report.duration_seconds = round(time.monotonic() - started, 3)
+        logger.info("Storage lifecycle run", extra=asdict(report))
+        return report
+
+    async def _delete(self, candidates: Dict[str, int], cutoffs: Dict[JobType, datetime], report: LifecycleReport) -> None:
+        paths = list(candidates)
+        batch_size = settings.storage_lifecycle_delete_batch_size
+        for start in range(0, len(paths), batch_size):
+            batch = paths[start:start + batch_size]
+            async with self.sessionmaker() as session:
+                repo = StorageLifecycleRepository(session)
+                # Referenced again since the scan, e.g. a new job produced identical output
+                live = await repo.live_paths(batch, cutoffs)
+                batch = [path for path in batch if path not in live]
+                report.jobs_expired += await repo.expire_outputs(batch, cutoffs)
+            try:
+                deleted = await self.storage.delete_files(batch)
+            except StorageError:
+                report.delete_failures += len(batch)
+                logger.exception("Storage bulk delete failed", extra={"objects": len(batch)})
+                continue
+            report.objects_deleted += len(deleted)
+            report.bytes_reclaimed += sum(candidates.get(path, 0) for path in deleted)
+
+
+async def _main(dry_run: bool, once: bool) -> None:
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    logger.info("Storage lifecycle worker started", extra={"dry_run": dry_run})
+    try:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0)) as client:
+            manager = StorageLifecycleManager(StorageService(async_client=client), dry_run=dry_run)
+            while not stop_event.is_set():
+                try:
+                    await manager.run_once()
+                except Exception:
+                    logger.exception("Storage lifecycle run failed")
+                if once:
+                    break
+                try:
+                    await asyncio.wait_for(stop_event.wait(), settings.storage_lifecycle_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+    finally:
+        await get_async_engine().dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reclaim unreferenced and expired storage objects.")
+    parser.add_argument("--dry-run", action="store_true", default=settings.storage_lifecycle_dry_run,
+                        help="Report what would be deleted without changing anything")
+    parser.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    args = parser.parse_args()
+    setup_logging(settings.log_level)
+    asyncio.run(_main(args.dry_run, args.once))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Failure handling for storage calls: a circuit breaker, full-jitter retry
+delays, a rolling latency window and hedged requests.
+
+All state is per process and shared by every StorageService instance in it,
+so one worker child that sees storage failing stops sending it traffic for
+`storage_breaker_reset_seconds` instead of each call waiting out its timeout.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
+from functools import lru_cache
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open, calls
+    are refused; after `reset_timeout` one probe call is let through, and its
+    outcome closes the breaker again or re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if self._probe_started is not None else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            # A probe whose caller vanished (e.g. was cancelled) must not wedge the breaker
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                return False
+            self._probe_started = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            was_open = self._opened_at is not None
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+        if was_open:
+            logger.info("Circuit breaker closed", extra={"breaker": self.name})
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe_started is None and self._failures < self.failure_threshold:
+                return
+            reopened = self._opened_at is not None
+            self._opened_at = time.monotonic()
+            self._probe_started = None
+        if not reopened:
+            logger.warning("Circuit breaker opened", extra={"breaker": self.name, "failures": self._failures})
+
+
+class LatencyTracker:
+    """Latencies of the last `window` successful calls."""
+
+    def __init__(self, window: int = 1000):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full jitter: uniform in [0, min(max, base * 2^attempt)]."""
+    ceiling = min(settings.storage_retry_max_seconds, settings.storage_retry_base_seconds * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+@lru_cache
+def get_storage_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        "storage", settings.storage_breaker_failure_threshold, settings.storage_breaker_reset_seconds
+    )
+
+
+@lru_cache
+def get_download_latency() -> LatencyTracker:
+    return LatencyTracker()
+
+
+def hedge_delay() -> Optional[float]:
+    """How long a download may run before a hedge is sent, or None to never hedge."""
+    if not settings.storage_hedge_enabled:
+        return None
+    return get_download_latency().percentile(settings.storage_hedge_percentile, settings.storage_hedge_min_samples)
+
+
+async def hedged(
+    call: Callable[[], Awaitable[T]],
+    delay: Optional[float],
+    settled: Callable[[T], bool] = lambda result: True,
+) -> T:
+    """
+    Run `call`; if it has not finished after `delay` seconds, start a second
+    identical call and return the first result that is `settled` (e.g. not a
+    retryable status); the other call is cancelled. A result that is not
+    settled waits for the other call, and is returned only if that one does
+    no better, so the caller's retries see it.
+    """
+    first = asyncio.ensure_future(call())
+    if delay is None:
+        return await first
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    logger.debug("Sending hedged request", extra={"delay_seconds": round(delay, 3)})
+    pending = {first, asyncio.ensure_future(call())}
+    unsettled: Optional[asyncio.Future] = None
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                elif settled(task.result()):
+                    return task.result()
+                else:
+                    unsettled = task
+        if unsettled is not None:
+            return unsettled.result()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+@lru_cache
+def _hedge_pool() -> ThreadPoolExecutor:
+    # Created on first use, i.e. after a prefork child has forked
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="storage-hedge")
+
+
+def hedged_sync(call: Callable[[], T], delay: Optional[float], settled: Callable[[T], bool] = lambda result: True) -> T:
+    """
+    Blocking counterpart of `hedged`. A losing request cannot be interrupted;
+    it finishes in the background, bounded by its own timeouts.
+    """
+    if delay is None:
+        return call()
+    first = _hedge_pool().submit(call)
+    try:
+        return first.result(timeout=delay)
+    except FuturesTimeout:
+        pass
+
+    logger.debug("Sending hedged request", extra={"delay_seconds": round(delay, 3)})
+    pending = {first, _hedge_pool().submit(call)}
+    unsettled = None
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                error = future.exception()
+            elif settled(future.result()):
+                return future.result()
+            else:
+                unsettled = future
+    if unsettled is not None:
+        return unsettled.result()
+    raise error
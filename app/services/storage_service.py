@@ -1,13 +1,125 @@
+import asyncio
+import logging
 import os
+import time
 import uuid
-from typing import BinaryIO, Optional, Tuple
-import httpx
-import requests
-from fastapi import UploadFile, HTTPException, status
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, List, Optional, Tuple
 from app.config import settings
+from app.services.storage_resilience import (
+    backoff_delay,
+    get_download_latency,
+    get_storage_breaker,
+    hedge_delay,
+    hedged,
+    hedged_sync,
+)
+
+if TYPE_CHECKING:
+    from fastapi import UploadFile
+
+# httpx (async, API side) and requests (sync, worker side) are imported in the
+# methods that use them so each process only loads its own HTTP client.
+
+logger = logging.getLogger(__name__)
+
+
+class StorageError(Exception):
+    """Raised when a storage operation cannot be completed."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        # HTTP status from storage when it answered with an error
+        self.status_code = status_code
+
+
+class StorageUnavailable(StorageError):
+    """The circuit breaker is open: storage is failing and was not called."""
+
+
+# Worth another attempt: storage is overloaded or briefly unavailable
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+
+# Pooled httpx.AsyncClient shared by the API process's StorageService
+# instances, opened and closed by the app lifespan (see app.main)
+_shared_async_client: Optional[Any] = None
+
+
+def open_storage_client() -> None:
+    """Create the process-wide pooled client. Call once at startup."""
+    global _shared_async_client
+    if _shared_async_client is None:
+        import httpx
+
+        _shared_async_client = httpx.AsyncClient()
+
+
+async def close_storage_client() -> None:
+    global _shared_async_client
+    if _shared_async_client is not None:
+        await _shared_async_client.aclose()
+        _shared_async_client = None
+
+
+def _settled(response) -> bool:
+    # A hedged download keeps waiting for the other attempt on a retryable status
+    return response.status_code not in RETRYABLE_STATUS
+
+
+class SignedUrlCache:
+    """
+    In-process LRU of signed URLs. URLs are signed for `expires_in` seconds
+    and handed out until `min_remaining` seconds before they expire, so a
+    client always has time to follow one.
+    """
+
+    def __init__(self, storage: "StorageService", expires_in: int, max_size: int, min_remaining: int = 300):
+        self.storage = storage
+        self.expires_in = expires_in
+        self.max_size = max_size
+        self.min_remaining = min(min_remaining, expires_in // 2)
+        self._urls: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    async def get(self, file_path: str) -> Optional[Tuple[str, int]]:
+        """Returns (signed_url, seconds_until_expiry) or None if signing failed."""
+        now = time.monotonic()
+        cached = self._urls.get(file_path)
+        if cached is not None and cached[1] - now > self.min_remaining:
+            self._urls.move_to_end(file_path)
+            return cached[0], int(cached[1] - now)
+
+        url = await self.storage.get_signed_url(file_path, expires_in=self.expires_in)
+        if url is None:
+            return None
+        if url.startswith("/"):
+            # Supabase answers with a path relative to the storage API
+            url = f"{self.storage.url}/storage/v1{url}"
+        self._urls[file_path] = (url, now + self.expires_in)
+        self._urls.move_to_end(file_path)
+        while len(self._urls) > self.max_size:
+            self._urls.popitem(last=False)
+        return url, self.expires_in
+
 
 class StorageService:
-    def __init__(self):
+    """
+    Supabase Storage client. Every call gets per-operation connect/read
+    timeouts (`storage_connect_timeout_seconds`, `storage_read_timeouts`),
+    goes through the process-wide circuit breaker, and is retried with
+    jittered backoff on transport errors and retryable statuses. Downloads
+    can be hedged, see app.services.storage_resilience.
+    All operations are idempotent (uploads use x-upsert), so retries are safe.
+    """
+
+    def __init__(self, async_client: Optional[Any] = None):
+        """
+        async_client: optional httpx.AsyncClient. Long-running async workers
+        pass their own; without one the process-wide client opened by
+        open_storage_client is used, or a client per call if there is none.
+        """
+        self.async_client = async_client
         self.url = settings.SUPABASE_URL
         self.key = settings.SUPABASE_KEY
         self.bucket_name = settings.SUPABASE_BUCKET
@@ -15,8 +127,117 @@ class StorageService:
             "apikey": self.key,
             "Authorization": f"Bearer {self.key}"
         }
-    
-    async def upload_file(self, file: UploadFile, user_id: uuid.UUID) -> Tuple[str, str]:
+
+    def _object_url(self, file_path: str) -> str:
+        return f"{self.url}/storage/v1/object/{self.bucket_name}/{file_path}"
+
+    @staticmethod
+    def _timeouts(operation: str) -> Tuple[float, float]:
+        read = settings.storage_read_timeouts.get(operation, 30.0)
+        return settings.storage_connect_timeout_seconds, read
+
+    def _pooled_client(self):
+        return self.async_client or _shared_async_client
+
+    @asynccontextmanager
+    async def _http(self):
+        pooled = self._pooled_client()
+        if pooled is not None:
+            yield pooled
+        else:
+            import httpx
+
+            async with httpx.AsyncClient() as client:
+                yield client
+
+    async def _request(self, operation: str, method: str, url: str, hedge: bool = False, **kwargs):
+        """
+        Send a request with timeouts, breaker and retries. Returns the
+        response for 2xx/3xx; raises StorageError otherwise.
+        """
+        import httpx
+
+        connect, read = self._timeouts(operation)
+        timeout = httpx.Timeout(read, connect=connect)
+        breaker = get_storage_breaker()
+        last_error: Optional[str] = None
+
+        async with self._http() as client:
+            async def attempt():
+                started = time.monotonic()
+                response = await client.request(method, url, timeout=timeout, **kwargs)
+                if hedge and response.is_success:
+                    get_download_latency().record(time.monotonic() - started)
+                return response
+
+            for attempt_number in range(settings.storage_max_attempts):
+                if not breaker.allow():
+                    raise StorageUnavailable(f"Storage {operation} refused: circuit open")
+                try:
+                    response = await hedged(attempt, hedge_delay() if hedge else None, _settled)
+                except httpx.HTTPError as e:
+                    breaker.record_failure()
+                    last_error = f"{type(e).__name__}: {e}"
+                else:
+                    if response.status_code not in RETRYABLE_STATUS:
+                        breaker.record_success()
+                        if response.is_error:
+                            raise StorageError(
+                                f"Storage {operation} failed: HTTP {response.status_code}",
+                                status_code=response.status_code,
+                            )
+                        return response
+                    breaker.record_failure()
+                    last_error = f"HTTP {response.status_code}"
+                if attempt_number + 1 < settings.storage_max_attempts:
+                    await asyncio.sleep(backoff_delay(attempt_number))
+
+        raise StorageError(
+            f"Storage {operation} failed after {settings.storage_max_attempts} attempts: {last_error}"
+        )
+
+    def _request_sync(self, operation: str, method: str, url: str, hedge: bool = False, **kwargs):
+        """Blocking counterpart of _request, for Celery tasks."""
+        import requests
+
+        timeout = self._timeouts(operation)
+        breaker = get_storage_breaker()
+        last_error: Optional[str] = None
+
+        def attempt():
+            started = time.monotonic()
+            response = requests.request(method, url, timeout=timeout, **kwargs)
+            if hedge and response.ok:
+                get_download_latency().record(time.monotonic() - started)
+            return response
+
+        for attempt_number in range(settings.storage_max_attempts):
+            if not breaker.allow():
+                raise StorageUnavailable(f"Storage {operation} refused: circuit open")
+            try:
+                response = hedged_sync(attempt, hedge_delay() if hedge else None, _settled)
+            except requests.RequestException as e:
+                breaker.record_failure()
+                last_error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    breaker.record_success()
+                    if response.status_code >= 400:
+                        raise StorageError(
+                            f"Storage {operation} failed: HTTP {response.status_code}",
+                            status_code=response.status_code,
+                        )
+                    return response
+                breaker.record_failure()
+                last_error = f"HTTP {response.status_code}"
+            if attempt_number + 1 < settings.storage_max_attempts:
+                time.sleep(backoff_delay(attempt_number))
+
+        raise StorageError(
+            f"Storage {operation} failed after {settings.storage_max_attempts} attempts: {last_error}"
+        )
+
+    async def upload_file(self, file: "UploadFile", user_id: uuid.UUID) -> Tuple[str, str]:
         """
         Upload a file to Supabase Storage with private access.
         Returns (storage_path, public_url)
@@ -35,17 +256,19 @@ class StorageService:
             # Read file content
             content = await file.read()
             
-            # Upload to Supabase Storage
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.url}/storage/v1/object/{self.bucket_name}/{file_path}",
-                    headers={
-                        **self.headers,
-                        "Content-Type": file.content_type or "application/octet-stream"
-                    },
-                    content=content
-                )
-                response.raise_for_status()
+            # Upload to Supabase Storage; the path is fresh, so upserting only
+            # matters when a retry follows an attempt whose response was lost
+            await self._request(
+                "upload",
+                "POST",
+                self._object_url(file_path),
+                headers={
+                    **self.headers,
+                    "Content-Type": file.content_type or "application/octet-stream",
+                    "x-upsert": "true",
+                },
+                content=content,
+            )
             
             # Store file_path (storage_path) in DB for future reference
             # Do NOT store signed_url in DB, always generate on demand
@@ -53,18 +276,12 @@ class StorageService:
             # Get a signed URL with temporary access (for immediate use)
             signed_url = await self.get_signed_url(file_path)
             if not signed_url:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to generate signed URL"
-                )
+                raise StorageError("Failed to generate signed URL")
             
             return file_path, signed_url
         except Exception as e:
-            print(f"Error uploading file: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to upload file: {str(e)}"
-            )
+            logger.exception("Error uploading file", extra={"user_id": str(user_id)})
+            raise StorageError(f"Failed to upload file: {str(e)}") from e
     
     async def get_signed_url(self, file_path: str, expires_in: int = 3600) -> Optional[str]:
         """
@@ -72,69 +289,180 @@ class StorageService:
         Always generate this on demand, do not store in DB.
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.url}/storage/v1/object/sign/{self.bucket_name}/{file_path}",
-                    headers=self.headers,
-                    json={"expiresIn": expires_in}
-                )
-                response.raise_for_status()
-                data = response.json()
-                # Supabase returns {"signedURL": "..."}
-                return data.get("signedURL")
-        except Exception as e:
-            print(f"Error getting signed URL: {str(e)}")
+            response = await self._request(
+                "sign",
+                "POST",
+                f"{self.url}/storage/v1/object/sign/{self.bucket_name}/{file_path}",
+                headers=self.headers,
+                json={"expiresIn": expires_in},
+            )
+            # Supabase returns {"signedURL": "..."}
+            return response.json().get("signedURL")
+        except Exception:
+            logger.exception("Error getting signed URL", extra={"storage_path": file_path})
             return None
     
+    async def get_signed_urls(self, file_paths: List[str], expires_in: int = 3600) -> Dict[str, Optional[str]]:
+        """
+        Sign many paths with a single storage call.
+        Returns {path: signed_url}; paths that could not be signed map to None.
+        """
+        if not file_paths:
+            return {}
+
+        signed: Dict[str, Optional[str]] = dict.fromkeys(file_paths)
+        try:
+            response = await self._request(
+                "sign",
+                "POST",
+                f"{self.url}/storage/v1/object/sign/{self.bucket_name}",
+                headers=self.headers,
+                json={"expiresIn": expires_in, "paths": list(signed)},
+            )
+            # Supabase returns [{"path": ..., "signedURL": ..., "error": ...}, ...]
+            for entry in response.json():
+                if entry.get("path") in signed and not entry.get("error"):
+                    signed[entry["path"]] = entry.get("signedURL")
+        except Exception:
+            logger.exception("Error getting signed URLs", extra={"path_count": len(signed)})
+        return signed
+
     async def delete_file(self, file_path: str) -> bool:
         """
         Delete a file from Supabase Storage.
         Use the storage_path stored in DB to delete.
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.delete(
-                    f"{self.url}/storage/v1/object/{self.bucket_name}/{file_path}",
-                    headers=self.headers
-                )
-                response.raise_for_status()
+            await self._request("delete", "DELETE", self._object_url(file_path), headers=self.headers)
             return True
-        except Exception as e:
-            print(f"Error deleting file: {str(e)}")
+        except Exception:
+            logger.exception("Error deleting file", extra={"storage_path": file_path})
             return False
-    
+
+    async def list_objects(self, prefix: str, limit: int = 1000, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        One page of the entries directly under `prefix`, sorted by name.
+        Folders come back with `id` set to None; files carry `metadata.size`.
+        Raises StorageError on failure.
+        """
+        response = await self._request(
+            "list",
+            "POST",
+            f"{self.url}/storage/v1/object/list/{self.bucket_name}",
+            headers=self.headers,
+            json={
+                "prefix": prefix,
+                "limit": limit,
+                "offset": offset,
+                "sortBy": {"column": "name", "order": "asc"},
+            },
+        )
+        return response.json()
+
+    async def delete_files(self, file_paths: List[str]) -> List[str]:
+        """
+        Delete many objects with a single storage call (Supabase accepts up
+        to 1000 paths per call). Returns the paths that were deleted; paths
+        that did not exist are not included. Raises StorageError on failure.
+        """
+        if not file_paths:
+            return []
+        response = await self._request(
+            "delete",
+            "DELETE",
+            f"{self.url}/storage/v1/object/{self.bucket_name}",
+            headers=self.headers,
+            json={"prefixes": list(file_paths)},
+        )
+        return [entry["name"] for entry in response.json()]
+
+    async def download_file(self, file_path: str) -> bytes:
+        """
+        Asynchronously download a file from Supabase Storage.
+        Raises StorageError on failure.
+        """
+        response = await self._request("download", "GET", self._object_url(file_path), hedge=True, headers=self.headers)
+        return response.content
+
+    async def upload_bytes(self, file_bytes: bytes, file_path: str, content_type: str = "application/octet-stream") -> None:
+        """
+        Asynchronously upload bytes to Supabase Storage.
+        Raises StorageError on failure.
+        """
+        await self._request(
+            "upload",
+            "POST",
+            self._object_url(file_path),
+            headers={
+                **self.headers,
+                "Content-Type": content_type,
+                # Outputs are content-addressed: rewriting one is harmless
+                "x-upsert": "true",
+            },
+            content=file_bytes,
+        )
+
+    async def open_download_stream(self, file_path: str, range_header: Optional[str] = None):
+        """
+        Start a streamed download, forwarding an HTTP Range header if given.
+        Returns (response, close); iterate `response.aiter_bytes()` and await
+        `close()` when done. Raises StorageError if storage is unreachable.
+        Not retried: the body is streamed straight to the client.
+        """
+        import httpx
+
+        breaker = get_storage_breaker()
+        if not breaker.allow():
+            raise StorageUnavailable("Storage download refused: circuit open")
+        connect, read = self._timeouts("download")
+        pooled = self._pooled_client()
+        client = pooled or httpx.AsyncClient()
+        headers = dict(self.headers)
+        if range_header:
+            headers["Range"] = range_header
+        request = client.build_request(
+            "GET", self._object_url(file_path), headers=headers, timeout=httpx.Timeout(read, connect=connect)
+        )
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            breaker.record_failure()
+            if client is not pooled:
+                await client.aclose()
+            raise StorageError(f"Failed to download {file_path}: {str(e)}") from e
+        if response.status_code in RETRYABLE_STATUS:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        async def close() -> None:
+            await response.aclose()
+            if client is not pooled:
+                await client.aclose()
+
+        return response, close
+
     def download_file_sync(self, file_path: str) -> bytes:
         """
         Synchronously download a file from Supabase Storage.
-        Returns the file content as bytes.
+        Returns the file content as bytes; raises StorageError on failure.
         """
-        try:
-            response = requests.get(
-                f"{self.url}/storage/v1/object/{self.bucket_name}/{file_path}",
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return response.content
-        except Exception as e:
-            print(f"Error downloading file: {str(e)}")
-            return b""
+        response = self._request_sync("download", "GET", self._object_url(file_path), hedge=True, headers=self.headers)
+        return response.content
     
-    def upload_bytes_sync(self, file_bytes: bytes, file_path: str, content_type: str = "application/octet-stream") -> bool:
+    def upload_bytes_sync(self, file_bytes: bytes, file_path: str, content_type: str = "application/octet-stream") -> None:
         """
         Synchronously upload bytes to Supabase Storage.
-        Returns True if upload is successful, False otherwise.
+        Raises StorageError on failure.
         """
-        try:
-            response = requests.post(
-                f"{self.url}/storage/v1/object/{self.bucket_name}/{file_path}",
-                headers={
-                    **self.headers,
-                    "Content-Type": content_type
-                },
-                data=file_bytes
-            )
-            response.raise_for_status()
-            return True
-        except Exception as e:
-            print(f"Error uploading bytes: {str(e)}")
-            return False
\ No newline at end of file
+        self._request_sync(
+            "upload",
+            "POST",
+            self._object_url(file_path),
+            headers={
+                **self.headers,
+                "Content-Type": content_type,
+                "x-upsert": "true",
+            },
+            data=file_bytes,
+        )
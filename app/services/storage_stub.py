@@ -0,0 +1,155 @@
+"""
+Local stand-in for Supabase Storage with fault injection, for development and
+tests of the storage client's timeouts, retries, circuit breaker and hedging.
+
+Objects are kept in memory. Every request can be delayed, failed or stalled:
+
+    STORAGE_STUB_LATENCY_MS=20 STORAGE_STUB_SLOW_RATE=0.05 STORAGE_STUB_SLOW_MS=2000 \\
+    STORAGE_STUB_ERROR_RATE=0.1 STORAGE_STUB_STALL_RATE=0.01 \\
+        uvicorn app.services.storage_stub:app --port 9100
+
+and point the API or workers at it with SUPABASE_URL=http://localhost:9100.
+Faults can also be changed at runtime with PUT /faults and inspected, along
+with request counts, with GET /faults.
+"""
+import asyncio
+import os
+import random
+from typing import Dict, List, Optional
+
+from fastapi import Body, FastAPI, HTTPException, Request, Response, status
+from pydantic import BaseModel
+
+app = FastAPI(title="Storage stub")
+
+objects: Dict[str, bytes] = {}
+content_types: Dict[str, str] = {}
+
+
+class Faults(BaseModel):
+    latency_ms: float = float(os.environ.get("STORAGE_STUB_LATENCY_MS", "0"))
+    # Share of requests that take slow_ms instead: the latency tail hedging targets
+    slow_rate: float = float(os.environ.get("STORAGE_STUB_SLOW_RATE", "0"))
+    slow_ms: float = float(os.environ.get("STORAGE_STUB_SLOW_MS", "2000"))
+    # Share of requests answered with 503
+    error_rate: float = float(os.environ.get("STORAGE_STUB_ERROR_RATE", "0"))
+    # Share of requests that never answer, like a stalled connection
+    stall_rate: float = float(os.environ.get("STORAGE_STUB_STALL_RATE", "0"))
+
+
+faults = Faults()
+counters = {"requests": 0, "errors": 0, "stalls": 0, "slow": 0}
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    if request.url.path == "/faults":
+        return await call_next(request)
+    counters["requests"] += 1
+    if random.random() < faults.stall_rate:
+        counters["stalls"] += 1
+        await asyncio.sleep(3600)
+    if random.random() < faults.slow_rate:
+        counters["slow"] += 1
+        await asyncio.sleep(faults.slow_ms / 1000)
+    elif faults.latency_ms:
+        await asyncio.sleep(faults.latency_ms / 1000)
+    if random.random() < faults.error_rate:
+        counters["errors"] += 1
+        return Response(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=b"Injected failure")
+    return await call_next(request)
+
+
+@app.get("/faults")
+async def get_faults():
+    return {"faults": faults.model_dump(), "counters": counters}
+
+
+@app.put("/faults")
+async def set_faults(new_faults: Faults):
+    global faults
+    faults = new_faults
+    for key in counters:
+        counters[key] = 0
+    return {"faults": faults.model_dump()}
+
+
+# Specific routes first: the generic object routes below would match them too
+
+@app.post("/storage/v1/object/sign/{bucket}/{path:path}")
+async def sign(bucket: str, path: str, payload: dict = Body(...)):
+    if f"{bucket}/{path}" not in objects:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Object not found")
+    return {"signedURL": f"/object/sign/{bucket}/{path}?token=stub&expires={payload.get('expiresIn')}"}
+
+
+@app.post("/storage/v1/object/sign/{bucket}")
+async def sign_many(bucket: str, payload: dict = Body(...)):
+    return [
+        {
+            "path": path,
+            "signedURL": f"/object/sign/{bucket}/{path}?token=stub" if f"{bucket}/{path}" in objects else None,
+            "error": None if f"{bucket}/{path}" in objects else "Object not found",
+        }
+        for path in payload.get("paths", [])
+    ]
+
+
+@app.post("/storage/v1/object/list/{bucket}")
+async def list_objects(bucket: str, payload: dict = Body(...)):
+    prefix = payload.get("prefix", "").strip("/")
+    base = f"{bucket}/{prefix}/" if prefix else f"{bucket}/"
+    entries: Dict[str, Optional[int]] = {}
+    for key, data in objects.items():
+        if key.startswith(base):
+            name, _, rest = key[len(base):].partition("/")
+            entries[name] = None if rest else len(data)
+    names = sorted(entries)
+    offset, limit = payload.get("offset", 0), payload.get("limit", 100)
+    page: List[dict] = []
+    for name in names[offset:offset + limit]:
+        size = entries[name]
+        if size is None:
+            page.append({"name": name, "id": None, "metadata": None})
+        else:
+            page.append({
+                "name": name,
+                "id": name,
+                "updated_at": "2000-01-01T00:00:00Z",
+                "metadata": {"size": size},
+            })
+    return page
+
+
+@app.delete("/storage/v1/object/{bucket}")
+async def delete_many(bucket: str, payload: dict = Body(...)):
+    deleted = []
+    for path in payload.get("prefixes", []):
+        if objects.pop(f"{bucket}/{path}", None) is not None:
+            deleted.append({"name": path})
+    return deleted
+
+
+@app.post("/storage/v1/object/{bucket}/{path:path}")
+async def upload(bucket: str, path: str, request: Request):
+    key = f"{bucket}/{path}"
+    if key in objects and request.headers.get("x-upsert") != "true":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="The resource already exists")
+    objects[key] = await request.body()
+    content_types[key] = request.headers.get("content-type", "application/octet-stream")
+    return {"Key": key}
+
+
+@app.get("/storage/v1/object/{bucket}/{path:path}")
+async def download(bucket: str, path: str):
+    key = f"{bucket}/{path}"
+    if key not in objects:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Object not found")
+    return Response(content=objects[key], media_type=content_types.get(key))
+
+
+@app.delete("/storage/v1/object/{bucket}/{path:path}")
+async def delete(bucket: str, path: str):
+    if objects.pop(f"{bucket}/{path}", None) is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Object not found")
+    return {"message": "Successfully deleted"}
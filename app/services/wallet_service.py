@@ -1,8 +1,9 @@
-from decimal import Decimal
-from typing import Dict, Tuple
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Optional, Tuple
 from fastapi import HTTPException, status
 import uuid
 
+from app.config import settings
 from app.models.imageJob import JobType
 from app.repositories.wallet_repository import WalletRepository
 
@@ -25,13 +26,22 @@ class WalletService:
     def __init__(self, wallet_repository: WalletRepository):
         self.wallet_repository = wallet_repository
     
-    def calculate_price(self, job_type: JobType, priority: str) -> Decimal:
-        """Calculate the price based on job type and priority"""
+    def calculate_price(self, job_type: JobType, priority: str, megapixels: Optional[float] = None) -> Decimal:
+        """
+        Calculate the price based on job type and priority, scaled by image
+        size (all frames) beyond `pricing_included_megapixels`
+        """
         base_price = self.JOB_TYPE_PRICES.get(job_type, Decimal('1.00'))
         multiplier = self.PRIORITY_MULTIPLIERS.get(priority.lower(), Decimal('1.0'))
-        return base_price * multiplier
+        price = base_price * multiplier
+        if megapixels is not None and megapixels > settings.pricing_included_megapixels:
+            size_factor = Decimal(str(megapixels)) / Decimal(str(settings.pricing_included_megapixels))
+            price = (price * size_factor).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return price
     
-    async def check_and_deduct_balance(self, user_id: str, job_type: JobType, priority: str, job_id: str = None) -> Tuple[bool, Decimal]:
+    async def check_and_deduct_balance(
+        self, user_id: str, job_type: JobType, priority: str, job_id: str = None, megapixels: Optional[float] = None
+    ) -> Tuple[bool, Decimal]:
         """
         Check if user has sufficient balance and deduct if they do
         
@@ -40,39 +50,32 @@ class WalletService:
             job_type: Type of image processing job
             priority: Job priority level
             job_id: Optional job ID for transaction reference
+            megapixels: Image size across all frames, from its header
             
         Returns:
             Tuple[bool, Decimal]: (Success, Price)
         """
-        # Get user's wallet
-        wallet = await self.wallet_repository.get_wallet_by_user_id(user_id)
-        
-        if not wallet:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Wallet not found for this user"
-            )
-        
         # Calculate price for this job
-        price = self.calculate_price(job_type, priority)
-        
-        # Check if enough balance
-        if wallet.balance < price:
-            return False, price
-        
-        # Prepare transaction reference and description
+        price = self.calculate_price(job_type, priority, megapixels)
+
+        # Prepare transaction reference
         reference = f"job-{job_id}" if job_id else f"job-{uuid.uuid4()}"
-        description = f"Payment for {job_type} job with {priority} priority"
-        
-        # Deduct from wallet and record transaction
-        updated_wallet, transaction = await self.wallet_repository.deduct_balance(
-            wallet_id=wallet.id,
+
+        # Atomically deduct from wallet and record transaction in one round trip
+        new_balance, transaction_id = await self.wallet_repository.deduct_balance_for_user(
+            user_id=user_id,
             amount=price,
             reference=reference,
-            description=description
         )
-        
-        if not transaction:
+
+        if transaction_id is None:
+            # Cold path: tell a missing wallet apart from insufficient funds
+            wallet = await self.wallet_repository.get_wallet_by_user_id(user_id)
+            if not wallet:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Wallet not found for this user"
+                )
             return False, price
-            
-        return True, price
\ No newline at end of file
+
+        return True, price
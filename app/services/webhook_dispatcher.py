@@ -0,0 +1,248 @@
+"""
+Webhook dispatcher: delivers queued `webhook_events` to subscriber endpoints.
+
+Due events are leased from the table and buffered per subscription. A buffer
+is sent as one signed POST once it holds `webhook_batch_size` events or its
+oldest event has waited `webhook_batch_window_ms`. Failed deliveries are
+rescheduled with exponential backoff and dead-lettered after
+`webhook_max_attempts`. Throughput and delivery lag are logged every
+`webhook_metrics_interval` seconds.
+
+    python -m app.services.webhook_dispatcher
+"""
+import asyncio
+import json
+import logging
+import signal
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from uuid import UUID
+
+import httpx
+
+from app.config import settings
+from app.core.logging import setup_logging
+from app.database import get_async_engine, get_async_sessionmaker
+from app.repositories.webhook_repository import WebhookRepository
+from app.services.webhooks import UnsafeWebhookTarget, resolve_webhook_address, sign_payload
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingBatch:
+    url: str
+    secret: str
+    event_ids: List[int] = field(default_factory=list)
+    payloads: List[dict] = field(default_factory=list)
+    created_at: List[datetime] = field(default_factory=list)
+    first_seen: float = field(default_factory=time.monotonic)
+
+
+class DeliveryMetrics:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.started = time.monotonic()
+        self.delivered_events = 0
+        self.delivered_batches = 0
+        self.failed_batches = 0
+        self.dead_lettered = 0
+        self.lag_ms: List[float] = []
+
+    def report(self, buffered: int) -> None:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        lags = sorted(self.lag_ms)
+        logger.info(
+            "Webhook delivery metrics",
+            extra={
+                "delivered_events": self.delivered_events,
+                "delivered_batches": self.delivered_batches,
+                "failed_batches": self.failed_batches,
+                "dead_lettered": self.dead_lettered,
+                "events_per_second": round(self.delivered_events / elapsed, 2),
+                "lag_ms_p50": round(lags[len(lags) // 2], 1) if lags else None,
+                "lag_ms_p95": round(lags[int(len(lags) * 0.95)], 1) if lags else None,
+                "lag_ms_max": round(lags[-1], 1) if lags else None,
+                "buffered_events": buffered,
+            },
+        )
+        self.reset()
+
+
+class WebhookDispatcher:
+    def __init__(self):
+        self.batch_size = settings.webhook_batch_size
+        self.batch_window = settings.webhook_batch_window_ms / 1000
+        self.buffers: Dict[UUID, PendingBatch] = {}
+        self.in_flight: Set[asyncio.Task] = set()
+        self.semaphore = asyncio.Semaphore(settings.webhook_max_concurrency)
+        self.metrics = DeliveryMetrics()
+        self.sessionmaker = get_async_sessionmaker()
+
+    def _buffered(self) -> int:
+        return sum(len(b.event_ids) for b in self.buffers.values())
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        limits = httpx.Limits(
+            max_connections=settings.webhook_max_concurrency,
+            max_keepalive_connections=settings.webhook_max_concurrency,
+        )
+        timeout = httpx.Timeout(settings.webhook_timeout_seconds)
+        async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+            self.client = client
+            last_report = time.monotonic()
+            while not stop_event.is_set():
+                claimed = 0
+                try:
+                    # Leave buffered events to drain before leasing more
+                    if self._buffered() < settings.webhook_claim_size:
+                        claimed = await self._claim()
+                except Exception:
+                    logger.exception("Webhook claim failed")
+                self._flush_ready()
+
+                if time.monotonic() - last_report >= settings.webhook_metrics_interval:
+                    self.metrics.report(self._buffered())
+                    last_report = time.monotonic()
+                if claimed < settings.webhook_claim_size:
+                    try:
+                        await asyncio.wait_for(stop_event.wait(), settings.webhook_poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+
+            # Unsent buffers keep their lease and are picked up again once it lapses
+            if self.in_flight:
+                await asyncio.gather(*self.in_flight, return_exceptions=True)
+
+    async def _claim(self) -> int:
+        async with self.sessionmaker() as session:
+            repo = WebhookRepository(session)
+            events = await repo.claim_due_events(settings.webhook_claim_size, settings.webhook_lease_seconds)
+            if not events:
+                return 0
+            unknown = {e.subscription_id for e in events} - set(self.buffers)
+            subscriptions = await repo.get_subscriptions(list(unknown)) if unknown else {}
+
+        for event in events:
+            batch = self.buffers.get(event.subscription_id)
+            if batch is None:
+                subscription = subscriptions.get(event.subscription_id)
+                if subscription is None:
+                    # Deleted meanwhile; its events go with it (ON DELETE CASCADE)
+                    continue
+                batch = self.buffers[event.subscription_id] = PendingBatch(subscription.url, subscription.secret)
+            batch.event_ids.append(event.id)
+            batch.payloads.append(event.payload)
+            batch.created_at.append(event.created_at)
+        return len(events)
+
+    def _flush_ready(self) -> None:
+        now = time.monotonic()
+        for subscription_id, batch in list(self.buffers.items()):
+            if len(batch.event_ids) < self.batch_size and now - batch.first_seen < self.batch_window:
+                continue
+            del self.buffers[subscription_id]
+            for start in range(0, len(batch.event_ids), self.batch_size):
+                chunk = PendingBatch(
+                    batch.url,
+                    batch.secret,
+                    batch.event_ids[start:start + self.batch_size],
+                    batch.payloads[start:start + self.batch_size],
+                    batch.created_at[start:start + self.batch_size],
+                )
+                task = asyncio.create_task(self._deliver(chunk))
+                self.in_flight.add(task)
+                task.add_done_callback(self.in_flight.discard)
+
+    async def _send(self, batch: PendingBatch) -> Optional[str]:
+        """
+        POST the batch; returns None on success, else the error. The host is
+        resolved and checked again here (it may have been re-pointed at an
+        internal address since the subscription was created) and the request
+        goes to the checked address, keeping the hostname for the Host
+        header, SNI and certificate verification.
+        """
+        try:
+            address = await resolve_webhook_address(batch.url)
+        except UnsafeWebhookTarget as exc:
+            return f"Refused: {exc}"
+        url = httpx.URL(batch.url)
+        body = json.dumps({"events": batch.payloads}, separators=(",", ":")).encode("utf-8")
+        timestamp = str(int(time.time()))
+        try:
+            response = await self.client.post(
+                url.copy_with(host=address),
+                content=body,
+                headers={
+                    "Host": url.netloc.decode("ascii"),
+                    "Content-Type": "application/json",
+                    "X-Webhook-Timestamp": timestamp,
+                    "X-Webhook-Signature": sign_payload(batch.secret, timestamp, body),
+                },
+                extensions={"sni_hostname": url.host},
+            )
+        except httpx.HTTPError as exc:
+            return f"{type(exc).__name__}: {exc}"
+        if not response.is_success:
+            return f"HTTP {response.status_code}"
+        return None
+
+    async def _deliver(self, batch: PendingBatch) -> None:
+        async with self.semaphore:
+            error = await self._send(batch)
+
+            try:
+                async with self.sessionmaker() as session:
+                    repo = WebhookRepository(session)
+                    if error is None:
+                        await repo.delete_events(batch.event_ids)
+                    else:
+                        dead = await repo.record_failure(
+                            batch.event_ids,
+                            error,
+                            settings.webhook_max_attempts,
+                            settings.webhook_backoff_base_seconds,
+                            settings.webhook_backoff_max_seconds,
+                        )
+                        self.metrics.dead_lettered += dead
+            except Exception:
+                # The lease lapses and the events are retried
+                logger.exception("Webhook bookkeeping failed", extra={"url": batch.url})
+                return
+
+        if error is None:
+            now = datetime.now(timezone.utc)
+            self.metrics.delivered_batches += 1
+            self.metrics.delivered_events += len(batch.event_ids)
+            self.metrics.lag_ms.extend((now - created).total_seconds() * 1000 for created in batch.created_at)
+        else:
+            self.metrics.failed_batches += 1
+            logger.warning(
+                "Webhook delivery failed",
+                extra={"url": batch.url, "events": len(batch.event_ids), "error": error},
+            )
+
+
+async def _main() -> None:
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    logger.info("Webhook dispatcher started")
+    try:
+        await WebhookDispatcher().run(stop_event)
+    finally:
+        await get_async_engine().dispose()
+
+
+def main() -> None:
+    setup_logging(settings.log_level)
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
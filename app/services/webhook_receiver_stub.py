@@ -0,0 +1,57 @@
+"""
+Local webhook receiver for development and tests.
+
+Verifies the signature of every delivery, keeps the received events in
+memory and can fail a share of requests to exercise retries:
+
+    WEBHOOK_STUB_SECRET=<subscription secret> WEBHOOK_STUB_FAILURE_RATE=0.2 \\
+        uvicorn app.services.webhook_receiver_stub:app --port 9000
+
+Subscribe http://localhost:9000/webhook and inspect GET /received.
+"""
+import json
+import os
+import random
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, HTTPException, Request, status
+
+from app.services.webhooks import verify_signature
+
+app = FastAPI(title="Webhook receiver stub")
+
+received: List[Dict[str, Any]] = []
+seen_ids: set = set()
+
+
+@app.post("/webhook", status_code=status.HTTP_204_NO_CONTENT)
+async def receive(request: Request):
+    body = await request.body()
+    secret = os.environ.get("WEBHOOK_STUB_SECRET")
+    if secret and not verify_signature(
+        secret,
+        request.headers.get("X-Webhook-Timestamp", ""),
+        body,
+        request.headers.get("X-Webhook-Signature", ""),
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid signature")
+
+    if random.random() < float(os.environ.get("WEBHOOK_STUB_FAILURE_RATE", "0")):
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Injected failure")
+
+    for event in json.loads(body)["events"]:
+        # Deliveries are at least once; keep the first copy of each event
+        if event["id"] not in seen_ids:
+            seen_ids.add(event["id"])
+            received.append(event)
+
+
+@app.get("/received")
+async def list_received():
+    return {"count": len(received), "events": received}
+
+
+@app.delete("/received", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_received():
+    received.clear()
+    seen_ids.clear()
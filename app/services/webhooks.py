@@ -0,0 +1,114 @@
+"""
+Webhook event format and signing, shared by the workers that emit events,
+the webhook dispatcher and the local receiver stub.
+
+Each delivery is a POST of `{"events": [...]}` with headers
+
+    X-Webhook-Timestamp: <unix seconds>
+    X-Webhook-Signature: sha256=<hex HMAC-SHA256 of "<timestamp>.<body>">
+
+keyed with the subscription's secret. Receivers should reject stale
+timestamps and deduplicate on the event `id`, as delivery is at least once.
+
+Subscriber URLs must be https and resolve to public addresses only: they are
+checked when the subscription is created and resolved again before every
+delivery, which then connects to the address that was checked.
+"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import socket
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from app.config import settings
+
+JOB_COMPLETED = "job.completed"
+JOB_FAILED = "job.failed"
+
+
+def job_event(
+    event_type: str,
+    image_id: str,
+    job_id: str,
+    job_type: str,
+    storage_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "type": event_type,
+        "occurred_at": datetime.now(timezone.utc).isoformat(),
+        "data": {
+            "image_id": image_id,
+            "job_id": job_id,
+            "job_type": job_type,
+            "storage_path": storage_path,
+        },
+    }
+
+
+def sign_payload(secret: str, timestamp: str, body: bytes) -> str:
+    digest = hmac.new(
+        secret.encode("utf-8"), timestamp.encode("utf-8") + b"." + body, hashlib.sha256
+    ).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(secret: str, timestamp: str, body: bytes, signature: str) -> bool:
+    return hmac.compare_digest(sign_payload(secret, timestamp, body), signature)
+
+
+class UnsafeWebhookTarget(ValueError):
+    """The URL is not https, or its host is (or resolves to) a non-public address."""
+
+
+def is_public_address(address: str) -> bool:
+    """False for loopback, private, link-local, reserved, multicast and other non-global addresses."""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_webhook_url(url: str) -> None:
+    """
+    Checks that need no DNS: https scheme, a host, and, for IP literals, a
+    public address. Raises UnsafeWebhookTarget.
+    """
+    parts = urlsplit(url)
+    if settings.webhook_allow_private_targets:
+        return
+    if parts.scheme != "https":
+        raise UnsafeWebhookTarget("Webhook URL must use https")
+    if not parts.hostname:
+        raise UnsafeWebhookTarget("Webhook URL has no host")
+    try:
+        ipaddress.ip_address(parts.hostname)
+    except ValueError:
+        return
+    if not is_public_address(parts.hostname):
+        raise UnsafeWebhookTarget(f"{parts.hostname} is not a public address")
+
+
+async def resolve_webhook_address(url: str) -> str:
+    """
+    Resolve the URL's host and return an address to connect to. Raises
+    UnsafeWebhookTarget if the URL fails check_webhook_url, the host does not
+    resolve, or any address it resolves to is not public.
+    """
+    check_webhook_url(url)
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as exc:
+        raise UnsafeWebhookTarget(f"{parts.hostname} does not resolve: {exc}") from exc
+    addresses = [info[4][0] for info in infos]
+    if not settings.webhook_allow_private_targets:
+        for address in addresses:
+            if not is_public_address(address):
+                raise UnsafeWebhookTarget(f"{parts.hostname} resolves to non-public address {address}")
+    return addresses[0]
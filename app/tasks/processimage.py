@@ -1,73 +1,129 @@
-import os
-from app.celery import celeryapp
+import logging
+from app.celery import LARGE_IMAGE_QUEUE, celeryapp
+from app.config import settings
+from app.core.content_address import content_type_for
+from app.core.job_timing import StageTimer, attempt_started
 from app.models.imageJob import ImageStatus
-from app.services.image_processor.processors import process_greyscale, process_thumbnail, process_resize
+from app.services.image_processor.processors import estimate_decoded_bytes, run_processor
+from app.services.memory_budget import MemoryBudgetExhausted, MemoryBudgetExceeded, get_memory_budget
 from app.services.storage_service import StorageService
+from app.services.webhooks import JOB_COMPLETED, JOB_FAILED, job_event
 from app.database import SessionLocal
 from uuid import UUID
 
 # Import our new synchronous repository
 from app.repositories.sync_image_job_repository import SyncImageJobRepository
 
-DEFAULT_THUMBNAIL_SIZE = (128, 128)
-DEFAULT_RESIZE_WIDTH = 800
-DEFAULT_RESIZE_HEIGHT = 600
+logger = logging.getLogger(__name__)
 
-@celeryapp.task(bind=True, name="process_image", max_retries=3)
+
+def _requeue(job_id_uuid, queue, countdown, **kwargs):
+    """
+    Put the job back on a queue without spending one of its retries. It goes
+    through the outbox, so it keeps its tenant's fair-share turn and is not
+    lost if the broker is unreachable.
+    """
+    db = SessionLocal()
+    try:
+        SyncImageJobRepository(db).requeue_job(job_id_uuid, "process_image", kwargs, queue, countdown)
+    finally:
+        db.close()
+
+# The return value is never read, so no result is stored for it
+@celeryapp.task(bind=True, name="process_image", max_retries=3, ignore_result=True)
 def process_image(self, image_id, job_id, storage_path, job_type):
+    timer = StageTimer()
     try:
         job_id_uuid = UUID(job_id)
         
         db = SessionLocal()
         try:
             job_repo = SyncImageJobRepository(db)
-            job_repo.update_job_status(job_id_uuid, ImageStatus.PROCESSING)
+            # The outbox delivers at least once; skip duplicates of finished jobs
+            job = job_repo.get_job_by_id(job_id_uuid)
+            if job is not None and job.status == ImageStatus.COMPLETED:
+                return {"status": "skipped", "image_id": image_id, "job_id": job_id}
+            job_repo.update_job_metadata(
+                job_id_uuid, {"status": ImageStatus.PROCESSING, **attempt_started(self.request.hostname)}
+            )
         finally:
             db.close()
         
         storage_service = StorageService()
-        image_data = storage_service.download_file_sync(storage_path)
+        with timer.stage("download"):
+            image_data = storage_service.download_file_sync(storage_path)
+        timer.values["input_bytes"] = len(image_data)
 
-        if job_type == "grayscale":
-            processed_path, output_data = process_greyscale(storage_path, image_data)
-        elif job_type == "thumbnail":
-            processed_path, output_data = process_thumbnail(
-                storage_path, image_data, DEFAULT_THUMBNAIL_SIZE
-            )
-        elif job_type == "resize":
-            processed_path, output_data = process_resize(
-                storage_path, image_data, DEFAULT_RESIZE_WIDTH, DEFAULT_RESIZE_HEIGHT
-            )
-        else:
-            raise ValueError(f"Unsupported job_type: {job_type}")
+        task_kwargs = {
+            "image_id": image_id, "job_id": job_id,
+            "storage_path": storage_path, "job_type": job_type,
+        }
+        footprint = estimate_decoded_bytes(image_data, job_type)
+        current_queue = (self.request.delivery_info or {}).get("routing_key")
+        if (
+            footprint > settings.large_image_threshold_mb * 1024 * 1024
+            and current_queue != LARGE_IMAGE_QUEUE
+        ):
+            _requeue(job_id_uuid, LARGE_IMAGE_QUEUE, None, **task_kwargs)
+            logger.info("Routed to large-image queue", extra={"job_id": job_id, "footprint_bytes": footprint})
+            return {"status": "rerouted", "image_id": image_id, "job_id": job_id}
+
+        try:
+            with get_memory_budget().reserve(footprint, settings.worker_memory_wait_seconds):
+                with timer.stage("process"):
+                    final_storage_path, output_data = run_processor(job_type, storage_path, image_data)
+        except MemoryBudgetExhausted:
+            _requeue(job_id_uuid, current_queue, settings.worker_memory_requeue_seconds, **task_kwargs)
+            logger.info("Memory budget exhausted, requeued", extra={"job_id": job_id, "footprint_bytes": footprint})
+            return {"status": "requeued", "image_id": image_id, "job_id": job_id}
+        del image_data
 
-        final_storage_path = f"processed/{os.path.basename(processed_path)}"
-        storage_service.upload_bytes_sync(output_data, final_storage_path)
+        timer.values["output_bytes"] = len(output_data)
+        with timer.stage("upload"):
+            storage_service.upload_bytes_sync(output_data, final_storage_path, content_type_for(final_storage_path))
         
         # Update the job metadata with completion info using synchronous repository
         db = SessionLocal()
         try:
             job_repo = SyncImageJobRepository(db)
-            job_repo.update_job_metadata(job_id_uuid, {
-                "status": ImageStatus.COMPLETED,
-                "storage_path": final_storage_path 
-            })
+            job_repo.finish_job(
+                job_id_uuid,
+                {"status": ImageStatus.COMPLETED, "storage_path": final_storage_path, **timer.finished()},
+                JOB_COMPLETED,
+                job_event(JOB_COMPLETED, image_id, job_id, job_type, final_storage_path),
+            )
         finally:
             db.close()
 
         return {"status": "success", "image_id": image_id, "job_id": job_id}
 
     except Exception as exc:
+        # Larger than any worker's budget; retrying cannot help
+        final_attempt = isinstance(exc, MemoryBudgetExceeded) or self.request.retries >= self.max_retries
         # Handle failure case using synchronous repository
         try:
             db = SessionLocal()
             try:
                 job_repo = SyncImageJobRepository(db)
-                job_repo.update_job_status(job_id_uuid, ImageStatus.FAILED)
+                if final_attempt:
+                    job_repo.finish_job(
+                        job_id_uuid,
+                        {"status": ImageStatus.FAILED, **timer.finished()},
+                        JOB_FAILED,
+                        job_event(JOB_FAILED, image_id, job_id, job_type),
+                    )
+                else:
+                    job_repo.update_job_metadata(job_id_uuid, {"status": ImageStatus.FAILED, **timer.values})
             finally:
                 db.close()
-        except Exception as inner_exc:
-            print(f"[ERROR] Failed to update job status: {inner_exc}")
+        except Exception:
+            logger.exception("Failed to update job status", extra={"job_id": job_id})
 
-        print(f"[ERROR] Processing failed for image {image_id}, job {job_id}: {exc}")
+        logger.error(
+            "Processing failed",
+            exc_info=exc,
+            extra={"image_id": image_id, "job_id": job_id, "job_type": job_type},
+        )
+        if isinstance(exc, MemoryBudgetExceeded):
+            return {"status": "failed", "image_id": image_id, "job_id": job_id}
         self.retry(exc=exc, countdown=120)
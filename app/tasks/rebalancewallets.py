@@ -0,0 +1,27 @@
+import logging
+from app.celery import celeryapp
+from app.database import SessionLocal
+from app.repositories.sync_wallet_repository import SyncWalletRepository
+
+logger = logging.getLogger(__name__)
+
+
+@celeryapp.task(name="rebalance_wallet_shards", ignore_result=True)
+def rebalance_wallet_shards():
+    """
+    Periodic task: even out the shards of every sharded wallet.
+    Each wallet is rebalanced in its own short transaction.
+    """
+    db = SessionLocal()
+    try:
+        wallet_repo = SyncWalletRepository(db)
+        wallet_ids = wallet_repo.list_sharded_wallet_ids()
+        db.rollback()
+        for wallet_id in wallet_ids:
+            try:
+                wallet_repo.rebalance_shards(wallet_id)
+            except Exception:
+                db.rollback()
+                logger.exception("Wallet shard rebalance failed", extra={"wallet_id": str(wallet_id)})
+    finally:
+        db.close()
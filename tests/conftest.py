@@ -0,0 +1,84 @@
+"""
+Shared test setup.
+
+Settings are read from the environment, so harmless defaults are filled in
+before any app module is imported. Tests that need PostgreSQL take the
+`database` fixture and are skipped unless TEST_DATABASE_URL points at a
+disposable database (postgresql+asyncpg://...); it is migrated to head.
+Tests marked `benchmark` only run with --benchmark and print their numbers.
+"""
+import asyncio
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+for _name, _value in {
+    "SUPABASE_URL": "http://storage.test",
+    "SUPABASE_KEY": "test-key",
+    "SUPABASE_BUCKET": "images",
+    "SUPABASE_AUTH_JWKS_URL": "http://auth.test/jwks",
+    "SUPABASE_PROJECT_ID": "test",
+    "RAZORPAY_KEY_ID": "rzp_test",
+    "RAZORPAY_KEY_SECRET": "test-secret",
+    "DATABASE_URL": "postgresql+asyncpg://localhost/unused",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+if TEST_DATABASE_URL:
+    # Never let a test reach the database configured for development
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+    os.environ.pop("DATABASE_REPLICA_URL", None)
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", help="run tests marked benchmark")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: throughput/cost measurement, run with --benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark, run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def database() -> str:
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    command.upgrade(config, "head")
+    return TEST_DATABASE_URL
+
+
+@pytest.fixture
+def run():
+    """
+    Run a coroutine on a fresh event loop. Pooled asyncpg connections are
+    bound to the loop that opened them, so the pool is disposed afterwards.
+    """
+    from app.database import get_async_engine
+
+    def _run(coro):
+        async def wrapper():
+            try:
+                return await coro
+            finally:
+                if get_async_engine.cache_info().currsize:
+                    await get_async_engine().dispose()
+
+        return asyncio.run(wrapper())
+
+    return _run
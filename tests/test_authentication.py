@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import JWTError, jwk, jwt
+from starlette.requests import Request
+
+from app.middleware import authentication
+from app.middleware.authentication import ALLOWED_ALGORITHMS, SupabaseAuth
+
+KEY = {"kid": "key-1", "kty": "EC", "alg": "ES256"}
+
+
+def make_auth(responses):
+    """SupabaseAuth whose JWKS fetches return (or raise) `responses` in order."""
+    auth = SupabaseAuth()
+    auth.fetches = 0
+
+    async def fetch():
+        auth.fetches += 1
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    auth._fetch_jwks = fetch
+    return auth
+
+
+def test_failed_refresh_keeps_serving_cached_keys(run):
+    auth = make_auth([{"keys": [KEY]}, httpx.ConnectError("down")])
+
+    async def scenario():
+        assert await auth.get_signing_key("key-1") == KEY
+        # Past the TTL: the refresh runs in the background and fails
+        auth._jwks_fetched_at = time.monotonic() - auth.jwks_cache_ttl - 1
+        assert await auth.get_signing_key("key-1") == KEY
+        await auth._background_refresh
+        assert auth.fetches == 2
+        # Failure is not retried on every request
+        assert await auth.get_signing_key("key-1") == KEY
+        await asyncio.sleep(0)
+        assert auth.fetches == 2
+
+    run(scenario())
+
+
+def test_refresh_ahead_of_ttl_does_not_block(run):
+    rotated = {"kid": "key-2", "kty": "EC", "alg": "ES256"}
+    auth = make_auth([{"keys": [KEY]}, {"keys": [KEY, rotated]}])
+
+    async def scenario():
+        await auth.get_signing_key("key-1")
+        auth._jwks_fetched_at = time.monotonic() - auth.jwks_cache_ttl * 0.9
+        assert await auth.get_signing_key("key-1") == KEY
+        await auth._background_refresh
+        assert "key-2" in auth._keys_by_kid
+
+    run(scenario())
+
+
+def test_first_fetch_failure_raises(run):
+    auth = make_auth([httpx.ConnectError("down")])
+    with pytest.raises(httpx.HTTPError):
+        run(auth.get_signing_key("key-1"))
+
+
+def key_pair(alg: str, kid: str):
+    """(private PEM, public JWK) for a fresh RS256 or ES256 key."""
+    if alg == "RS256":
+        private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        private = ec.generate_private_key(ec.SECP256R1())
+    pem = private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public = jwk.construct(public_pem, alg).to_dict()
+    return pem, {**public, "kid": kid, "alg": alg}
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {alg: key_pair(alg, f"{alg}-key") for alg in ALLOWED_ALGORITHMS}
+
+
+def sign(keys, alg: str = "ES256", **claims) -> str:
+    pem, public = keys[alg]
+    now = int(time.time())
+    payload = {"sub": "user-1", "aud": "authenticated", "iat": now, "exp": now + 300, **claims}
+    return jwt.encode(payload, pem, algorithm=alg, headers={"kid": public["kid"]})
+
+
+@pytest.fixture
+def auth(keys, monkeypatch):
+    auth = make_auth([{"keys": [public for _, public in keys.values()]}])
+    auth.audience = "authenticated"
+    auth.decodes = 0
+    decode = authentication.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        auth.decodes += 1
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(authentication.jwt, "decode", counting_decode)
+    return auth
+
+
+@pytest.mark.parametrize("alg", ALLOWED_ALGORITHMS)
+def test_valid_token_is_accepted(auth, keys, run, alg):
+    claims = run(auth.verify_token(sign(keys, alg)))
+    assert claims["id"] == claims["sub"] == "user-1"
+
+
+@pytest.mark.parametrize("token", [
+    pytest.param(lambda keys: sign(keys, exp=int(time.time()) - 60), id="expired"),
+    pytest.param(lambda keys: sign(keys, aud="someone-else"), id="wrong-audience"),
+    pytest.param(lambda keys: sign(keys)[:-4] + "AAAA", id="bad-signature"),
+    # Signed with another key under a trusted kid
+    pytest.param(
+        lambda keys: jwt.encode(
+            {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 300},
+            key_pair("ES256", "other")[0], algorithm="ES256", headers={"kid": "ES256-key"},
+        ),
+        id="foreign-key",
+    ),
+    # HMAC under a trusted kid: only the asymmetric algorithms are accepted
+    pytest.param(
+        lambda keys: jwt.encode(
+            {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 300},
+            "secret", algorithm="HS256", headers={"kid": "ES256-key"},
+        ),
+        id="hs256",
+    ),
+])
+def test_invalid_token_is_rejected(auth, keys, run, token):
+    with pytest.raises(JWTError):
+        run(auth.verify_token(token(keys)))
+
+
+def test_repeated_token_skips_verification(auth, keys, run):
+    token = sign(keys)
+
+    async def scenario():
+        first = await auth.verify_token(token)
+        assert await auth.verify_token(token) == first
+
+    run(scenario())
+    assert auth.decodes == 1
+
+
+def test_user_is_verified_once_per_request(auth, keys, run, monkeypatch):
+    verified = []
+    verify = auth.verify_token
+
+    async def counting_verify(token):
+        verified.append(token)
+        return await verify(token)
+
+    monkeypatch.setattr(auth, "verify_token", counting_verify)
+    request = Request({"type": "http", "headers": [(b"authorization", f"Bearer {sign(keys)}".encode())]})
+
+    async def scenario():
+        first = await auth.get_current_user(request)
+        assert await auth.get_current_user(request) is first
+
+    run(scenario())
+    assert len(verified) == 1
@@ -0,0 +1,128 @@
+import uuid
+from decimal import Decimal
+
+import fakeredis.aioredis
+import pytest
+from sqlalchemy import event
+
+from app.config import settings
+from app.core import balance_cache as balance_cache_module
+from app.core.balance_cache import BalanceCache, balance_cache
+from app.database import get_async_engine, get_async_sessionmaker
+from app.repositories.wallet_repository import WalletRepository
+from tests.test_wallet_debits import create_funded_wallet
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(balance_cache_module, "get_async_redis", lambda: client)
+    monkeypatch.setattr(balance_cache, "_registered", None)
+    monkeypatch.setattr(settings, "balance_cache_enabled", True)
+    return client
+
+
+def test_reader_fill_never_replaces_a_writers_balance(redis, run):
+    cache = BalanceCache()
+    user_id = uuid.uuid4()
+
+    async def scenario():
+        async def stale_loader():
+            # The reader loaded version 5 before the write committed, and
+            # fills after the writer stored version 6
+            await cache.complete_write(user_id, 6, Decimal("7.00"))
+            return Decimal("10.00"), 5
+
+        first = await cache.get(user_id, stale_loader)
+        second = await cache.get(user_id, stale_loader)
+        return first, second
+
+    assert run(scenario()) == (Decimal("10.00"), Decimal("7.00"))
+
+
+def test_late_writer_never_replaces_a_newer_balance(redis, run):
+    cache = BalanceCache()
+    user_id = uuid.uuid4()
+
+    async def scenario():
+        await cache.complete_write(user_id, 7, Decimal("5.00"))
+        await cache.complete_write(user_id, 6, Decimal("7.00"))
+        return await cache.get(user_id, None)
+
+    assert run(scenario()) == Decimal("5.00")
+
+
+def test_invalidation_keeps_older_readers_and_writers_out(redis, run):
+    cache = BalanceCache()
+    user_id = uuid.uuid4()
+
+    async def scenario():
+        async def invalidated_while_loading():
+            await cache.invalidate(user_id, 7)
+            return Decimal("10.00"), 6
+
+        first = await cache.get(user_id, invalidated_while_loading)
+        # A writer that committed before the invalidating one stores nothing
+        await cache.complete_write(user_id, 6, Decimal("9.00"))
+
+        async def loader():
+            return Decimal("4.00"), 7
+
+        second = await cache.get(user_id, loader)
+        third = await cache.get(user_id, None)
+        return first, second, third
+
+    assert run(scenario()) == (Decimal("10.00"), Decimal("4.00"), Decimal("4.00"))
+
+
+def test_cache_is_written_after_the_commit(database, redis, run, monkeypatch):
+    events = []
+    complete_write = balance_cache.complete_write
+
+    async def record_write(*args):
+        events.append("cache")
+        await complete_write(*args)
+
+    monkeypatch.setattr(balance_cache, "complete_write", record_write)
+
+    async def scenario():
+        wallet_id = await create_funded_wallet(0)
+        engine = get_async_engine().sync_engine
+        record = lambda *args: events.append("commit")
+        event.listen(engine, "commit", record)
+        try:
+            async with get_async_sessionmaker()() as session:
+                await WalletRepository(session).deduct_balance(wallet_id, Decimal("3.00"), "job-1")
+        finally:
+            event.remove(engine, "commit", record)
+
+    run(scenario())
+    # No Redis round trip while the wallet row is still locked
+    assert events == ["commit", "cache"]
+
+
+def test_debit_caches_the_returned_balance_without_reloading(database, redis, run):
+    statements = []
+
+    async def scenario():
+        wallet_id = await create_funded_wallet(0)
+        engine = get_async_engine().sync_engine
+        record = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            async with get_async_sessionmaker()() as session:
+                repo = WalletRepository(session)
+                balance, _ = await repo.deduct_balance(wallet_id, Decimal("3.00"), "job-1")
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        async with get_async_sessionmaker()() as session:
+            wallet = await WalletRepository(session).get_wallet_by_id(wallet_id)
+
+        async def uncached():
+            raise AssertionError("balance was not cached")
+
+        return balance, await balance_cache.get(wallet.user_id, uncached)
+
+    balance, cached = run(scenario())
+    assert balance == cached == Decimal("97.00")
+    assert len([sql for sql in statements if sql.strip().upper() not in ("BEGIN", "COMMIT", "ROLLBACK")]) == 1
@@ -0,0 +1,70 @@
+import contextlib
+import time
+
+import fakeredis
+import pytest
+
+from app.services import fair_share, outbox_dispatcher
+from app.services.fair_share import FairShareQueue
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(fair_share, "get_sync_redis", lambda: client)
+    return client
+
+
+def envelope(tenant: str, n: int) -> dict:
+    return {"task_name": "process_image", "kwargs": {"n": n}, "queue": "images", "tenant_id": tenant}
+
+
+def test_tenants_are_served_round_robin(redis):
+    queue = FairShareQueue("images")
+    for n in range(3):
+        queue.push("a", envelope("a", n))
+    queue.push("b", envelope("b", 0))
+
+    order = []
+    while (task := queue.pop()) is not None:
+        order.append((task["tenant_id"], task["kwargs"]["n"]))
+        queue.ack(task)
+    assert order == [("a", 0), ("b", 0), ("a", 1), ("a", 2)]
+    assert redis.zcard(queue.lease_key) == 0
+
+
+def test_unacked_task_is_recovered_after_its_lease(redis):
+    queue = FairShareQueue("images", lease_seconds=0.05)
+    queue.push("a", envelope("a", 0))
+    queue.push("a", envelope("a", 1))
+
+    # A dispatcher pops and dies before publishing
+    assert queue.pop()["kwargs"]["n"] == 0
+    assert queue.recover_expired() == 0
+    time.sleep(0.1)
+    assert queue.recover_expired() == 1
+    assert queue.recover_expired() == 0
+    assert [queue.pop()["kwargs"]["n"] for _ in range(2)] == [0, 1]
+
+
+def test_failed_publish_restores_the_task(redis, monkeypatch):
+    queue = FairShareQueue("images")
+    monkeypatch.setattr(outbox_dispatcher, "get_fair_share_queue", lambda name: queue)
+    monkeypatch.setattr(outbox_dispatcher, "_broker_queue_depth", lambda name: 0)
+    monkeypatch.setattr(outbox_dispatcher.celeryapp, "producer_or_acquire", contextlib.nullcontext)
+    queue.push("a", envelope("a", 0))
+    queue.push("a", envelope("a", 1))
+
+    sent = []
+
+    def send_task(name, kwargs, queue, producer):
+        if len(sent) == 1:
+            raise ConnectionError("broker down")
+        sent.append(kwargs["n"])
+
+    monkeypatch.setattr(outbox_dispatcher.celeryapp, "send_task", send_task)
+    with pytest.raises(ConnectionError):
+        outbox_dispatcher._feed_queue("images", max_depth=10)
+    assert sent == [0]
+    assert redis.zcard(queue.lease_key) == 0
+    assert queue.pop()["kwargs"]["n"] == 1
@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+
+import pytest
+
+from app.services.image_processor import backends
+from app.services.image_processor.backends import (
+    CALIBRATION_SIZES,
+    OPERATIONS,
+    PIXEL_TOLERANCE,
+    PillowBackend,
+    _calibration_image,
+    _run,
+    mean_difference,
+)
+
+
+@pytest.mark.parametrize("size_class", ["small", "medium"])
+@pytest.mark.parametrize("operation", OPERATIONS)
+def test_opencv_output_within_tolerance_of_pillow(operation, size_class):
+    pytest.importorskip("cv2")
+    img = _calibration_image(CALIBRATION_SIZES[size_class])
+    reference = _run(PillowBackend(), operation, img)
+    result = _run(backends.OpenCVBackend(), operation, img)
+    assert mean_difference(reference, result) <= PIXEL_TOLERANCE[operation]
+
+
+@pytest.fixture
+def fake_calibration(monkeypatch):
+    calls = []
+
+    def calibrate():
+        calls.append(threading.get_ident())
+        time.sleep(0.1)
+        return {"resize": {"small": "pillow"}}
+
+    monkeypatch.setattr(backends, "calibrate", calibrate)
+    # configure() installs a process-wide selector; put the original back
+    monkeypatch.setattr(backends, "_selector", backends._selector)
+    return calls
+
+
+def test_concurrent_workers_calibrate_once(tmp_path, fake_calibration):
+    path = str(tmp_path / "profile.json")
+    profiles = []
+    workers = [
+        threading.Thread(target=lambda: profiles.append(backends.configure(path, run_calibration=True)))
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert len(fake_calibration) == 1
+    assert profiles == [{"resize": {"small": "pillow"}}] * 4
+    assert json.loads((tmp_path / "profile.json").read_text()) == profiles[0]
+    # Only the profile and its lock file: no temporary files left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["profile.json", "profile.json.lock"]
+
+
+def test_corrupt_profile_is_treated_as_missing(tmp_path, fake_calibration):
+    path = tmp_path / "profile.json"
+    path.write_text('{"resize": {"sm')
+
+    assert backends.configure(str(path)) == {}
+    assert fake_calibration == []
+    assert backends.configure(str(path), run_calibration=True) == {"resize": {"small": "pillow"}}
+    assert json.loads(path.read_text()) == {"resize": {"small": "pillow"}}
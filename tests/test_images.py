@@ -0,0 +1,26 @@
+import uuid
+
+from app.api.routes import images as image_routes
+from app.database import get_async_sessionmaker
+from app.models.image import Image
+from app.repositories.image_repository import ImageRepository
+
+
+def test_gallery_items_carry_dimensions(database, run, monkeypatch):
+    async def signed_urls(paths):
+        return {path: f"https://signed.test/{path}" for path in paths}
+
+    monkeypatch.setattr(image_routes.storage_service, "get_signed_urls", signed_urls)
+    user_id = uuid.uuid4()
+
+    async def scenario():
+        async with get_async_sessionmaker()() as session:
+            await ImageRepository(session).create_image(Image(
+                user_id=user_id, label="cat", image_type="image/gif", storage_path=f"{user_id}/cat.gif",
+                width=640, height=480, frame_count=12,
+            ))
+            return await image_routes.list_images(limit=10, cursor=None, user={"id": user_id}, db=session)
+
+    item = run(scenario()).items[0]
+    assert (item.width, item.height, item.frame_count) == (640, 480, 12)
+    assert item.thumbnail_url == f"https://signed.test/{user_id}/cat.gif"
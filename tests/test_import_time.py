@@ -0,0 +1,36 @@
+"""
+The API process should start without the worker-side stack: importing
+app.main must not load Pillow, OpenCV or Celery, and must stay within an
+import-time budget (API_IMPORT_BUDGET_MS, default 2000).
+"""
+import os
+import subprocess
+import sys
+
+from tests.conftest import ROOT
+
+HEAVY_MODULES = ("PIL", "cv2", "celery")
+BUDGET_MS = float(os.environ.get("API_IMPORT_BUDGET_MS", 2000))
+
+
+def import_app_main():
+    """Import app.main in a fresh interpreter; returns (cumulative µs, heavy modules loaded)."""
+    result = subprocess.run(
+        [
+            sys.executable, "-X", "importtime", "-c",
+            f"import sys, app.main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+        ],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative_us = next(
+        int(line.split("|")[1])
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and line.split("|")[2].strip() == "app.main"
+    )
+    return cumulative_us, [name for name in result.stdout.strip().split(",") if name]
+
+
+def test_api_import_skips_worker_modules_and_fits_budget():
+    cumulative_us, loaded = import_app_main()
+    assert loaded == [], f"import app.main loaded {loaded}"
+    assert cumulative_us / 1000 <= BUDGET_MS, f"import app.main took {cumulative_us / 1000:.0f} ms"
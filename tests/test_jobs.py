@@ -0,0 +1,137 @@
+import re
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.api.routes import jobs
+from app.config import settings
+from app.core.content_address import content_addressed_path
+from app.database import get_read_db
+from app.main import app
+from app.middleware.authentication import supabaseauth
+from app.models.imageJob import ImageStatus
+from app.services import storage_service
+from app.services.storage_resilience import get_storage_breaker
+from app.services.storage_service import SignedUrlCache, StorageService
+
+USER_ID = uuid.uuid4()
+OUTPUT = b"0123456789" * 10
+PATH = content_addressed_path(OUTPUT, "cat_thumbnail.png")
+
+
+def storage_handler(request: httpx.Request) -> httpx.Response:
+    """Supabase Storage: signs any path, serves OUTPUT with Range support."""
+    if request.method == "POST":
+        path = request.url.path.removeprefix("/storage/v1")
+        return httpx.Response(200, json={"signedURL": f"{path}?token=t"})
+    match = re.fullmatch(r"bytes=(\d+)-(\d*)", request.headers.get("range", ""))
+    if not match:
+        return httpx.Response(200, content=OUTPUT, headers={"accept-ranges": "bytes"})
+    start = int(match.group(1))
+    end = min(int(match.group(2) or len(OUTPUT) - 1), len(OUTPUT) - 1)
+    if start >= len(OUTPUT):
+        return httpx.Response(416, headers={"content-range": f"bytes */{len(OUTPUT)}"})
+    return httpx.Response(
+        206, content=OUTPUT[start:end + 1], headers={"content-range": f"bytes {start}-{end}/{len(OUTPUT)}"}
+    )
+
+
+class FakeJobs:
+    def __init__(self, job):
+        self.job = job
+
+    def __call__(self, db):
+        return self
+
+    async def get_job_with_owner(self, job_id):
+        return (self.job, USER_ID) if job_id == self.job.id else None
+
+
+@pytest.fixture
+def job(monkeypatch):
+    job = SimpleNamespace(
+        id=uuid.uuid4(), status=ImageStatus.COMPLETED, storage_path=PATH, updated_at=datetime.now(timezone.utc)
+    )
+    # The pooled client the lifespan would open, here on a mock transport
+    client = httpx.AsyncClient(transport=httpx.MockTransport(storage_handler))
+    monkeypatch.setattr(storage_service, "_shared_async_client", client)
+    storage = StorageService()
+    monkeypatch.setattr(jobs, "storage_service", storage)
+    monkeypatch.setattr(jobs, "signed_url_cache", SignedUrlCache(storage, expires_in=3600, max_size=10))
+    monkeypatch.setattr(jobs, "ImageJobRepository", FakeJobs(job))
+    get_storage_breaker.cache_clear()
+    app.dependency_overrides[supabaseauth.get_current_user] = lambda: {"id": str(USER_ID)}
+    app.dependency_overrides[get_read_db] = lambda: None
+    yield job
+    app.dependency_overrides.clear()
+    get_storage_breaker.cache_clear()
+
+
+def fetch(run, job, **headers) -> httpx.Response:
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            return await client.get(f"/jobs/{job.id}/output", headers=headers)
+
+    return run(scenario())
+
+
+def test_redirects_to_a_signed_url(job, run):
+    response = fetch(run, job)
+    assert response.status_code == 302
+    signed = f"{settings.SUPABASE_URL}/storage/v1/object/sign/{settings.SUPABASE_BUCKET}/{PATH}?token=t"
+    assert response.headers["location"] == signed
+    assert response.headers["cache-control"] == "private, max-age=3540"
+    assert response.headers["etag"] == f'"{PATH.split("/")[1]}"'
+
+
+def test_matching_etag_is_not_modified(job, run):
+    etag = fetch(run, job).headers["etag"]
+    response = fetch(run, job, **{"If-None-Match": f'W/"other", {etag}'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert fetch(run, job, **{"If-None-Match": '"other"'}).status_code == 302
+
+
+def test_proxied_output_is_cached_as_immutable(job, run, monkeypatch):
+    monkeypatch.setattr(settings, "job_output_delivery", "proxy")
+    response = fetch(run, job)
+    assert response.status_code == 200
+    assert response.content == OUTPUT
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["cache-control"] == "private, max-age=31536000, immutable"
+
+
+def test_legacy_output_is_revalidated(job, run, monkeypatch):
+    monkeypatch.setattr(settings, "job_output_delivery", "proxy")
+    job.storage_path = f"user_{USER_ID}/cat_thumbnail.png"
+    response = fetch(run, job)
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert response.headers["etag"].startswith('W/"')
+
+
+def test_range_requests_are_proxied(job, run, monkeypatch):
+    monkeypatch.setattr(settings, "job_output_delivery", "proxy")
+    partial = fetch(run, job, Range="bytes=10-19")
+    assert partial.status_code == 206
+    assert partial.content == OUTPUT[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(OUTPUT)}"
+
+    unsatisfiable = fetch(run, job, Range=f"bytes={len(OUTPUT)}-")
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(OUTPUT)}"
+
+
+def test_lifespan_owns_the_pooled_storage_client(run):
+    async def scenario():
+        async with app.router.lifespan_context(app):
+            client = storage_service._shared_async_client
+            assert StorageService()._pooled_client() is client
+        return client
+
+    client = run(scenario())
+    assert client.is_closed
+    assert storage_service._shared_async_client is None
@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.services.memory_budget import MemoryBudget, MemoryBudgetExceeded, MemoryBudgetExhausted
+
+
+@pytest.fixture
+def budget(tmp_path):
+    return MemoryBudget(str(tmp_path / "ledger.json"), capacity_bytes=100)
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_reservations_are_released(budget):
+    first = budget.try_reserve(60)
+    assert first is not None
+    assert budget.try_reserve(50) is None
+    budget.release(first)
+    with budget.reserve(100, timeout=0):
+        assert budget.reserved_bytes() == 100
+    assert budget.reserved_bytes() == 0
+
+
+def test_reservation_waits_then_gives_up(budget):
+    token = budget.try_reserve(80)
+    with pytest.raises(MemoryBudgetExhausted):
+        with budget.reserve(30, timeout=0.2, poll_interval=0.05):
+            pass
+    budget.release(token)
+    assert budget.reserved_bytes() == 0
+
+
+def test_reservation_larger_than_the_budget_is_refused(budget):
+    with pytest.raises(MemoryBudgetExceeded):
+        budget.try_reserve(101)
+    assert budget.reserved_bytes() == 0
+
+
+def test_entries_of_dead_processes_are_reclaimed(budget):
+    with open(budget.path, "w") as f:
+        json.dump({str(dead_pid()): {"lost": 90}, str(os.getpid()): {"ours": 10}}, f)
+    assert budget.reserved_bytes() == 10
+    assert budget.try_reserve(90) is not None
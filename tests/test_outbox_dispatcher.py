@@ -0,0 +1,122 @@
+import contextlib
+import uuid
+
+import fakeredis
+import pytest
+from sqlalchemy import delete, func, insert, select, update
+
+from app.config import settings
+from app.database import get_sync_engine, get_sync_sessionmaker
+from app.models.image import Image
+from app.models.imageJob import ImageJob, ImageStatus, JobType
+from app.models.outbox import OutboxDeadLetter, OutboxMessage
+from app.services import fair_share, outbox_dispatcher
+from app.services.fair_share import FairShareQueue
+from app.tasks import processimage
+
+
+@pytest.fixture
+def sent(database, monkeypatch):
+    """Tasks sent to the broker; a task named "poison" always fails to publish."""
+    sent = []
+
+    def send_task(name, kwargs, queue, producer):
+        if name == "poison":
+            raise ConnectionError("rejected")
+        sent.append((name, kwargs, queue))
+
+    monkeypatch.setattr(outbox_dispatcher.celeryapp, "send_task", send_task)
+    monkeypatch.setattr(outbox_dispatcher.celeryapp, "producer_or_acquire", contextlib.nullcontext)
+    monkeypatch.setattr(settings, "fair_share_enabled", False)
+    with get_sync_engine().begin() as conn:
+        conn.execute(delete(OutboxMessage))
+        conn.execute(delete(OutboxDeadLetter))
+    yield sent
+    get_sync_engine().dispose()
+
+
+def add_messages(*messages: dict) -> None:
+    with get_sync_engine().begin() as conn:
+        conn.execute(insert(OutboxMessage), [{"queue": "images", "tenant_id": None, **m} for m in messages])
+
+
+def outbox_rows():
+    with get_sync_sessionmaker()() as session:
+        return session.execute(
+            select(OutboxMessage.task_name, OutboxMessage.attempts, OutboxMessage.next_attempt_at > func.now())
+            .order_by(OutboxMessage.id)
+        ).all()
+
+
+def test_published_messages_are_deleted(sent):
+    add_messages(*({"task_name": "process_image", "kwargs": {"n": n}} for n in range(3)))
+    assert outbox_dispatcher.dispatch_batch(10) == 3
+    assert sent == [("process_image", {"n": n}, "images") for n in range(3)]
+    assert outbox_rows() == []
+
+
+def test_failed_message_backs_off_without_holding_up_the_batch(sent):
+    add_messages(
+        {"task_name": "poison", "kwargs": {}},
+        {"task_name": "process_image", "kwargs": {"n": 1}},
+    )
+    assert outbox_dispatcher.dispatch_batch(10) == 1
+    assert sent == [("process_image", {"n": 1}, "images")]
+    # Rescheduled into the future, so the next batch does not claim it
+    assert outbox_rows() == [("poison", 1, True)]
+    assert outbox_dispatcher.dispatch_batch(10) == 0
+
+
+def test_message_is_dead_lettered_after_max_attempts(sent, monkeypatch):
+    monkeypatch.setattr(settings, "outbox_max_attempts", 2)
+    add_messages({"task_name": "poison", "kwargs": {"n": 0}})
+    for _ in range(2):
+        with get_sync_engine().begin() as conn:
+            conn.execute(update(OutboxMessage).values(next_attempt_at=func.now()))
+        outbox_dispatcher.dispatch_batch(10)
+
+    assert outbox_rows() == []
+    with get_sync_sessionmaker()() as session:
+        dead = session.execute(select(OutboxDeadLetter)).scalar_one()
+    assert (dead.task_name, dead.kwargs, dead.attempts) == ("poison", {"n": 0}, 2)
+    assert dead.last_error == "ConnectionError: rejected"
+
+
+def test_tenant_messages_go_to_the_fair_share_queue(sent, monkeypatch):
+    redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(fair_share, "get_sync_redis", lambda: redis)
+    monkeypatch.setattr(settings, "fair_share_enabled", True)
+    queue = FairShareQueue("images")
+    monkeypatch.setattr(outbox_dispatcher, "get_fair_share_queue", lambda name: queue)
+    add_messages(
+        {"task_name": "process_image", "kwargs": {"n": 0}, "tenant_id": "a"},
+        {"task_name": "send_receipt", "kwargs": {}, "queue": None},
+    )
+
+    assert outbox_dispatcher.dispatch_batch(10) == 2
+    assert sent == [("send_receipt", {}, None)]
+    assert queue.pop() == {"task_name": "process_image", "kwargs": {"n": 0}, "queue": "images", "tenant_id": "a"}
+    assert outbox_rows() == []
+
+
+def test_requeued_job_goes_back_through_the_outbox(sent):
+    user_id = uuid.uuid4()
+    with get_sync_sessionmaker()() as session:
+        image = Image(user_id=user_id, label="cat", image_type="image/png", storage_path=f"user_{user_id}/cat.png")
+        session.add(image)
+        session.flush()
+        job = ImageJob(image_id=image.id, job_type=JobType.THUMBNAIL, status=ImageStatus.PROCESSING, priority="low")
+        session.add(job)
+        session.commit()
+        job_id = job.id
+
+    processimage._requeue(job_id, "images-large", 30, job_id=str(job_id))
+
+    with get_sync_sessionmaker()() as session:
+        message = session.execute(select(OutboxMessage)).scalar_one()
+        status = session.get(ImageJob, job_id).status
+        delayed = session.scalar(select(message.next_attempt_at > func.now() + func.make_interval(0, 0, 0, 0, 0, 0, 20)))
+    assert (message.task_name, message.kwargs, message.queue) == ("process_image", {"job_id": str(job_id)}, "images-large")
+    # Its owner's fair-share turn, not the front of the broker queue
+    assert message.tenant_id == str(user_id)
+    assert delayed and status == ImageStatus.QUEUED
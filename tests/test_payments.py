@@ -0,0 +1,153 @@
+import hashlib
+import hmac
+import json
+import uuid
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes import payment as payment_routes
+from app.config import settings
+from app.database import get_async_sessionmaker, get_db
+from app.main import app
+from app.repositories.transaction_repository import TransactionRepository
+from app.schemas.TransactionSchemas import PaymentVerifyRequest
+from app.services.payment_gateway import PaymentGateway, PaymentGatewayError, RazorpayGateway, StubPaymentGateway
+
+
+def razorpay_with(handler) -> RazorpayGateway:
+    gateway = RazorpayGateway()
+    gateway.backoff_base = 0
+    gateway._client = httpx.AsyncClient(base_url="https://razorpay.test", transport=httpx.MockTransport(handler))
+    return gateway
+
+
+def counting(error):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise error("down", request=request)
+
+    return calls, handler
+
+
+def test_gateway_is_abstract():
+    with pytest.raises(TypeError):
+        PaymentGateway()
+
+
+def test_order_creation_is_not_retried_once_sent(run):
+    calls, handler = counting(httpx.ReadTimeout)
+    with pytest.raises(PaymentGatewayError):
+        run(razorpay_with(handler).create_order(100, "INR"))
+    assert len(calls) == 1
+
+
+def test_order_creation_is_retried_when_never_sent(run):
+    calls, handler = counting(httpx.ConnectError)
+    gateway = razorpay_with(handler)
+    with pytest.raises(PaymentGatewayError):
+        run(gateway.create_order(100, "INR"))
+    assert len(calls) == gateway.max_retries + 1
+
+
+def test_reads_are_retried(run):
+    calls, handler = counting(httpx.ReadTimeout)
+    gateway = razorpay_with(handler)
+    with pytest.raises(PaymentGatewayError):
+        run(gateway.fetch_payment("pay_1"))
+    assert len(calls) == gateway.max_retries + 1
+
+
+async def checkout(gateway: StubPaymentGateway, owner_id) -> PaymentVerifyRequest:
+    """An order created for owner_id and paid, with the checkout widget's signature."""
+    order = await gateway.create_order(100_00, "INR", notes={"user_id": str(owner_id)})
+    payment = gateway.pay(order["id"])
+    signature = hmac.new(
+        settings.RAZORPAY_KEY_SECRET.encode(), f"{order['id']}|{payment['id']}".encode(), hashlib.sha256
+    ).hexdigest()
+    return PaymentVerifyRequest(order_id=order["id"], payment_id=payment["id"], signature=signature)
+
+
+@pytest.fixture
+def stub_gateway(monkeypatch):
+    gateway = StubPaymentGateway()
+    monkeypatch.setattr(payment_routes, "get_payment_gateway", lambda: gateway)
+    monkeypatch.setattr(settings, "razorpay_verify_fetch_fallback", True)
+    monkeypatch.setattr(settings, "balance_cache_enabled", False)
+    return gateway
+
+
+def test_verify_fallback_credits_the_order_owner_only(database, run, stub_gateway):
+    owner_id, other_id = uuid.uuid4(), uuid.uuid4()
+    request = run(checkout(stub_gateway, owner_id))
+
+    async def verify(user_id):
+        async with get_async_sessionmaker()() as session:
+            return await payment_routes.verify_payment(request, {"id": user_id}, session)
+
+    with pytest.raises(HTTPException) as rejected:
+        run(verify(other_id))
+    assert rejected.value.status_code == 400
+
+    async def topup():
+        async with get_async_sessionmaker()() as session:
+            return await TransactionRepository(session).get_topup_by_reference(request.payment_id)
+
+    assert run(topup()) is None
+
+    assert run(verify(owner_id))["status"] == "success"
+    assert run(topup()).user_id == owner_id
+
+
+def deliver(run, event: dict):
+    """POST a webhook delivery signed with the webhook secret."""
+    body = json.dumps(event).encode()
+    signature = hmac.new(settings.RAZORPAY_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            return await client.post(
+                "/api/razorpay-webhook", content=body, headers={"X-Razorpay-Signature": signature}
+            )
+
+    return run(scenario())
+
+
+@pytest.fixture
+def webhook_secret(stub_gateway, monkeypatch):
+    monkeypatch.setattr(settings, "RAZORPAY_WEBHOOK_SECRET", "whsec")
+    return stub_gateway
+
+
+@pytest.mark.parametrize("event", [
+    {"event": "refund.processed", "payload": {"refund": {"entity": {"id": "rfnd_1"}}}},
+    {"event": "order.paid", "payload": {"order": {"entity": {"id": "order_1", "notes": {"user_id": "u"}}}}},
+])
+def test_webhook_acknowledges_events_it_does_not_handle(webhook_secret, run, event):
+    app.dependency_overrides[get_db] = lambda: None
+    try:
+        response = deliver(run, event)
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert response.json() == {"status": "ignored"}
+
+
+def test_webhook_credits_paid_orders(database, run, webhook_secret):
+    owner_id = uuid.uuid4()
+    request = run(checkout(webhook_secret, owner_id))
+    order = webhook_secret.orders[request.order_id]
+    payment = run(webhook_secret.fetch_payment(request.payment_id))
+    event = {"event": "order.paid", "payload": {"order": {"entity": order}, "payment": {"entity": payment}}}
+
+    assert [deliver(run, event).json() for _ in range(2)] == [{"status": "ok"}] * 2
+
+    async def topup():
+        async with get_async_sessionmaker()() as session:
+            return await TransactionRepository(session).get_topup_by_reference(request.payment_id)
+
+    assert run(topup()).user_id == owner_id
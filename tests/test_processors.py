@@ -0,0 +1,43 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageSequence
+
+from app.services.image_processor.processors import process_greyscale, process_resize, process_thumbnail
+
+DURATIONS = [100, 200, 300]
+LOOP = 2
+
+
+def animation(save_format: str) -> bytes:
+    frames = [Image.new("RGB", (320, 240), color) for color in ("white", "grey", "black")]
+    buffer = BytesIO()
+    frames[0].save(
+        buffer, format=save_format, save_all=True, append_images=frames[1:], duration=DURATIONS, loop=LOOP
+    )
+    return buffer.getvalue()
+
+
+def durations(img) -> list:
+    result = []
+    for frame in ImageSequence.Iterator(img):
+        # WebP fills in a frame's duration when it is loaded
+        frame.load()
+        result.append(frame.info["duration"])
+    return result
+
+
+@pytest.mark.parametrize("process", [
+    process_greyscale,
+    lambda path, data: process_thumbnail(path, data, (64, 64)),
+    lambda path, data: process_resize(path, data, 160, 120),
+], ids=["grayscale", "thumbnail", "resize"])
+@pytest.mark.parametrize("extension, save_format", [("gif", "GIF"), ("webp", "WEBP")])
+def test_animation_keeps_frames_durations_and_loop(process, extension, save_format):
+    _, output = process(f"user_1/cat.{extension}", animation(save_format))
+
+    img = Image.open(BytesIO(output))
+    assert img.format == save_format
+    assert img.n_frames == len(DURATIONS)
+    assert durations(img) == DURATIONS
+    assert img.info["loop"] == LOOP
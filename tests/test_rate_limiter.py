@@ -0,0 +1,39 @@
+import fakeredis.aioredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.middleware.authentication import supabaseauth
+from app.services import rate_limiter as rate_limiter_module
+from app.services.rate_limiter import TokenBucketRateLimiter
+
+
+def test_unknown_tier_uses_the_low_bucket(run, monkeypatch):
+    client = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(rate_limiter_module, "get_async_redis", lambda: client)
+    limiter = TokenBucketRateLimiter()
+
+    async def scenario():
+        await limiter.acquire("user-1", "LOW")
+        await limiter.acquire("user-1", "bogus")
+        await limiter.acquire("user-1", "made-up")
+        return sorted(key.decode() for key in await client.keys("*"))
+
+    assert run(scenario()) == ["ratelimit:low:user-1"]
+
+
+@pytest.fixture
+def api():
+    app.dependency_overrides[supabaseauth.get_current_user] = lambda: {"id": "user-1"}
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_upload_rejects_unknown_priority(api):
+    response = api.post(
+        "/process/image/",
+        files={"file": ("a.png", b"not really", "image/png")},
+        data={"label": "a", "image_type": "png", "priority": "ludicrous", "job_type": "thumbnail"},
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "priority"]
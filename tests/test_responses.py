@@ -0,0 +1,87 @@
+import gzip
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi.responses import JSONResponse
+
+from app.core.responses import ORJSONResponse
+from app.models.transactions import Transaction, TransactionType
+from app.schemas.TransactionSchemas import TransactionPage
+
+ROWS = 1000
+
+
+def transactions(count: int = ROWS) -> list:
+    """Unsaved Transaction rows, as a payment-history page would load them."""
+    user_id, wallet_id = uuid.uuid4(), uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    return [
+        Transaction(
+            id=uuid.uuid4(), user_id=user_id, wallet_id=wallet_id,
+            transaction_type=TransactionType.DEBIT, reference_id=f"job-{uuid.uuid4()}",
+            amount=Decimal("0.10") * (i % 50 + 1), created_at=now - timedelta(seconds=i),
+            updated_at=now - timedelta(seconds=i),
+        )
+        for i in range(count)
+    ]
+
+
+def render_to_dict(rows) -> bytes:
+    """Before: dicts built by to_dict(), stdlib encoder."""
+    return JSONResponse({"transactions": [row.to_dict() for row in rows], "next_cursor": None}).body
+
+
+def render_response_model(rows) -> bytes:
+    """After: the response model reads ORM attributes, orjson encodes."""
+    page = TransactionPage.model_validate({"transactions": rows}, from_attributes=True)
+    return ORJSONResponse(page.model_dump(mode="json")).body
+
+
+def parsed(body: bytes) -> list:
+    # Pydantic writes UTC as "Z", isoformat() as "+00:00"
+    items = json.loads(body)["transactions"]
+    for item in items:
+        for field in ("created_at", "updated_at"):
+            item[field] = datetime.fromisoformat(item[field])
+    return items
+
+
+def test_response_model_renders_like_to_dict():
+    rows = transactions(20)
+    assert parsed(render_response_model(rows)) == parsed(render_to_dict(rows))
+
+
+def timed(render, *args, repeat: int = 5) -> float:
+    """Best of `repeat` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+@pytest.mark.benchmark
+def test_serialization_cost_per_1000_rows():
+    rows = transactions()
+    print(f"\nserializing {ROWS} transactions:")
+    for name, render in (("to_dict + json", render_to_dict), ("response model + orjson", render_response_model)):
+        body = render(rows)
+        print(f"  {name:<24} {timed(render, rows):7.2f} ms  {len(body):>8} bytes")
+
+    body = render_response_model(rows)
+    # GZipMiddleware's default level
+    codecs = [("gzip", lambda data: gzip.compress(data, compresslevel=9))]
+    try:
+        import brotli
+
+        # brotli-asgi's default quality
+        codecs.append(("brotli", lambda data: brotli.compress(data, quality=4)))
+    except ImportError:
+        pass
+    for name, compress in codecs:
+        print(f"  {name:<24} {timed(compress, body):7.2f} ms  {len(compress(body)):>8} bytes")
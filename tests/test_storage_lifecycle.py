@@ -0,0 +1,128 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import get_async_sessionmaker
+from app.models.image import Image
+from app.models.imageJob import ImageJob, ImageStatus, JobType
+from app.services.storage_lifecycle import StorageLifecycleManager
+
+NOW = datetime.now(timezone.utc)
+OLD = NOW - timedelta(days=90)
+
+
+class FakeStorage:
+    """A bucket listed like Supabase: one folder level per call, folders have no id."""
+
+    def __init__(self, objects: dict):
+        self.objects = dict(objects)
+        self.listed = []
+
+    async def list_objects(self, prefix, limit=1000, offset=0):
+        self.listed.append(prefix)
+        base = f"{prefix}/" if prefix else ""
+        entries = {}
+        for path, updated in self.objects.items():
+            if path.startswith(base):
+                name, _, rest = path[len(base):].partition("/")
+                entries[name] = None if rest else updated
+        page = []
+        for name in sorted(entries)[offset:offset + limit]:
+            updated = entries[name]
+            if updated is None:
+                page.append({"name": name, "id": None, "metadata": None})
+            else:
+                page.append({"name": name, "id": name, "updated_at": updated.isoformat(), "metadata": {"size": 10}})
+        return page
+
+    async def delete_files(self, paths):
+        for path in paths:
+            self.objects.pop(path)
+        return list(paths)
+
+
+def output(name: str) -> str:
+    return f"processed/{hashlib.sha256(uuid.uuid4().bytes).hexdigest()}/{name}"
+
+
+@pytest.fixture
+def bucket(database, run, monkeypatch):
+    """
+    A bucket with a live original, a live and an expired output, two
+    orphans past the grace period and one still inside it.
+    """
+    monkeypatch.setattr(settings, "storage_retention_days", {"thumbnail": 30})
+    monkeypatch.setattr(settings, "storage_lifecycle_page_size", 2)
+    user_id = uuid.uuid4()
+    paths = {
+        "original": f"user_{user_id}/cat.png",
+        "live_output": output("cat_thumbnail.png"),
+        "expired_output": output("old_thumbnail.png"),
+        "orphan": f"user_{user_id}/lost.png",
+        "orphan_output": output("lost_thumbnail.png"),
+        "new_orphan": f"user_{user_id}/uploading.png",
+    }
+
+    async def seed():
+        async with get_async_sessionmaker()() as session:
+            image = Image(user_id=user_id, label="cat", image_type="image/png", storage_path=paths["original"])
+            session.add(image)
+            await session.flush()
+            session.add_all([
+                ImageJob(image_id=image.id, job_type=JobType.THUMBNAIL, status=ImageStatus.COMPLETED,
+                         priority="low", storage_path=paths["live_output"]),
+                ImageJob(image_id=image.id, job_type=JobType.THUMBNAIL, status=ImageStatus.COMPLETED,
+                         priority="low", storage_path=paths["expired_output"], updated_at=OLD),
+            ])
+            await session.commit()
+
+    run(seed())
+    storage = FakeStorage({path: NOW if name == "new_orphan" else OLD for name, path in paths.items()})
+    return storage, paths
+
+
+def job_paths(run, paths):
+    async def scenario():
+        async with get_async_sessionmaker()() as session:
+            return set((await session.scalars(
+                select(ImageJob.storage_path).where(
+                    ImageJob.storage_path.in_([paths["live_output"], paths["expired_output"]])
+                )
+            )).all())
+
+    return run(scenario())
+
+
+def test_dry_run_reports_without_deleting(bucket, run):
+    storage, paths = bucket
+    report = run(StorageLifecycleManager(storage, dry_run=True).run_once())
+
+    assert report.candidates == 3
+    assert (report.objects_deleted, report.jobs_expired) == (0, 0)
+    assert len(storage.objects) == 6
+    assert job_paths(run, paths) == {paths["live_output"], paths["expired_output"]}
+
+
+def test_orphans_and_expired_outputs_are_reclaimed(bucket, run):
+    storage, paths = bucket
+    report = run(StorageLifecycleManager(storage).run_once())
+
+    assert set(storage.objects) == {paths["original"], paths["live_output"], paths["new_orphan"]}
+    assert report.objects_deleted == 3 and report.bytes_reclaimed == 30
+    # The expired job is detached from its output; the live one keeps it
+    assert report.jobs_expired == 1
+    assert job_paths(run, paths) == {paths["live_output"]}
+
+
+def test_referenced_output_folders_are_not_listed(bucket, run):
+    storage, paths = bucket
+    report = run(StorageLifecycleManager(storage, dry_run=True).run_once())
+
+    live_folder = paths["live_output"].rpartition("/")[0]
+    assert live_folder not in storage.listed
+    assert paths["orphan_output"].rpartition("/")[0] in storage.listed
+    assert report.live_outputs_skipped == 1
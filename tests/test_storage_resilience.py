@@ -0,0 +1,166 @@
+"""
+Storage client failure handling against the fault-injecting storage stub,
+served by uvicorn on a local port so timeouts are real.
+"""
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+
+from app.config import settings
+from app.services import storage_service, storage_stub
+from app.services.storage_resilience import backoff_delay, get_download_latency, get_storage_breaker, hedged
+from app.services.storage_service import StorageError, StorageService, StorageUnavailable
+
+PATH = "user_1/image.png"
+DATA = b"image bytes"
+
+
+class Script:
+    """Stands in for the stub's `random`: each fault roll takes the next value, then 1.0 (no fault)."""
+
+    def __init__(self, *values: float):
+        self.values = list(values)
+
+    def random(self) -> float:
+        return self.values.pop(0) if self.values else 1.0
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(storage_stub.app, log_level="warning", timeout_graceful_shutdown=1))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    server.should_exit = True
+    thread.join(5)
+
+
+@pytest.fixture
+def storage(stub_url, monkeypatch):
+    monkeypatch.setattr(settings, "SUPABASE_URL", stub_url)
+    monkeypatch.setattr(settings, "storage_read_timeouts", {"download": 0.5})
+    monkeypatch.setattr(settings, "storage_max_attempts", 3)
+    monkeypatch.setattr(settings, "storage_retry_base_seconds", 0.01)
+    monkeypatch.setattr(settings, "storage_breaker_failure_threshold", 3)
+    monkeypatch.setattr(settings, "storage_breaker_reset_seconds", 0.2)
+    get_storage_breaker.cache_clear()
+    get_download_latency.cache_clear()
+    storage_stub.objects[f"{settings.SUPABASE_BUCKET}/{PATH}"] = DATA
+    faults(monkeypatch)
+    yield StorageService()
+    get_storage_breaker.cache_clear()
+    get_download_latency.cache_clear()
+
+
+def faults(monkeypatch, script: Script = None, **values) -> None:
+    """Replace the stub's faults (all off unless given) and reset its counters."""
+    defaults = {"latency_ms": 0, "slow_rate": 0, "slow_ms": 300, "error_rate": 0, "stall_rate": 0}
+    monkeypatch.setattr(storage_stub, "faults", storage_stub.Faults(**{**defaults, **values}))
+    if script is not None:
+        monkeypatch.setattr(storage_stub, "random", script)
+    for key in storage_stub.counters:
+        storage_stub.counters[key] = 0
+
+
+@pytest.fixture(params=["async", "sync"])
+def download(request, storage, run):
+    if request.param == "sync":
+        return lambda: storage.download_file_sync(PATH)
+    return lambda: run(storage.download_file(PATH))
+
+
+def test_stalled_download_times_out_and_is_retried(download, monkeypatch):
+    faults(monkeypatch, stall_rate=1)
+    started = time.monotonic()
+    with pytest.raises(StorageError):
+        download()
+    assert storage_stub.counters["requests"] == settings.storage_max_attempts
+    assert time.monotonic() - started < 0.5 * settings.storage_max_attempts + 1
+
+
+def test_transient_error_is_retried_with_backoff(download, monkeypatch):
+    delays = []
+    monkeypatch.setattr(storage_service, "backoff_delay", lambda attempt: delays.append(attempt) or 0)
+    # The first request answers 503, the next succeeds
+    faults(monkeypatch, Script(1.0, 1.0, 0.0), error_rate=0.5)
+    assert download() == DATA
+    assert storage_stub.counters["requests"] == 2
+    assert delays == [0]
+
+
+def test_backoff_is_full_jitter(monkeypatch):
+    monkeypatch.setattr(settings, "storage_retry_base_seconds", 1.0)
+    monkeypatch.setattr(settings, "storage_retry_max_seconds", 5.0)
+    for attempt, ceiling in ((0, 1.0), (1, 2.0), (5, 5.0)):
+        delays = [backoff_delay(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert max(delays) > ceiling / 2 and len(set(delays)) > 100
+
+
+def test_breaker_opens_and_stops_calling_storage(download, monkeypatch):
+    faults(monkeypatch, error_rate=1)
+    with pytest.raises(StorageError):
+        download()
+    assert get_storage_breaker().state == "open"
+
+    with pytest.raises(StorageUnavailable):
+        download()
+    assert storage_stub.counters["requests"] == settings.storage_breaker_failure_threshold
+
+
+def test_half_open_probe_closes_or_reopens_the_breaker(download, monkeypatch):
+    faults(monkeypatch, error_rate=1)
+    with pytest.raises(StorageError):
+        download()
+
+    # A failed probe re-opens it: one request reaches storage, then calls are refused
+    time.sleep(settings.storage_breaker_reset_seconds)
+    faults(monkeypatch, error_rate=1)
+    with pytest.raises(StorageUnavailable):
+        download()
+    assert storage_stub.counters["requests"] == 1
+    assert get_storage_breaker().state == "open"
+
+    time.sleep(settings.storage_breaker_reset_seconds)
+    faults(monkeypatch)
+    assert download() == DATA
+    assert get_storage_breaker().state == "closed"
+
+
+def test_slow_download_is_hedged(download, monkeypatch):
+    monkeypatch.setattr(storage_service, "hedge_delay", lambda: 0.05)
+    # The first request takes slow_ms, the hedge answers at once
+    faults(monkeypatch, Script(1.0, 0.0), slow_rate=0.5, slow_ms=300)
+    started = time.monotonic()
+    assert download() == DATA
+    assert time.monotonic() - started < 0.3
+    assert storage_stub.counters["requests"] == 2
+    # Let the losing request finish on the stub before the next test scripts it
+    time.sleep(0.3)
+
+
+def test_hedge_waits_past_a_retryable_status(download, monkeypatch):
+    monkeypatch.setattr(storage_service, "hedge_delay", lambda: 0.05)
+    monkeypatch.setattr(storage_service, "backoff_delay", lambda attempt: pytest.fail("retried"))
+    # Both requests are slow; the first then answers 503, the hedge 200
+    faults(monkeypatch, Script(1.0, 0.0, 1.0, 0.0, 0.0, 1.0), slow_rate=0.5, error_rate=0.5, slow_ms=300)
+    assert download() == DATA
+    assert storage_stub.counters == {"requests": 2, "errors": 1, "stalls": 0, "slow": 2}
+
+
+def test_hedge_returns_an_unsettled_result_when_both_fail(run):
+    results = iter([503, 502])
+
+    async def call():
+        await asyncio.sleep(0.05)
+        return next(results)
+
+    assert run(hedged(call, 0.01, lambda status: status < 500)) in (502, 503)
@@ -0,0 +1,154 @@
+import asyncio
+import io
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import fakeredis.aioredis
+import httpx
+import pytest
+from PIL import Image as PILImage
+from redis.exceptions import RedisError
+
+from app.api.routes import upload
+from app.config import settings
+from app.database import get_db
+from app.main import app
+from app.middleware.authentication import supabaseauth
+from app.models.imageJob import ImageStatus
+from app.schemas.imagejobs import ImageResponse
+from app.services import idempotency
+
+USER_ID = uuid.uuid4()
+
+
+def png(color: str = "red") -> bytes:
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (8, 8), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class FakeJobs:
+    """Created jobs by id, standing in for ImageJobRepository in the coalescing lookup."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def __call__(self, db):
+        return self
+
+    async def get_job_by_id(self, job_id):
+        return self.jobs.get(job_id)
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    redis = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(idempotency, "get_async_redis", lambda: redis)
+    monkeypatch.setattr(upload.single_flight, "_replace_if", None)
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    fake_jobs = FakeJobs()
+    monkeypatch.setattr(upload, "ImageJobRepository", fake_jobs)
+    fake_jobs.created = []
+    fake_jobs.gate = None
+
+    async def create_job(db, file, user_id, header, encoded_bytes, label, *args):
+        if fake_jobs.gate is not None:
+            await fake_jobs.gate.wait()
+        job_id, now = uuid.uuid4(), datetime.now(timezone.utc)
+        fake_jobs.jobs[job_id] = SimpleNamespace(id=job_id, status=ImageStatus.QUEUED)
+        fake_jobs.created.append(job_id)
+        return ImageResponse(
+            id=uuid.uuid4(), label=label, image_type="png", user_id=USER_ID, created_at=now,
+            updated_at=now, storage_path=f"user_{USER_ID}/{job_id}.png", width=header.width,
+            height=header.height, frame_count=header.frame_count,
+        ), job_id
+
+    monkeypatch.setattr(upload, "_create_job", create_job)
+    app.dependency_overrides[supabaseauth.get_current_user] = lambda: {"id": str(USER_ID)}
+    app.dependency_overrides[get_db] = lambda: None
+    yield fake_jobs
+    app.dependency_overrides.clear()
+
+
+def post(client, content: bytes, key: str = None, label: str = "cat"):
+    return client.post(
+        "/process/image/",
+        files={"file": ("cat.png", content, "image/png")},
+        data={"label": label, "image_type": "png", "priority": "low", "job_type": "thumbnail"},
+        headers={"Idempotency-Key": key} if key else {},
+    )
+
+
+def requests(run, *calls):
+    """Send the requests concurrently and return their responses."""
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            return await asyncio.gather(*(call(client) for call in calls))
+
+    return run(scenario())
+
+
+def test_repeated_key_replays_the_first_response(jobs, run):
+    first, = requests(run, lambda client: post(client, png(), key="k1"))
+    replay, = requests(run, lambda client: post(client, png(), key="k1"))
+    assert first.status_code == replay.status_code == 201
+    assert replay.json() == first.json()
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert len(jobs.created) == 1
+
+
+def test_key_reused_for_another_request_is_rejected(jobs, run):
+    requests(run, lambda client: post(client, png(), key="k1"))
+    reused, = requests(run, lambda client: post(client, png(), key="k1", label="dog"))
+    assert reused.status_code == 422
+    assert len(jobs.created) == 1
+
+
+def test_concurrent_duplicate_key_conflicts(jobs, run):
+    async def first(client):
+        return await post(client, png(), key="k1")
+
+    async def duplicate(client):
+        await asyncio.sleep(0.05)
+        response = await post(client, png(), key="k1")
+        jobs.gate.set()
+        return response
+
+    async def scenario():
+        jobs.gate = asyncio.Event()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            return await asyncio.gather(first(client), duplicate(client))
+
+    created, conflict = run(scenario())
+    assert created.status_code == 201
+    assert conflict.status_code == 409
+    assert len(jobs.created) == 1
+
+
+def test_identical_upload_attaches_to_the_in_flight_job(jobs, run):
+    first, = requests(run, lambda client: post(client, png()))
+    second, = requests(run, lambda client: post(client, png()))
+    assert first.status_code == 201
+    assert second.status_code == 200
+    assert second.headers["X-Coalesced-Job-Id"] == str(jobs.created[0])
+    assert second.json() == first.json()
+
+    # Once the job has finished, the same upload starts a new one
+    jobs.jobs[jobs.created[0]].status = ImageStatus.COMPLETED
+    third, = requests(run, lambda client: post(client, png()))
+    assert third.status_code == 201
+    assert len(jobs.created) == 2
+
+
+def test_redis_failure_after_queueing_still_returns_the_job(jobs, run, monkeypatch):
+    async def unavailable(*args, **kwargs):
+        raise RedisError("down")
+
+    monkeypatch.setattr(upload.idempotency_store, "complete", unavailable)
+    monkeypatch.setattr(upload.single_flight, "publish", unavailable)
+    response, = requests(run, lambda client: post(client, png(), key="k1"))
+    assert response.status_code == 201
+    assert len(jobs.created) == 1
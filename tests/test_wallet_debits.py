@@ -0,0 +1,141 @@
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, func, select, update
+
+from app.config import settings
+from app.database import get_async_engine, get_async_sessionmaker
+from app.models.transactions import Transaction, TransactionType
+from app.models.wallet import Wallet, WalletShard
+from app.repositories.wallet_repository import WalletRepository
+
+DEBITS = 60
+AMOUNT = Decimal("3.00")
+FUNDS = Decimal("100.00")
+
+
+@pytest.fixture(autouse=True)
+def no_balance_cache(monkeypatch):
+    monkeypatch.setattr(settings, "balance_cache_enabled", False)
+
+
+async def create_funded_wallet(shard_count: int, funds: Decimal = FUNDS) -> uuid.UUID:
+    """A wallet holding `funds`: on the wallet row, or split evenly across its shards."""
+    async with get_async_sessionmaker()() as session:
+        repo = WalletRepository(session)
+        wallet_id = await repo.get_or_create_wallet_id(uuid.uuid4())
+        await session.commit()
+        if shard_count:
+            await repo.set_shard_count(wallet_id, shard_count)
+            await session.execute(
+                update(WalletShard)
+                .where(WalletShard.wallet_id == wallet_id)
+                .values(balance=funds / shard_count)
+            )
+        else:
+            await session.execute(update(Wallet).where(Wallet.id == wallet_id).values(balance=funds))
+        await session.commit()
+    return wallet_id
+
+
+async def debit(wallet_id, reference: str):
+    async with get_async_sessionmaker()() as session:
+        return await WalletRepository(session).deduct_balance(wallet_id, AMOUNT, reference)
+
+
+@pytest.mark.parametrize("shard_count", [0, 4])
+def test_concurrent_debits_never_overdraw(database, run, shard_count):
+    async def scenario():
+        wallet_id = await create_funded_wallet(shard_count)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(debit(wallet_id, f"job-{i}") for i in range(DEBITS)))
+        elapsed = time.perf_counter() - started
+
+        async with get_async_sessionmaker()() as session:
+            wallet_balance = await session.scalar(select(Wallet.balance).where(Wallet.id == wallet_id))
+            shard_balances = (await session.scalars(
+                select(WalletShard.balance).where(WalletShard.wallet_id == wallet_id)
+            )).all()
+            ledger_total = await session.scalar(
+                select(func.coalesce(func.sum(Transaction.amount), 0)).where(
+                    Transaction.wallet_id == wallet_id,
+                    Transaction.transaction_type == TransactionType.DEBIT,
+                )
+            )
+        return results, wallet_balance, shard_balances, ledger_total, elapsed
+
+    results, wallet_balance, shard_balances, ledger_total, elapsed = run(scenario())
+    succeeded = [balance for balance, transaction_id in results if transaction_id is not None]
+    print(f"\n{DEBITS} concurrent debits, {shard_count} shards: {DEBITS / elapsed:.0f} debits/s")
+
+    assert all(balance >= 0 for balance in succeeded)
+    assert wallet_balance >= 0 and all(balance >= 0 for balance in shard_balances)
+    # Every debit that fits is applied, and the ledger matches the balance
+    assert len(succeeded) == int(FUNDS // AMOUNT)
+    assert ledger_total == AMOUNT * len(succeeded)
+    assert wallet_balance + sum(shard_balances) == FUNDS - ledger_total
+
+
+def test_unsharded_shortfall_is_one_statement(database, run):
+    statements = []
+
+    async def scenario():
+        wallet_id = await create_funded_wallet(0)
+        engine = get_async_engine().sync_engine
+        record = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            async with get_async_sessionmaker()() as session:
+                return await WalletRepository(session).deduct_balance(wallet_id, FUNDS + 1, "too-much")
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    assert run(scenario()) == (None, None)
+    assert len([sql for sql in statements if sql.strip().upper() not in ("BEGIN", "COMMIT", "ROLLBACK")]) == 1
+
+
+def test_credits_land_on_shards_of_sharded_wallets(database, run):
+    async def scenario():
+        wallet_id = await create_funded_wallet(3)
+        async with get_async_sessionmaker()() as session:
+            repo = WalletRepository(session)
+            await repo.credit_balance(wallet_id, Decimal("10.00"))
+            wallet = await repo.get_wallet_by_id(wallet_id)
+            await repo.apply_topup(wallet_id, wallet.user_id, Decimal("0.05"), f"pay-{uuid.uuid4()}")
+            shards = (await session.scalars(
+                select(WalletShard.balance)
+                .where(WalletShard.wallet_id == wallet_id)
+                .order_by(WalletShard.shard_index)
+            )).all()
+            row_balance = await session.scalar(select(Wallet.balance).where(Wallet.id == wallet_id))
+        return row_balance, shards
+
+    row_balance, shards = run(scenario())
+    # 10.00 and 0.05 split in whole cents, the remainder on shard 0
+    share = Decimal("33.33")
+    assert row_balance == 0
+    assert shards == [share + Decimal("3.37"), share + Decimal("3.34"), share + Decimal("3.34")]
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("shard_count", [0, 8])
+def test_debit_throughput(database, run, shard_count):
+    """Sustained concurrent debits of one well-funded wallet, unsharded vs sharded."""
+    rounds, concurrency = 10, 40
+
+    async def scenario():
+        wallet_id = await create_funded_wallet(shard_count, funds=AMOUNT * rounds * concurrency * 2)
+        started = time.perf_counter()
+        for r in range(rounds):
+            results = await asyncio.gather(
+                *(debit(wallet_id, f"bench-{r}-{i}") for i in range(concurrency))
+            )
+            assert all(transaction_id is not None for _, transaction_id in results)
+        return time.perf_counter() - started
+
+    elapsed = run(scenario())
+    print(f"\n{shard_count} shards: {rounds * concurrency / elapsed:.0f} debits/s "
+          f"({concurrency} concurrent)")
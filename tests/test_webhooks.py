@@ -0,0 +1,72 @@
+import socket
+
+import httpx
+import pytest
+from pydantic import ValidationError
+
+from app.config import settings
+from app.schemas.webhooks import WebhookSubscriptionCreate
+from app.services.webhook_dispatcher import PendingBatch, WebhookDispatcher
+from app.services.webhooks import UnsafeWebhookTarget, resolve_webhook_address
+
+
+@pytest.mark.parametrize("url", [
+    "http://hooks.example.com/",
+    "https://127.0.0.1/",
+    "https://10.1.2.3/",
+    "https://192.168.0.10:8443/",
+    "https://169.254.169.254/latest/meta-data",
+    "https://100.64.0.1/",
+    "https://[::1]/",
+    "https://[fe80::1]/",
+    "https://[::ffff:127.0.0.1]/",
+    "https://240.0.0.1/",
+])
+def test_subscription_rejects_insecure_or_internal_urls(url):
+    with pytest.raises(ValidationError):
+        WebhookSubscriptionCreate(url=url)
+
+
+def test_subscription_accepts_public_https():
+    assert str(WebhookSubscriptionCreate(url="https://93.184.216.34/hook").url) == "https://93.184.216.34/hook"
+    WebhookSubscriptionCreate(url="https://hooks.example.com/hook")
+
+
+def resolving_to(monkeypatch, address):
+    def getaddrinfo(host, port, *args, **kwargs):
+        family = socket.AF_INET6 if ":" in address else socket.AF_INET
+        return [(family, socket.SOCK_STREAM, 6, "", (address, port))]
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+
+
+def test_names_resolving_to_internal_addresses_are_rejected(run, monkeypatch):
+    resolving_to(monkeypatch, "10.0.0.7")
+    with pytest.raises(UnsafeWebhookTarget):
+        run(resolve_webhook_address("https://hooks.example.com/"))
+
+
+def test_delivery_rechecks_and_pins_the_resolved_address(run, monkeypatch):
+    requests = []
+    dispatcher = WebhookDispatcher()
+    dispatcher.client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: requests.append(request) or httpx.Response(200))
+    )
+    batch = PendingBatch("https://hooks.example.com/in", "secret", [1], [{"id": "e1"}], [])
+
+    # Re-pointed at an internal address after the subscription was created
+    resolving_to(monkeypatch, "169.254.169.254")
+    error = run(dispatcher._send(batch))
+    assert error.startswith("Refused") and requests == []
+
+    resolving_to(monkeypatch, "93.184.216.34")
+    assert run(dispatcher._send(batch)) is None
+    [request] = requests
+    assert request.url.host == "93.184.216.34"
+    assert request.headers["Host"] == "hooks.example.com"
+    assert request.extensions["sni_hostname"] == "hooks.example.com"
+
+
+def test_private_targets_allowed_for_local_development(monkeypatch):
+    monkeypatch.setattr(settings, "webhook_allow_private_targets", True)
+    WebhookSubscriptionCreate(url="http://localhost:9000/")